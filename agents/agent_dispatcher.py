@@ -9,11 +9,11 @@
 5. 性能监控：实时监控和优化智能体性能
 """
 
+import copy
 import json
 import asyncio
 import logging
 from typing import Dict, List, Optional, Any
-from dataclasses import dataclass, field
 from enum import Enum
 from datetime import datetime, timedelta
 
@@ -24,10 +24,61 @@ from .order_agent import OrderAgent
 from .knowledge_agent import KnowledgeAgent
 from .styling_agent import StylingAgent
 from .smart_collaboration import SmartCollaborationSystem
-from services.product_search_service import product_search_service
+from .session_store import SmartSession, create_session_store
+from .context_compaction import compact_context, prompt_metrics
+from services.product_search_service import (
+    product_search_service,
+    set_search_latency_budget,
+    reset_search_latency_budget,
+)
+from config.settings import BaseConfig, PRODUCT_SEARCH_CONFIG, SESSION_STORE_CONFIG
+from utils.keyword_matcher import KeywordMatcher
+from utils.streaming import BufferedStreamSink, get_stream_sink, set_stream_sink
+from services.llm_service import set_llm_priority, reset_llm_priority
 
 logger = logging.getLogger(__name__)
 
+# 路由覆盖规则关键词（按类别）
+OVERRIDE_KEYWORDS: Dict[str, List[str]] = {
+    "sales": [
+        "购买", "买", "下单", "推荐", "价格", "优惠", "折扣", "产品", "商品",
+        "衣服", "服装", "上衣", "裤子", "裙子", "外套", "衬衫", "t恤"
+    ],
+    # 扩展穿搭/风格相关关键词，覆盖常见偏好与场景
+    "styling": [
+        "搭配", "穿搭", "尺码", "风格", "颜色",
+        "休闲", "通勤", "正式", "约会", "运动", "街头", "简约", "复古",
+        "法式", "韩系", "日系", "商务", "职场", "上班", "聚会", "旅行"
+    ],
+    # 订单相关强意图关键词
+    "order": [
+        "订单", "查询订单", "订单查询", "订单号", "物流", "快递", "发货", "收货", "配送",
+        "退货", "退款", "售后", "退换货", "跟踪", "物流查询", "快递查询"
+    ],
+    # 明确的强销售意图（更接近成交/报价）
+    "sales_strong": [
+        "购买", "买", "下单", "推荐", "价格", "优惠", "折扣", "促销", "活动", "报价"
+    ],
+    "affirmative": [
+        "可以", "好的", "好", "行", "没问题", "是的", "嗯", "ok", "好啊", "没事", "确认"
+    ],
+    "transfer_to_sales": [
+        "转销售", "转接销售", "销售智能体", "销售顾问", "找销售", "请销售帮忙"
+    ],
+    "transfer_to_order": [
+        "转订单", "转接订单", "订单智能体", "订单顾问", "找订单", "请订单帮忙", "转到订单智能体"
+    ],
+    "transfer_to_knowledge": [
+        "转知识", "转接知识", "知识智能体", "知识顾问", "找知识", "请知识帮忙", "转到知识智能体"
+    ],
+    "transfer_to_styling": [
+        "转穿搭", "转接穿搭", "穿搭智能体", "穿搭顾问", "找穿搭", "请穿搭帮忙", "转到穿搭智能体"
+    ]
+}
+
+# 导入时构建一次的多模式匹配器
+OVERRIDE_KEYWORD_MATCHER = KeywordMatcher(OVERRIDE_KEYWORDS)
+
 # 智能体类型枚举
 class AgentType(Enum):
     RECEPTION = "reception"
@@ -37,30 +88,6 @@ class AgentType(Enum):
     STYLING = "styling"
 
 
-# 会话状态枚举
-class SessionStatus(Enum):
-    ACTIVE = "活跃"
-    COLLABORATING = "协作中"
-    WAITING = "等待中"
-    COMPLETED = "已完成"
-    ERROR = "异常"
-
-
-@dataclass
-class SmartSession:
-    """智能会话管理"""
-    user_id: str
-    session_id: str
-    current_agents: List[str] = field(default_factory=list)
-    collaboration_tasks: List[str] = field(default_factory=list)
-    context: Dict[str, Any] = field(default_factory=dict)
-    conversation_history: List[Dict[str, Any]] = field(default_factory=list)
-    start_time: datetime = field(default_factory=datetime.now)
-    last_active: datetime = field(default_factory=datetime.now)
-    status: SessionStatus = SessionStatus.ACTIVE
-    performance_metrics: Dict[str, Any] = field(default_factory=dict)
-
-
 class SmartAgentDispatcher:
     """智能调度器 - 基于GPT-4o的智能协作系统"""
     
@@ -84,8 +111,8 @@ class SmartAgentDispatcher:
             "styling_agent": StylingAgent("styling_agent", llm_client, product_search_service=product_search_service)
         }
         
-        # 会话管理
-        self.sessions: Dict[str, SmartSession] = {}
+        # 会话管理（内存 LRU 或 SQLite，按配置选择）
+        self.session_store = create_session_store(SESSION_STORE_CONFIG)
         
         # 性能统计
         self.stats = {
@@ -93,9 +120,18 @@ class SmartAgentDispatcher:
             "successful_collaborations": 0,
             "average_response_time": 0.0,
             "agent_usage": {agent_id: 0 for agent_id in self.agents.keys()},
-            "collaboration_patterns": {}
+            "collaboration_patterns": {},
+            "llm_analysis_calls": 0,
+            "llm_analysis_avoided": 0,
+            "speculation": {"attempts": 0, "hits": 0, "misses": 0, "latency_saved": 0.0,
+                            "wasted_llm_calls": 0, "wasted_prompt_tokens": 0}
         }
         
+        # 规则预路由：规则可确定主智能体时不再调用LLM协作分析
+        self.rule_pre_routing = BaseConfig.ROUTING_CONFIG.get("rule_pre_routing", True)
+        # 推测执行：需要LLM分析时，同时启动上一轮的主智能体
+        self.speculative_execution = BaseConfig.ROUTING_CONFIG.get("speculative_execution", True)
+        
         # 简化的关键词映射（作为备用）
         self.keyword_mapping = {
             "reception": ["你好", "咨询", "帮助", "客服"],
@@ -104,14 +140,22 @@ class SmartAgentDispatcher:
             "knowledge": ["面料", "材质", "保养", "洗涤", "护理"],
             "styling": ["搭配", "穿搭", "尺码", "风格", "颜色", "场合"]
         }
+        
+        # 单轮对话内商品搜索的延迟预算（秒）
+        self.search_latency_budget = PRODUCT_SEARCH_CONFIG.get("dispatcher_latency_budget")
 
     async def process_message(self, user_id: str, message: Message) -> AgentResponse:
         """处理用户消息 - 智能协作流程"""
         start_time = datetime.now()
+        budget_token = set_search_latency_budget(self.search_latency_budget)
+        priority_token = set_llm_priority(message.priority)
+        turn_token = prompt_metrics.begin_turn()
+        speculation: Optional[Dict[str, Any]] = None
+        session: Optional[SmartSession] = None
         
         try:
             # 获取或创建会话
-            session = self._get_or_create_session(user_id, message.conversation_id)
+            session = await self._get_or_create_session(user_id, message.conversation_id)
             
             # 更新会话活跃时间
             session.last_active = datetime.now()
@@ -122,14 +166,12 @@ class SmartAgentDispatcher:
                 "metadata": message.metadata
             })
             
-            # 分析协作需求
-            collaboration_analysis = await self.collaboration_system.analyze_collaboration_need(
-                message=message,
-                context=session.context
-            )
-
-            # 基于强意图的规则覆盖：对明显购买/销售意图或用户确认转接强制优先路由到销售智能体
-            collaboration_analysis = self._apply_override_rules(message, collaboration_analysis, session)
+            # 分析协作需求：规则可确定时直接预路由，否则调用LLM分析（同时推测执行上一轮主智能体）
+            hits = OVERRIDE_KEYWORD_MATCHER.match(message.content or "")
+            collaboration_analysis = self._pre_route(message, session, hits)
+            if collaboration_analysis is None:
+                speculation = self._start_speculation(message, session)
+                collaboration_analysis = await self._llm_analyze(message, session, hits)
             
             # 创建协作任务
             collaboration_task = await self.collaboration_system.create_collaboration_task(
@@ -137,11 +179,16 @@ class SmartAgentDispatcher:
                 message=message,
                 context=session.context
             )
+            primary_result = self._resolve_speculation(
+                speculation, collaboration_task["primary_agent"], session, asyncio.get_running_loop().time()
+            )
+            speculation = None
             
             # 执行协作任务
             collaboration_result = await self.collaboration_system.execute_collaboration_task(
                 task=collaboration_task,
-                agents=self.agents
+                agents=self.agents,
+                primary_result=primary_result
             )
             
             # 处理协作结果
@@ -159,65 +206,181 @@ class SmartAgentDispatcher:
         except Exception as e:
             logger.error(f"消息处理失败: {e}")
             return await self._handle_error(user_id, message, str(e))
+        finally:
+            try:
+                if speculation is not None:
+                    # 分析阶段异常时，放弃仍在运行的推测任务
+                    speculation["task"].cancel()
+                if session is not None:
+                    session_key = self._session_key(user_id, message.conversation_id)
+                    try:
+                        await self.session_store.save(session_key, session)
+                    except Exception as e:
+                        # 保存失败（如会话含无法序列化的值）不影响已生成的回复
+                        logger.error(f"保存会话失败 {session_key}: {e}")
+            finally:
+                prompt_metrics.end_turn(turn_token)
+                reset_llm_priority(priority_token)
+                reset_search_latency_budget(budget_token)
+
+    def _pre_route(self, message: Message, session: SmartSession, hits: set) -> Optional[Dict[str, Any]]:
+        """规则预路由：覆盖规则可确定主智能体时直接给出分析结果，否则返回 None"""
+        if not self.rule_pre_routing or not self._is_routing_decisive(hits, session):
+            return None
+        analysis = self._apply_override_rules(message, self._build_rule_analysis(), session, hits)
+        if not any(a.get("role") == "primary" for a in analysis.get("recommended_agents", [])):
+            return None
+        self.stats["llm_analysis_avoided"] += 1
+        return analysis
+    
+    async def _llm_analyze(self, message: Message, session: SmartSession, hits: set) -> Dict[str, Any]:
+        """调用LLM进行协作分析，再应用覆盖规则"""
+        self.stats["llm_analysis_calls"] += 1
+        analysis = await self.collaboration_system.analyze_collaboration_need(
+            message=message,
+            context=session.context
+        )
+        # 基于强意图的规则覆盖：对明显购买/销售意图或用户确认转接强制优先路由到销售智能体
+        return self._apply_override_rules(message, analysis, session, hits)
+    
+    def _start_speculation(self, message: Message, session: SmartSession) -> Optional[Dict[str, Any]]:
+        """按会话粘性推测主智能体（上一轮主智能体），与协作分析同时启动
+        
+        推测在智能体的会话隔离副本与会话上下文副本上运行，不产生任何状态写入；
+        命中后由 _commit_speculation 提交，未命中则整体丢弃。
+        调用方设置了流式输出接收器时，推测生成的片段先缓冲，命中后回放并继续转发。
+        """
+        if not self.speculative_execution or not session.current_agents:
+            return None
+        agent_id = session.current_agents[0]
+        if agent_id not in self.agents:
+            return None
+        
+        loop = asyncio.get_running_loop()
+        conversation_id = message.conversation_id
+        fork = self.agents[agent_id].fork_for_conversation(conversation_id)
+        speculation = {
+            "agent_id": agent_id,
+            "conversation_id": conversation_id,
+            "fork": fork,
+            "base_context": copy.deepcopy(session.context),
+            "context": copy.deepcopy(session.context),
+            "llm_usage": None,
+            "target_sink": get_stream_sink(),
+            "sink": None,
+            "started_at": loop.time(),
+            "finished_at": None
+        }
+        
+        if speculation["target_sink"] is not None:
+            speculation["sink"] = BufferedStreamSink()
+        
+        async def run() -> Dict[str, Any]:
+            # 推测结果可能被丢弃，片段先进缓冲而不直接推给客户端（任务上下文为副本，不影响调用方）
+            set_stream_sink(speculation["sink"])
+            speculation["llm_usage"] = prompt_metrics.begin_scope()
+            try:
+                return await self.collaboration_system.invoke_agent(
+                    {**self.agents, agent_id: fork}, agent_id, "primary", message, speculation["context"]
+                )
+            finally:
+                speculation["finished_at"] = loop.time()
+        
+        speculation["task"] = asyncio.create_task(run())
+        self.stats["speculation"]["attempts"] += 1
+        return speculation
+    
+    def _resolve_speculation(self, speculation: Optional[Dict[str, Any]], primary_agent: str,
+                             session: SmartSession, analysis_finished_at: float) -> Optional[asyncio.Task]:
+        """分析完成后核对推测：命中则返回（完成后提交状态的）主智能体任务，未命中则取消并丢弃"""
+        if speculation is None:
+            return None
+        stats = self.stats["speculation"]
+        task: asyncio.Task = speculation["task"]
+        if speculation["agent_id"] != primary_agent:
+            task.cancel()
+            if speculation["sink"] is not None:
+                speculation["sink"].discard()
+            stats["misses"] += 1
+            # 已发出的模型调用无法收回，计入推测未命中的LLM开销
+            usage = speculation["llm_usage"] or {}
+            stats["wasted_llm_calls"] += usage.get("calls", 0)
+            stats["wasted_prompt_tokens"] += usage.get("tokens", 0)
+            return None
+        
+        stats["hits"] += 1
+        
+        async def commit() -> Dict[str, Any]:
+            if speculation["sink"] is not None:
+                # 回放推测期间缓冲的片段，后续片段直接推给客户端
+                await speculation["sink"].attach(speculation["target_sink"])
+            result = await task
+            # 节省的时间 = 推测执行与协作分析重叠的部分
+            finished_at = speculation["finished_at"] or analysis_finished_at
+            stats["latency_saved"] += max(0.0, min(finished_at, analysis_finished_at) - speculation["started_at"])
+            self._commit_speculation(speculation, session)
+            return result
+        
+        return asyncio.create_task(commit())
+    
+    def _commit_speculation(self, speculation: Dict[str, Any], session: SmartSession) -> None:
+        """推测命中：把副本上的智能体会话状态与上下文改动写回"""
+        self.agents[speculation["agent_id"]].adopt_conversation_state(
+            speculation["fork"], speculation["conversation_id"]
+        )
+        base_context = speculation["base_context"]
+        for key, value in speculation["context"].items():
+            # 只写回推测过程中改动的键，保留协作分析期间调度器对上下文的修改
+            if key not in base_context or base_context[key] != value:
+                session.context[key] = value
+    
+    def _is_routing_decisive(self, hits: set, session: SmartSession) -> bool:
+        """判断覆盖规则是否必然决定主智能体（此时LLM分析结果会被整体覆盖）"""
+        if session.context.get("handoff_pending") and session.context.get("handoff_target"):
+            target_class = "transfer_to_" + session.context["handoff_target"].replace("_agent", "")
+            if "affirmative" in hits or target_class in hits:
+                return True
+        if hits & {"transfer_to_order", "transfer_to_knowledge", "transfer_to_styling", "order", "sales", "styling"}:
+            return True
+        # 会话粘性规则
+        return "sales_agent" in session.current_agents or "styling_agent" in session.current_agents
+    
+    def _build_rule_analysis(self) -> Dict[str, Any]:
+        """规则预路由的基础分析结果（推荐列表由覆盖规则填充）"""
+        return {
+            "requires_collaboration": False,
+            "reason": "规则预路由",
+            "collaboration_mode": "none",
+            "recommended_agents": [],
+            "routing_source": "rules"
+        }
 
-    def _apply_override_rules(self, message: Message, analysis: Dict[str, Any], session: SmartSession) -> Dict[str, Any]:
+    def _apply_override_rules(self, message: Message, analysis: Dict[str, Any], session: SmartSession,
+                              hits: Optional[set] = None) -> Dict[str, Any]:
         """强意图覆盖规则：当检测到明显的购买/销售相关意图时，确保销售智能体为主处理者。
         这样可避免LLM分析偶发返回接待或其它智能体导致的误路由。
         """
         try:
-            content = (message.content or "").lower()
-            sales_keywords = [
-                "购买", "买", "下单", "推荐", "价格", "优惠", "折扣", "产品", "商品",
-                "衣服", "服装", "上衣", "裤子", "裙子", "外套", "衬衫", "t恤"
-            ]
-            # 扩展穿搭/风格相关关键词，覆盖常见偏好与场景
-            styling_keywords = [
-                "搭配", "穿搭", "尺码", "风格", "颜色",
-                "休闲", "通勤", "正式", "约会", "运动", "街头", "简约", "复古",
-                "法式", "韩系", "日系", "商务", "职场", "上班", "聚会", "旅行"
-            ]
-            # 订单相关强意图关键词
-            order_keywords = [
-                "订单", "查询订单", "订单查询", "订单号", "物流", "快递", "发货", "收货", "配送",
-                "退货", "退款", "售后", "退换货", "跟踪", "物流查询", "快递查询"
-            ]
-            # 明确的强销售意图（更接近成交/报价）
-            sales_strong_keywords = [
-                "购买", "买", "下单", "推荐", "价格", "优惠", "折扣", "促销", "活动", "报价"
-            ]
+            # 单次扫描得到全部命中的关键词类别
+            if hits is None:
+                hits = OVERRIDE_KEYWORD_MATCHER.match(message.content or "")
 
-            affirmative_keywords = [
-                "可以", "好的", "好", "行", "没问题", "是的", "嗯", "ok", "好啊", "没事", "确认"
-            ]
-            transfer_to_sales_keywords = [
-                "转销售", "转接销售", "销售智能体", "销售顾问", "找销售", "请销售帮忙"
-            ]
-            transfer_to_order_keywords = [
-                "转订单", "转接订单", "订单智能体", "订单顾问", "找订单", "请订单帮忙", "转到订单智能体"
-            ]
-            transfer_to_knowledge_keywords = [
-                "转知识", "转接知识", "知识智能体", "知识顾问", "找知识", "请知识帮忙", "转到知识智能体"
-            ]
-            transfer_to_styling_keywords = [
-                "转穿搭", "转接穿搭", "穿搭智能体", "穿搭顾问", "找穿搭", "请穿搭帮忙", "转到穿搭智能体"
-            ]
-
-            def contains_any(keywords: List[str]) -> bool:
-                return any(k in content for k in keywords)
+            def contains_any(keyword_class: str) -> bool:
+                return keyword_class in hits
 
             # 当接待/其它智能体已建议转接某目标，且用户明确确认时，强制切到该目标
             handoff_pending = session.context.get("handoff_pending", False)
             handoff_target = session.context.get("handoff_target", "")
             if handoff_pending and handoff_target:
-                confirm = contains_any(affirmative_keywords)
+                confirm = contains_any("affirmative")
                 if handoff_target == "sales_agent":
-                    confirm = confirm or contains_any(transfer_to_sales_keywords)
+                    confirm = confirm or contains_any("transfer_to_sales")
                 elif handoff_target == "order_agent":
-                    confirm = confirm or contains_any(transfer_to_order_keywords)
+                    confirm = confirm or contains_any("transfer_to_order")
                 elif handoff_target == "knowledge_agent":
-                    confirm = confirm or contains_any(transfer_to_knowledge_keywords)
+                    confirm = confirm or contains_any("transfer_to_knowledge")
                 elif handoff_target == "styling_agent":
-                    confirm = confirm or contains_any(transfer_to_styling_keywords)
+                    confirm = confirm or contains_any("transfer_to_styling")
 
                 if confirm:
                     recommended = analysis.get("recommended_agents", []) or []
@@ -237,17 +400,17 @@ class SmartAgentDispatcher:
                     session.context["handoff_pending"] = False
 
             # 显式转接到订单/知识/穿搭智能体（无需依赖先前建议）
-            if contains_any(transfer_to_order_keywords):
+            if contains_any("transfer_to_order"):
                 analysis["recommended_agents"] = [{"agent_id": "order_agent", "role": "primary", "priority": 1}]
                 analysis["collaboration_mode"] = "consultation"
                 analysis["task_priority"] = "high"
                 analysis["fallback_agent"] = "order_agent"
-            elif contains_any(transfer_to_knowledge_keywords):
+            elif contains_any("transfer_to_knowledge"):
                 analysis["recommended_agents"] = [{"agent_id": "knowledge_agent", "role": "primary", "priority": 1}]
                 analysis["collaboration_mode"] = "consultation"
                 analysis["task_priority"] = "high"
                 analysis["fallback_agent"] = "knowledge_agent"
-            elif contains_any(transfer_to_styling_keywords):
+            elif contains_any("transfer_to_styling"):
                 analysis["recommended_agents"] = [{"agent_id": "styling_agent", "role": "primary", "priority": 1}]
                 analysis["collaboration_mode"] = "consultation"
                 analysis["task_priority"] = "high"
@@ -255,13 +418,13 @@ class SmartAgentDispatcher:
 
             # 会话粘性：当前处于销售对话，除非用户明确要求转穿搭或存在强订单意图，保持销售为主
             try:
-                if ("sales_agent" in session.current_agents) and not contains_any(transfer_to_styling_keywords) and not contains_any(order_keywords):
+                if ("sales_agent" in session.current_agents) and not contains_any("transfer_to_styling") and not contains_any("order"):
                     recommended = analysis.get("recommended_agents", []) or []
                     new_recommended: List[Dict[str, Any]] = []
                     # 保持销售为主
                     new_recommended.append({"agent_id": "sales_agent", "role": "primary", "priority": 1})
                     # 若出现穿搭相关词，加入穿搭为支持（并行）
-                    if contains_any(styling_keywords) and not any(a.get("agent_id") == "styling_agent" for a in recommended):
+                    if contains_any("styling") and not any(a.get("agent_id") == "styling_agent" for a in recommended):
                         new_recommended.append({"agent_id": "styling_agent", "role": "support", "priority": 3, "parallel": True})
                     # 知识智能体并行支持
                     knowledge_added = False
@@ -293,7 +456,7 @@ class SmartAgentDispatcher:
                 pass
 
             # 穿搭主导但需要销售跟进：采用顺序协作（先穿搭，后销售）
-            if contains_any(styling_keywords) and not contains_any(sales_keywords) and not contains_any(order_keywords):
+            if contains_any("styling") and not contains_any("sales") and not contains_any("order"):
                 recommended = analysis.get("recommended_agents", []) or []
                 new_recommended: List[Dict[str, Any]] = []
                 new_recommended.append({"agent_id": "styling_agent", "role": "primary", "priority": 1})
@@ -320,7 +483,7 @@ class SmartAgentDispatcher:
                 analysis["fallback_agent"] = "sales_agent"
 
             # 存在购买/销售相关意图时，默认销售为主；如同时包含穿搭意图，则将穿搭作为支持
-            if contains_any(sales_keywords) and not contains_any(order_keywords):
+            if contains_any("sales") and not contains_any("order"):
                 recommended = analysis.get("recommended_agents", []) or []
 
                 # 构建新的推荐列表，确保 sales_agent 作为 primary 且排在首位
@@ -342,7 +505,7 @@ class SmartAgentDispatcher:
                     new_recommended.append({"agent_id": "knowledge_agent", "role": "support", "priority": 2, "parallel": True})
 
                 # 如涉及穿搭/尺码等，加入造型智能体支持（并行）
-                if contains_any(styling_keywords):
+                if contains_any("styling"):
                     new_recommended.append({"agent_id": "styling_agent", "role": "support", "priority": 3, "parallel": True})
 
                 # 追加其它已推荐的非销售智能体，避免重复；接待智能体不设为主
@@ -358,8 +521,8 @@ class SmartAgentDispatcher:
                 analysis["fallback_agent"] = "sales_agent"
 
             # 同时出现穿搭与销售关键词：依据会话粘性与强销售意图确定主代理
-            if contains_any(styling_keywords) and contains_any(sales_keywords) and not contains_any(order_keywords):
-                prefer_sales = ("sales_agent" in session.current_agents) or contains_any(sales_strong_keywords)
+            if contains_any("styling") and contains_any("sales") and not contains_any("order"):
+                prefer_sales = ("sales_agent" in session.current_agents) or contains_any("sales_strong")
                 recommended: List[Dict[str, Any]] = []
                 if prefer_sales:
                     # 销售为主，穿搭支持
@@ -381,7 +544,7 @@ class SmartAgentDispatcher:
                     analysis["fallback_agent"] = "sales_agent"
 
             # 订单强意图：无论是否混杂其它关键词，优先订单为主
-            if contains_any(order_keywords):
+            if contains_any("order"):
                 recommended = analysis.get("recommended_agents", []) or []
                 new_recommended: List[Dict[str, Any]] = [{"agent_id": "order_agent", "role": "primary", "priority": 1}]
                 # 可选并行支持：知识/接待
@@ -400,7 +563,7 @@ class SmartAgentDispatcher:
 
             # 会话粘性：上一轮协作包含穿搭智能体，且当前无明确销售意图 → 继续以穿搭为主，销售顺序支持
             try:
-                if ("styling_agent" in session.current_agents) and not contains_any(sales_keywords) and not contains_any(order_keywords):
+                if ("styling_agent" in session.current_agents) and not contains_any("sales") and not contains_any("order"):
                     recommended = analysis.get("recommended_agents", []) or []
                     # 构建新的推荐，确保穿搭为主、销售支持
                     new_recommended: List[Dict[str, Any]] = []
@@ -444,17 +607,19 @@ class SmartAgentDispatcher:
             # 任何异常下保持原始分析结果，避免影响流程
             return analysis
 
-    def _get_or_create_session(self, user_id: str, session_id: str) -> SmartSession:
+    @staticmethod
+    def _session_key(user_id: str, session_id: str) -> str:
+        return f"{user_id}_{session_id}"
+
+    async def _get_or_create_session(self, user_id: str, session_id: str) -> SmartSession:
         """获取或创建智能会话"""
-        session_key = f"{user_id}_{session_id}"
-        
-        if session_key not in self.sessions:
-            self.sessions[session_key] = SmartSession(
+        session = await self.session_store.get(self._session_key(user_id, session_id))
+        if session is None:
+            session = SmartSession(
                 user_id=user_id,
                 session_id=session_id
             )
-        
-        return self.sessions[session_key]
+        return session
 
     def _process_collaboration_result(self, collaboration_result: Dict[str, Any], session: SmartSession) -> AgentResponse:
         """处理协作结果"""
@@ -649,7 +814,7 @@ class SmartAgentDispatcher:
         
         # 更新上下文
         final_context = collaboration_result.get("final_context", {})
-        session.context.update(final_context)
+        session.context = compact_context({**session.context, **final_context})
         
         # 记录响应
         session.conversation_history.append({
@@ -657,7 +822,13 @@ class SmartAgentDispatcher:
             "type": "agent_response",
             "agent_id": response.agent_id,
             "content": response.content,
-            "collaboration_info": collaboration_result
+            # 只保留协作摘要，完整结果（各智能体输出与上下文）体积大且不会再被读取
+            "collaboration_info": {
+                "task_id": task_id,
+                "workflow_type": collaboration_result.get("workflow_type"),
+                "agents": participating_agents,
+                "success": collaboration_result.get("success", False)
+            }
         })
         
         # 更新性能指标
@@ -727,10 +898,9 @@ class SmartAgentDispatcher:
             metadata={"error": True, "error_message": error}
         )
 
-    def get_session_info(self, user_id: str, session_id: str) -> Optional[Dict[str, Any]]:
+    async def get_session_info(self, user_id: str, session_id: str) -> Optional[Dict[str, Any]]:
         """获取会话信息"""
-        session_key = f"{user_id}_{session_id}"
-        session = self.sessions.get(session_key)
+        session = await self.session_store.get(self._session_key(user_id, session_id))
         
         if not session:
             return None
@@ -802,7 +972,7 @@ class SmartAgentDispatcher:
             "dispatcher_stats": {
                 **self.stats,
                 "success_rate": success_rate,
-                "active_sessions": len(self.sessions),
+                "active_sessions": self.session_store.count(),
                 "total_agents": len(self.agents)
             },
             "collaboration_stats": collaboration_stats,
@@ -835,7 +1005,7 @@ class SmartAgentDispatcher:
         """获取性能报告（供统计分析接口使用）"""
         try:
             total_requests = int(self.stats.get("total_messages", 0))
-            active_sessions = len(self.sessions)
+            active_sessions = self.session_store.count()
             agent_usage = dict(self.stats.get("agent_usage", {}))
             # 可扩展的附加指标
             average_response_time = float(self.stats.get("average_response_time", 0.0))
@@ -846,30 +1016,43 @@ class SmartAgentDispatcher:
                 "活跃会话数": active_sessions,
                 "智能体使用统计": agent_usage,
                 "平均响应时间": average_response_time,
-                "成功率": success_rate
+                "成功率": success_rate,
+                "LLM协作分析调用数": int(self.stats.get("llm_analysis_calls", 0)),
+                "规则预路由节省LLM调用数": int(self.stats.get("llm_analysis_avoided", 0)),
+                "推测执行": self._get_speculation_report(),
+                "提示词体积": prompt_metrics.get_stats()
             }
         except Exception:
             # 防御性返回最小结构
             return {
                 "总请求数": self.stats.get("total_messages", 0),
-                "活跃会话数": len(self.sessions),
+                "活跃会话数": self.session_store.count(),
                 "智能体使用统计": self.stats.get("agent_usage", {})
             }
 
+    def _get_speculation_report(self) -> Dict[str, Any]:
+        """推测执行统计：命中率与累计节省时间"""
+        stats = self.stats.get("speculation", {})
+        attempts = stats.get("attempts", 0)
+        hits = stats.get("hits", 0)
+        return {
+            "推测次数": attempts,
+            "命中次数": hits,
+            "命中率": (hits / attempts) if attempts > 0 else 0.0,
+            "累计节省时间": round(stats.get("latency_saved", 0.0), 3),
+            "平均节省时间": round(stats.get("latency_saved", 0.0) / hits, 3) if hits > 0 else 0.0,
+            "未命中次数": stats.get("misses", 0),
+            "未命中消耗LLM调用数": stats.get("wasted_llm_calls", 0),
+            "未命中消耗提示词token数": stats.get("wasted_prompt_tokens", 0)
+        }
+
     async def cleanup_inactive_sessions(self, inactive_hours: int = 24) -> int:
         """清理非活跃会话"""
         cutoff_time = datetime.now() - timedelta(hours=inactive_hours)
-        inactive_sessions = []
-        
-        for session_key, session in self.sessions.items():
-            if session.last_active < cutoff_time:
-                inactive_sessions.append(session_key)
-        
-        for session_key in inactive_sessions:
-            del self.sessions[session_key]
+        removed = await self.session_store.cleanup(cutoff_time)
         
-        logger.info(f"清理了 {len(inactive_sessions)} 个非活跃会话")
-        return len(inactive_sessions)
+        logger.info(f"清理了 {removed} 个非活跃会话")
+        return removed
 
     def reset_stats(self):
         """重置统计信息"""
@@ -878,7 +1061,11 @@ class SmartAgentDispatcher:
             "successful_collaborations": 0,
             "average_response_time": 0.0,
             "agent_usage": {agent_id: 0 for agent_id in self.agents.keys()},
-            "collaboration_patterns": {}
+            "collaboration_patterns": {},
+            "llm_analysis_calls": 0,
+            "llm_analysis_avoided": 0,
+            "speculation": {"attempts": 0, "hits": 0, "misses": 0, "latency_saved": 0.0,
+                            "wasted_llm_calls": 0, "wasted_prompt_tokens": 0}
         }
         logger.info("统计信息已重置")
 
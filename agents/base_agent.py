@@ -7,10 +7,16 @@ from abc import ABC, abstractmethod
 from typing import Dict, Any, List, Optional
 from datetime import datetime, timezone, timedelta
 from enum import Enum
+import copy
 import json
 import logging
 import uuid
 
+from config.settings import PROMPT_CONFIG
+from utils.tokenizer import count_tokens
+from .context_compaction import prompt_metrics, render_context_lines
+from .prompt_builder import PromptBuilder, get_section_budget
+
 logger = logging.getLogger(__name__)
 beijing_tz = timezone(timedelta(hours=8))
 
@@ -19,6 +25,10 @@ def get_llm_service():
     from services.llm_service import llm_service
     return llm_service
 
+def get_stream_sink():
+    from utils.streaming import get_stream_sink
+    return get_stream_sink()
+
 def get_context_service():
     from services.context_service import context_service
     return context_service
@@ -103,6 +113,9 @@ class AgentResponse:
 class BaseAgent(ABC):
     """智能体基类 - 基于GPT-4o的智能对话"""
     
+    # 按会话ID保存状态的属性（推测执行时在隔离副本上读写，确认命中后再提交）
+    conversation_state_attrs = ("conversation_memory",)
+    
     def __init__(self, agent_id: str, agent_type: str, llm_client=None, config: Dict[str, Any] = None):
         self.agent_id = agent_id
         self.agent_type = agent_type
@@ -124,6 +137,24 @@ class BaseAgent(ABC):
         
         logger.info(f"智能体 {agent_id} ({agent_type}) 初始化完成")
 
+    def fork_for_conversation(self, conversation_id: str) -> "BaseAgent":
+        """创建隔离指定会话状态的浅副本：在副本上处理消息不会改动本实例的任何会话状态"""
+        fork = copy.copy(self)
+        for attr in self.conversation_state_attrs:
+            state = getattr(self, attr)
+            isolated = {}
+            if conversation_id in state:
+                isolated[conversation_id] = copy.deepcopy(state[conversation_id])
+            setattr(fork, attr, isolated)
+        return fork
+
+    def adopt_conversation_state(self, fork: "BaseAgent", conversation_id: str) -> None:
+        """把副本上该会话的状态提交回本实例"""
+        for attr in self.conversation_state_attrs:
+            state = getattr(fork, attr)
+            if conversation_id in state:
+                getattr(self, attr)[conversation_id] = state[conversation_id]
+
     @abstractmethod
     def get_system_prompt(self) -> str:
         """获取智能体的系统提示词"""
@@ -165,32 +196,25 @@ class BaseAgent(ABC):
             )
 
     def _build_intelligent_prompt(self, message: Message, context: Dict[str, Any] = None) -> str:
-        """构建智能提示词"""
-        prompt_parts = [
-            self.get_system_prompt(),
-            "",
-            "## 当前对话上下文："
-        ]
+        """构建智能提示词（对话历史与上下文按 token 预算裁剪）"""
+        builder = self._new_prompt_builder()
+        builder.add("context_title", "\n## 当前对话上下文：")
         
-        # 添加对话历史
+        # 添加对话历史（预算内尽量保留最近的轮次）
         history = self._get_conversation_history(message.conversation_id)
-        if history:
-            prompt_parts.append("### 对话历史：")
-            for item in history[-3:]:  # 只保留最近3轮对话
-                prompt_parts.append(f"用户: {item['user']}")
-                prompt_parts.append(f"助手: {item['assistant']}")
-            prompt_parts.append("")
+        builder.add_items("history", self._history_items(history), priority=1,
+                          header="### 对话历史：", max_tokens=get_section_budget("history"))
         
         # 添加上下文信息
         if context:
-            prompt_parts.append("### 上下文信息：")
-            for key, value in context.items():
-                if value:
-                    prompt_parts.append(f"- {key}: {value}")
-            prompt_parts.append("")
+            context_lines = render_context_lines(context, get_section_budget("context"))
+            if context_lines:
+                builder.add("context", "\n".join(["\n### 上下文信息：", *context_lines]), priority=2,
+                            max_tokens=get_section_budget("context"))
         
         # 添加当前用户消息
-        prompt_parts.extend([
+        builder.add("request", "\n".join([
+            "",
             "## 用户当前消息：",
             message.content,
             "",
@@ -203,9 +227,25 @@ class BaseAgent(ABC):
             '  "suggested_agents": ["如果需要转接，建议的智能体"],',
             '  "requires_human": false',
             "}"
-        ])
+        ]))
         
-        return "\n".join(prompt_parts)
+        return builder.build()
+
+    def _new_prompt_builder(self, include_system_prompt: bool = True) -> PromptBuilder:
+        """创建本智能体的提示词构建器，系统提示词作为缓存的静态段落"""
+        builder = PromptBuilder(self.agent_id)
+        if include_system_prompt:
+            builder.add_static("system", f"{type(self).__name__}.system_prompt", self.get_system_prompt)
+        return builder
+
+    def _history_items(self, history: List[Dict[str, Any]], user_label: str = "用户",
+                       assistant_label: str = "助手") -> List[str]:
+        """把对话记忆格式化为按轮次的历史条目"""
+        return [
+            f"{user_label}: {item.get('user', '')}\n{assistant_label}: {item.get('assistant', '')}"
+            for item in history[-PROMPT_CONFIG["history_turns"]:]
+            if item.get("user") or item.get("assistant")
+        ]
 
     async def _generate_response(self, prompt: str) -> str:
         """调用GPT-4o生成回复"""
@@ -213,17 +253,45 @@ class BaseAgent(ABC):
             return '{"content": "抱歉，当前无法提供智能回复服务。", "confidence": 0.0}'
         
         try:
-            # 使用统一的智能体响应接口，自动选择模型并返回文本内容
-            llm_response = await self.llm_client.get_agent_response(
-                agent_name=self.agent_id,
+            content = await self._request_llm(
                 messages=[{"role": "user", "content": prompt}],
                 context_info={"agent_type": self.agent_type}
             )
-            return llm_response.content or '{"content": "", "confidence": 0.0}'
+            return content or '{"content": "", "confidence": 0.0}'
         except Exception as e:
             logger.error(f"GPT-4o调用失败: {e}")
             return '{"content": "抱歉，我暂时无法理解您的问题。", "confidence": 0.0}'
 
+    async def _request_llm(self, messages: List[Dict[str, str]], context_info: Dict[str, Any]) -> str:
+        """
+        调用统一的智能体响应接口并返回完整文本
+        
+        当前调用链设置了流式输出接收器时改用流式接口，边生成边推送回复中的 content 字段。
+        """
+        prompt_metrics.record(self.agent_id, sum(count_tokens(m.get("content") or "") for m in messages))
+        
+        sink = get_stream_sink()
+        if sink is None or not hasattr(self.llm_client, "stream_agent_response"):
+            llm_response = await self.llm_client.get_agent_response(
+                agent_name=self.agent_id,
+                messages=messages,
+                context_info=context_info
+            )
+            return llm_response.content
+        
+        from utils.streaming import JsonFieldStreamExtractor
+        extractor = JsonFieldStreamExtractor("content")
+        sink.begin_segment()
+        parts = []
+        async for chunk in self.llm_client.stream_agent_response(
+            agent_name=self.agent_id,
+            messages=messages,
+            context_info=context_info
+        ):
+            parts.append(chunk)
+            await sink.push(extractor.feed(chunk))
+        return "".join(parts)
+
     def _parse_response(self, response_content: str) -> AgentResponse:
         """解析GPT-4o的JSON响应"""
         try:
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+会话上下文压缩与提示词体积统计
+
+协作结果只以结构化摘要（智能体、意图、商品ID）保留在会话上下文中，
+渲染进提示词时按 token 预算截断，避免上下文随对话轮次不断膨胀。
+"""
+import json
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from config.settings import PROMPT_CONFIG
+from utils.tokenizer import count_tokens, truncate_to_tokens
+
+# 不保留在会话上下文中的原始大体积字段
+RAW_PAYLOAD_KEYS = ("last_collaboration_results",)
+
+# 上下文中由对话历史段单独渲染的字段
+HISTORY_KEYS = ("conversation_history",)
+
+# 每个结果摘要最多保留的商品ID数
+MAX_PRODUCT_IDS = 10
+
+
+def _product_id(item: Any) -> Optional[str]:
+    if isinstance(item, dict):
+        value = item.get("product_id") or item.get("id") or item.get("sku")
+        return str(value) if value else None
+    if isinstance(item, (str, int)):
+        return str(item)
+    return None
+
+
+def extract_product_ids(metadata: Dict[str, Any]) -> List[str]:
+    """从智能体响应元数据中提取推荐商品ID"""
+    if not isinstance(metadata, dict):
+        return []
+    candidates: List[Any] = []
+    for key in ("recommended_products", "products", "search_results"):
+        value = metadata.get(key)
+        if isinstance(value, list):
+            candidates.extend(value)
+    grouped = metadata.get("grouped_recommendations")
+    if isinstance(grouped, dict):
+        for items in grouped.values():
+            if isinstance(items, list):
+                candidates.extend(items)
+
+    product_ids: List[str] = []
+    for item in candidates:
+        product_id = _product_id(item)
+        if product_id and product_id not in product_ids:
+            product_ids.append(product_id)
+            if len(product_ids) >= MAX_PRODUCT_IDS:
+                break
+    return product_ids
+
+
+def summarize_collaboration_results(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """把协作结果压缩为结构化摘要"""
+    summaries = []
+    for result in results or []:
+        if not isinstance(result, dict):
+            continue
+        summary: Dict[str, Any] = {"agent_id": result.get("agent_id"), "role": result.get("role")}
+        if result.get("error"):
+            summary["error"] = str(result["error"])[:100]
+        else:
+            response = result.get("response") or {}
+            summary["intent"] = response.get("intent_type")
+            summary["next_action"] = response.get("next_action")
+            confidence = response.get("confidence")
+            if isinstance(confidence, (int, float)):
+                summary["confidence"] = round(float(confidence), 2)
+            product_ids = extract_product_ids(response.get("metadata") or {})
+            if product_ids:
+                summary["product_ids"] = product_ids
+        summaries.append({k: v for k, v in summary.items() if v is not None})
+    return summaries
+
+
+def compact_context(context: Dict[str, Any], history_limit: Optional[int] = None) -> Dict[str, Any]:
+    """去除原始协作结果并限制上下文中的对话历史长度"""
+    history_limit = history_limit or PROMPT_CONFIG["context_history_limit"]
+    compacted = {}
+    for key, value in context.items():
+        if key in RAW_PAYLOAD_KEYS:
+            if "last_collaboration_summary" not in context:
+                compacted["last_collaboration_summary"] = summarize_collaboration_results(value)
+            continue
+        if key in HISTORY_KEYS and isinstance(value, list) and len(value) > history_limit:
+            value = value[-history_limit:]
+        compacted[key] = value
+    return compacted
+
+
+def _render_value(value: Any) -> str:
+    if isinstance(value, (dict, list, tuple)):
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+    return str(value)
+
+
+def render_context_lines(context: Dict[str, Any], max_tokens: int, value_tokens: Optional[int] = None) -> List[str]:
+    """
+    把上下文渲染为 "- key: value" 行，总量不超过 max_tokens
+
+    单个值超过 value_tokens 时截断；预算用尽后剩余字段以一行说明代替。
+    """
+    value_tokens = value_tokens or PROMPT_CONFIG["context_value_tokens"]
+    lines: List[str] = []
+    used = 0
+    items = [(k, v) for k, v in (context or {}).items() if v and k not in RAW_PAYLOAD_KEYS and k not in HISTORY_KEYS]
+    for index, (key, value) in enumerate(items):
+        line = f"- {key}: {truncate_to_tokens(_render_value(value), value_tokens)}"
+        cost = count_tokens(line)
+        if used + cost > max_tokens:
+            lines.append(f"- （其余 {len(items) - index} 项上下文已省略）")
+            break
+        lines.append(line)
+        used += cost
+    return lines
+
+
+class PromptSizeMetrics:
+    """提示词体积统计：按智能体、提示词段落与对话轮次汇总 token 数"""
+
+    def __init__(self):
+        self._turn: ContextVar[Optional[Dict[str, int]]] = ContextVar("prompt_turn", default=None)
+        self.reset()
+
+    def reset(self) -> None:
+        self.by_agent: Dict[str, Dict[str, int]] = {}
+        self.sections: Dict[str, Dict[str, int]] = {}
+        self.turns = {"count": 0, "total": 0, "max": 0, "last": 0}
+
+    @staticmethod
+    def _add(bucket: Dict[str, int], tokens: int) -> None:
+        bucket["count"] = bucket.get("count", 0) + 1
+        bucket["total"] = bucket.get("total", 0) + tokens
+        bucket["max"] = max(bucket.get("max", 0), tokens)
+        bucket["last"] = tokens
+
+    def record(self, agent_id: str, tokens: int) -> None:
+        """记录一次模型调用的提示词 token 数"""
+        self._add(self.by_agent.setdefault(agent_id, {}), tokens)
+        turn = self._turn.get()
+        while turn is not None:
+            turn["tokens"] += tokens
+            turn["calls"] += 1
+            turn = turn.get("parent")
+
+    def record_section(self, section: str, tokens: int) -> None:
+        """记录提示词中某一段落的 token 数"""
+        self._add(self.sections.setdefault(section, {}), tokens)
+
+    def begin_turn(self):
+        """开始统计一轮对话（同一调用链中的所有模型调用计入该轮）"""
+        return self._turn.set({"tokens": 0, "calls": 0})
+
+    def begin_scope(self) -> Dict[str, Any]:
+        """在当前上下文（通常是新建任务的上下文副本）中开始子统计，返回其计数；调用仍计入所在轮次"""
+        scope = {"tokens": 0, "calls": 0, "parent": self._turn.get()}
+        self._turn.set(scope)
+        return scope
+
+    def end_turn(self, token) -> None:
+        turn = self._turn.get()
+        self._turn.reset(token)
+        if turn and turn["calls"]:
+            self._add(self.turns, turn["tokens"])
+
+    @staticmethod
+    def _summary(bucket: Dict[str, int]) -> Dict[str, Any]:
+        count = bucket.get("count", 0)
+        return {
+            "count": count,
+            "avg_tokens": round(bucket.get("total", 0) / count, 1) if count else 0.0,
+            "max_tokens": bucket.get("max", 0),
+            "last_tokens": bucket.get("last", 0)
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "per_turn": self._summary(self.turns),
+            "by_agent": {agent: self._summary(bucket) for agent, bucket in self.by_agent.items()},
+            "sections": {section: self._summary(bucket) for section, bucket in self.sections.items()}
+        }
+
+
+# 全局提示词体积统计
+prompt_metrics = PromptSizeMetrics()
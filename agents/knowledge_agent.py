@@ -14,6 +14,7 @@ import logging
 from typing import Dict, List, Optional, Any
 
 from .base_agent import BaseAgent, AgentResponse, Message
+from .prompt_builder import get_section_budget
 
 logger = logging.getLogger(__name__)
 
@@ -127,18 +128,8 @@ class KnowledgeAgent(BaseAgent):
 
     def _build_knowledge_prompt(self, message: Message, context: Dict[str, Any]) -> str:
         """构建知识咨询提示词（输出为纯自然语言，禁止JSON/代码块）"""
-        # 获取对话历史
-        conversation_history = context.get("conversation_history", [])
-        history_text = ""
-        if conversation_history:
-            recent_history = conversation_history[-3:]  # 最近3轮对话
-            history_text = "\n".join([
-                f"用户: {h.get('user', '')}\n助手: {h.get('assistant', '')}" 
-                for h in recent_history if h.get('user') and h.get('assistant')
-            ])
-        
-        # 构建完整提示词
-        prompt = f"""
+        builder = self._new_prompt_builder(include_system_prompt=False)
+        builder.add("task", f"""
 作为专业的服装知识顾问，请先进行边界检查，再提供清晰、实用的自然语言回答。
 
 ## 边界检查（重要）：
@@ -149,9 +140,13 @@ class KnowledgeAgent(BaseAgent):
 - 尺寸咨询、尺码选择 → 转接销售智能体
 
 用户问题：{message.content}
-
-{f"对话历史：{history_text}" if history_text else ""}
-
+""")
+        
+        # 对话历史（预算内尽量保留最近的轮次）
+        builder.add_items("history", self._history_items(context.get("conversation_history", [])), priority=1,
+                          header="对话历史：", max_tokens=get_section_budget("history"))
+        
+        builder.add("request", """
 ## 输出要求（务必遵守）：
 - 使用纯自然语言，不要输出任何JSON或代码块（禁止```json```）。
 - 结构化但自然：
@@ -162,8 +157,8 @@ class KnowledgeAgent(BaseAgent):
   5) 可选：延伸阅读或相关问题提示（1-3条）。
 - 用通俗易懂的语言解释专业概念，避免过度术语。
 - 不进行商品购买建议或价格讨论，涉及购买请明确建议转接销售智能体。
-"""
-        return prompt
+""")
+        return builder.build()
 
     async def _generate_knowledge_response(self, prompt: str) -> str:
         """使用GPT-4o生成知识回答"""
@@ -177,12 +172,11 @@ class KnowledgeAgent(BaseAgent):
             ]
             
             # 使用统一的智能体响应接口，自动选择模型并返回文本内容
-            llm_response = await self.llm_client.get_agent_response(
-                agent_name=self.agent_id,
+            content = await self._request_llm(
                 messages=messages,
                 context_info={"agent_type": "knowledge"}
             )
-            return llm_response.content or self._fallback_knowledge_response()
+            return content or self._fallback_knowledge_response()
             
         except Exception as e:
             logger.error(f"GPT-4o知识回答生成失败: {e}")
@@ -5,6 +5,7 @@
 """
 from typing import Dict, Any, List
 from agents.base_agent import BaseAgent, Message, AgentResponse, IntentType
+from agents.prompt_builder import get_section_budget
 import logging
 import json
 import re
@@ -15,6 +16,8 @@ logger = logging.getLogger(__name__)
 class OrderAgent(BaseAgent):
     """订单智能体 - 智能化版本"""
     
+    conversation_state_attrs = BaseAgent.conversation_state_attrs + ("order_sessions",)
+    
     def __init__(self, agent_id: str = "order_agent", llm_client=None, config: Dict[str, Any] = None):
         super().__init__(agent_id, "order", llm_client, config)
         
@@ -158,23 +161,22 @@ class OrderAgent(BaseAgent):
     def _build_order_prompt(self, message: Message, session: Dict[str, Any], context: Dict[str, Any] = None) -> str:
         """构建订单处理提示词"""
         prompt_parts = [
-            self.get_system_prompt(),
             "",
             f"## 当前服务阶段：{session['stage']}",
             f"## 客户信息：{json.dumps(session['customer_info'], ensure_ascii=False) if session['customer_info'] else '暂无'}",
             f"## 订单信息：{json.dumps(session['order_info'], ensure_ascii=False) if session['order_info'] else '暂无'}",
         ]
         
-        # 添加对话历史
+        builder = self._new_prompt_builder()
+        builder.add("state", "\n".join(prompt_parts))
+        
+        # 添加对话历史（预算内尽量保留最近的轮次）
         history = self._get_conversation_history(message.conversation_id)
-        if history:
-            prompt_parts.append("\n### 对话历史：")
-            for item in history[-3:]:  # 保留最近3轮对话
-                prompt_parts.append(f"客户: {item['user']}")
-                prompt_parts.append(f"客服: {item['assistant']}")
+        builder.add_items("history", self._history_items(history, "客户", "客服"), priority=1,
+                          header="\n### 对话历史：", max_tokens=get_section_budget("history"))
         
         # 添加当前消息和任务
-        prompt_parts.extend([
+        builder.add("request", "\n".join([
             f"\n## 客户当前消息：",
             message.content,
             "",
@@ -206,9 +208,9 @@ class OrderAgent(BaseAgent):
             '  "requires_human": false,',
             '  "transfer_reason": "如果需要转接，说明转接原因"',
             "}"
-        ])
+        ]))
         
-        return "\n".join(prompt_parts)
+        return builder.build()
 
     def _build_order_info_prompt(self, message: Message, order_info: Dict, session: Dict[str, Any]) -> str:
         """构建包含订单信息的提示词"""
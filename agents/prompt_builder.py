@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+提示词构建器
+
+按优先级组装提示词段落（系统提示、上下文、对话历史、搜索结果等），
+总量控制在智能体的 token 预算内：必需段落始终保留，其余段落按优先级依次分配剩余预算，
+放不下时文本段落截断，列表段落（对话历史、搜索结果）按条目丢弃。
+"""
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config.settings import PROMPT_CONFIG
+from utils.tokenizer import count_tokens, truncate_to_tokens
+from .context_compaction import prompt_metrics
+
+logger = logging.getLogger(__name__)
+
+# 静态段落缓存：key -> (文本, token 数)
+_static_sections: Dict[str, Tuple[str, int]] = {}
+
+
+def get_prompt_budget(agent_id: str) -> int:
+    """获取智能体的提示词 token 预算"""
+    budgets = PROMPT_CONFIG["agent_budgets"]
+    return budgets.get(agent_id, budgets["default"])
+
+
+def get_section_budget(section: str) -> Optional[int]:
+    """获取段落的 token 上限，未配置时不单独限制"""
+    return PROMPT_CONFIG["section_budgets"].get(section)
+
+
+@dataclass
+class _Section:
+    name: str
+    priority: int
+    text: str = ""
+    items: List[str] = field(default_factory=list)
+    header: str = ""
+    max_tokens: Optional[int] = None
+    min_tokens: int = 0
+    keep_latest: bool = True
+    tokens: Optional[int] = None  # 预先计算的 token 数（静态段落）
+
+
+class PromptBuilder:
+    """带 token 预算的提示词构建器"""
+
+    # 必需段落：不参与裁剪（系统提示、当前消息、输出格式要求等）
+    REQUIRED = 0
+
+    def __init__(self, agent_id: str, budget: Optional[int] = None, separator: str = "\n"):
+        self.agent_id = agent_id
+        self.budget = budget or get_prompt_budget(agent_id)
+        self.separator = separator
+        self._sections: List[_Section] = []
+        self.section_tokens: Dict[str, int] = {}
+        self.dropped: List[str] = []
+
+    def add(self, name: str, text: str, priority: int = REQUIRED,
+            max_tokens: Optional[int] = None, min_tokens: int = 32) -> "PromptBuilder":
+        """
+        添加文本段落
+
+        Args:
+            priority: 数值越小越优先，REQUIRED 段落始终完整保留
+            max_tokens: 段落自身的 token 上限
+            min_tokens: 剩余预算不足该值时整段丢弃而不是截断成残句
+        """
+        if text:
+            self._sections.append(_Section(name=name, priority=priority, text=text,
+                                           max_tokens=max_tokens, min_tokens=min_tokens))
+        return self
+
+    def add_items(self, name: str, items: List[str], priority: int, header: str = "",
+                  max_tokens: Optional[int] = None, keep_latest: bool = True) -> "PromptBuilder":
+        """
+        添加列表段落，预算不足时按条目丢弃
+
+        keep_latest 为 True 时保留末尾条目（对话历史），为 False 时保留开头条目（按相关度排序的搜索结果）。
+        """
+        items = [item for item in items if item]
+        if items:
+            self._sections.append(_Section(name=name, priority=priority, items=items, header=header,
+                                           max_tokens=max_tokens, keep_latest=keep_latest))
+        return self
+
+    def add_static(self, name: str, key: str, factory: Callable[[], str]) -> "PromptBuilder":
+        """添加静态段落（如系统提示词），文本与 token 数按 key 缓存"""
+        cached = _static_sections.get(key)
+        if cached is None:
+            text = factory() or ""
+            cached = _static_sections[key] = (text, count_tokens(text))
+        if cached[0]:
+            self._sections.append(_Section(name=name, priority=self.REQUIRED, text=cached[0], tokens=cached[1]))
+        return self
+
+    def _fit_items(self, section: _Section, budget: int) -> Tuple[str, int]:
+        header_tokens = count_tokens(section.header) if section.header else 0
+        kept: List[str] = []
+        used = header_tokens
+        candidates = reversed(section.items) if section.keep_latest else section.items
+        for item in candidates:
+            cost = count_tokens(item)
+            if used + cost > budget:
+                break
+            kept.append(item)
+            used += cost
+        if not kept:
+            # 首选条目本身就超出预算时截断保留，避免整段丢失
+            if budget - header_tokens < 32:
+                return "", 0
+            first = section.items[-1] if section.keep_latest else section.items[0]
+            kept = [truncate_to_tokens(first, budget - header_tokens)]
+            used = header_tokens + count_tokens(kept[0])
+        if section.keep_latest:
+            kept.reverse()
+        lines = ([section.header] if section.header else []) + kept
+        return self.separator.join(lines), used
+
+    def _fit_text(self, section: _Section, budget: int) -> Tuple[str, int]:
+        cost = section.tokens if section.tokens is not None else count_tokens(section.text)
+        if cost <= budget:
+            return section.text, cost
+        if budget < section.min_tokens:
+            return "", 0
+        text = truncate_to_tokens(section.text, budget)
+        return text, count_tokens(text)
+
+    def build(self) -> str:
+        """按优先级分配预算并按添加顺序输出各段落"""
+        rendered: Dict[int, str] = {}
+        remaining = self.budget
+        order = sorted(range(len(self._sections)), key=lambda i: (self._sections[i].priority, i))
+        for index in order:
+            section = self._sections[index]
+            if section.priority == self.REQUIRED:
+                budget = float("inf")
+            else:
+                budget = max(remaining, 0)
+                if section.max_tokens is not None:
+                    budget = min(budget, section.max_tokens)
+            if section.items:
+                text, used = self._fit_items(section, budget)
+            else:
+                text, used = self._fit_text(section, budget)
+            if not text:
+                self.dropped.append(section.name)
+                continue
+            rendered[index] = text
+            remaining -= used
+            self.section_tokens[section.name] = self.section_tokens.get(section.name, 0) + used
+
+        for name, tokens in self.section_tokens.items():
+            prompt_metrics.record_section(name, tokens)
+        if self.dropped:
+            logger.debug(f"{self.agent_id} 提示词超出预算 {self.budget}，已丢弃段落: {self.dropped}")
+        return self.separator.join(rendered[i] for i in sorted(rendered))
@@ -5,16 +5,28 @@
 """
 from typing import Dict, Any, List
 from agents.base_agent import BaseAgent, Message, AgentResponse, IntentType
+from agents.prompt_builder import get_section_budget
+from utils.keyword_matcher import KeywordMatcher
 import logging
 import json
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# 强知识咨询意图关键词
+KNOWLEDGE_INTENT_MATCHER = KeywordMatcher({
+    "knowledge": [
+        "材质", "保养", "洗涤", "面料", "质量", "怎么选", "如何选择", "如何清洁", "清洁", "耐用性", "成分", "特性", "护理", "护理方法", "防皱", "防菌", "缩水", "褪色"
+    ],
+    "howto": ["怎么", "如何", "指南"]
+})
+
 
 class SalesAgent(BaseAgent):
     """销售智能体 - 智能化版本"""
     
+    conversation_state_attrs = BaseAgent.conversation_state_attrs + ("sales_sessions",)
+    
     def __init__(self, agent_id: str = "sales_agent", llm_client=None, config: Dict[str, Any] = None):
         super().__init__(agent_id, "sales", llm_client, config)
         
@@ -184,21 +196,22 @@ class SalesAgent(BaseAgent):
 
             # 为每个单品搜索商品
             grouped_results: Dict[str, List[Dict[str, Any]]] = {}
-            for item in items[:6]:
-                products = []
+            search_results: Dict[str, Dict[str, Any]] = {}
+            if self.product_search_service:
                 try:
-                    if self.product_search_service:
-                        search_result = await self.product_search_service.search_products(
-                            keyword=item,
-                            page=1,
-                            page_size=3,
-                            sort="total_sales_des",
-                        )
-                        products = (search_result or {}).get("items", [])
-                    else:
-                        products = self._get_mock_products({"keyword": item})[:3]
+                    search_results = await self.product_search_service.search_many(
+                        items[:6],
+                        page=1,
+                        page_size=3,
+                        sort="total_sales_des",
+                    )
                 except Exception as e:
-                    logger.warning(f"销售智能体搜索单品失败: {item} - {e}")
+                    logger.warning(f"销售智能体批量搜索单品失败: {items[:6]} - {e}")
+            for item in items[:6]:
+                if self.product_search_service:
+                    products = (search_results.get(item.strip()) or {}).get("items", [])
+                else:
+                    products = self._get_mock_products({"keyword": item})[:3]
                 grouped_results[item] = products
 
             # 格式化输出
@@ -294,7 +307,6 @@ class SalesAgent(BaseAgent):
     def _build_sales_prompt(self, message: Message, session: Dict[str, Any], context: Dict[str, Any] = None) -> str:
         """构建销售提示词"""
         prompt_parts = [
-            self.get_system_prompt(),
             "",
             f"## 当前销售阶段：{session['stage']}",
             f"## 已收集需求：{json.dumps(session['requirements'], ensure_ascii=False) if session['requirements'] else '暂无'}",
@@ -336,16 +348,16 @@ class SalesAgent(BaseAgent):
             prompt_parts.append("JSON响应可以设置：\"stage\": \"satisfaction_inquiry\"")
             prompt_parts.append("")
         
-        # 添加对话历史
+        builder = self._new_prompt_builder()
+        builder.add("state", "\n".join(prompt_parts))
+        
+        # 添加对话历史（预算内尽量保留最近的轮次）
         history = self._get_conversation_history(message.conversation_id)
-        if history:
-            prompt_parts.append("\n### 对话历史：")
-            for item in history[-3:]:  # 保留最近3轮对话
-                prompt_parts.append(f"客户: {item['user']}")
-                prompt_parts.append(f"销售: {item['assistant']}")
+        builder.add_items("history", self._history_items(history, "客户", "销售"), priority=1,
+                          header="\n### 对话历史：", max_tokens=get_section_budget("history"))
         
         # 添加当前消息和任务
-        prompt_parts.extend([
+        builder.add("request", "\n".join([
             f"\n## 客户当前消息：",
             message.content,
             "",
@@ -384,14 +396,13 @@ class SalesAgent(BaseAgent):
             '  "suggested_agents": ["如需转接其他智能体：order_agent/knowledge_agent/styling_agent"],',
             '  "requires_human": false',
             "}"
-        ])
+        ]))
         
-        return "\n".join(prompt_parts)
+        return builder.build()
 
     def _build_product_display_prompt(self, message: Message, search_results: Dict[str, Any], session: Dict[str, Any]) -> str:
         """构建产品展示提示词（图二风格展示 + 销售总结，无破折号）"""
         prompt_parts = [
-            self.get_system_prompt(),
             "",
             "## 任务：按“图二风格”先展示产品信息，再输出销售风格总结",
             f"## 客户需求：{json.dumps(session['requirements'], ensure_ascii=False)}",
@@ -408,44 +419,51 @@ class SalesAgent(BaseAgent):
             "## 搜索到的商品：",
         ]
 
-        # 处理搜索结果（最多6个）
-        if search_results.get('success') and search_results.get('items'):
-            products = search_results['items'][:6]
+        # 处理搜索结果（最多6个，超出预算时保留排序靠前的商品）
+        products = search_results['items'][:6] if search_results.get('success') and search_results.get('items') else []
+        if products:
             prompt_parts.append(f"找到 {search_results.get('count', len(products))} 个相关商品")
-            prompt_parts.append("")
-            for i, product in enumerate(products, 1):
-                title = product.get('title', '未知商品')
-                price = product.get('price')
-                sale_price = product.get('quanhou_jiage')
-                coupon = product.get('coupon_info_money')
-                brand = product.get('brand') or '未知'
-                shop = product.get('nick') or '未知'
-                volume = product.get('volume')
-                desc = product.get('jianjie')
-                link = self._resolve_product_link(product)
-
-                prompt_parts.append(f"商品{i}：{title}")
-                if price is not None:
-                    prompt_parts.append(f"💰 原价：¥{price}")
-                if sale_price:
-                    prompt_parts.append(f"💳 券后价：¥{sale_price}")
-                if coupon:
-                    prompt_parts.append(f"🎁 优惠券：¥{coupon}")
-                prompt_parts.append(f"🏷️ 品牌：{brand}")
-                prompt_parts.append(f"🏪 店铺：{shop}")
-                if volume is not None:
-                    prompt_parts.append(f"📈 销量：{volume}")
-                if desc:
-                    prompt_parts.append(f"📝 简介：{desc}")
-                if link:
-                    prompt_parts.append(f"🔗 链接：{link}")
-                prompt_parts.append("==========================")
         else:
             prompt_parts.append("未找到相关商品")
-            prompt_parts.append("")
+        prompt_parts.append("")
+        builder = self._new_prompt_builder()
+        builder.add("task", "\n".join(prompt_parts))
+
+        product_blocks = []
+        for i, product in enumerate(products, 1):
+            block = []
+            title = product.get('title', '未知商品')
+            price = product.get('price')
+            sale_price = product.get('quanhou_jiage')
+            coupon = product.get('coupon_info_money')
+            brand = product.get('brand') or '未知'
+            shop = product.get('nick') or '未知'
+            volume = product.get('volume')
+            desc = product.get('jianjie')
+            link = self._resolve_product_link(product)
+
+            block.append(f"商品{i}：{title}")
+            if price is not None:
+                block.append(f"💰 原价：¥{price}")
+            if sale_price:
+                block.append(f"💳 券后价：¥{sale_price}")
+            if coupon:
+                block.append(f"🎁 优惠券：¥{coupon}")
+            block.append(f"🏷️ 品牌：{brand}")
+            block.append(f"🏪 店铺：{shop}")
+            if volume is not None:
+                block.append(f"📈 销量：{volume}")
+            if desc:
+                block.append(f"📝 简介：{desc}")
+            if link:
+                block.append(f"🔗 链接：{link}")
+            block.append("==========================")
+            product_blocks.append("\n".join(block))
+        builder.add_items("search_results", product_blocks, priority=1, keep_latest=False,
+                          max_tokens=get_section_budget("search_results"))
 
         # 输出总结与推荐的明确指令
-        prompt_parts.extend([
+        builder.add("request", "\n".join([
             "",
             "## 写作任务：生成‘产品特性总结（销售风格）’",
             "- 用自然口语化的销售话术，针对用户需求总结价格、材质、品质、适用场景等",
@@ -462,20 +480,17 @@ class SalesAgent(BaseAgent):
             '  "recommended_products": [1,2,3],',
             '  "next_action": "continue"',
             "}"
-        ])
+        ]))
 
-        return "\n".join(prompt_parts)
+        return builder.build()
 
     def _has_strong_knowledge_intent(self, content: str) -> bool:
         """简单规则识别强知识咨询意图：材质/保养/洗涤/面料/清洁/耐用性/成分/特性等。"""
         if not content:
             return False
-        text = content.strip()
-        knowledge_keywords = [
-            "材质", "保养", "洗涤", "面料", "质量", "怎么选", "如何选择", "如何清洁", "清洁", "耐用性", "成分", "特性", "护理", "护理方法", "防皱", "防菌", "缩水", "褪色"
-        ]
-        hits = sum(1 for k in knowledge_keywords if k in text)
-        return hits >= 2 or (hits >= 1 and any(x in text for x in ["怎么", "如何", "指南"]))
+        matched = KNOWLEDGE_INTENT_MATCHER.scan(content.strip())
+        hits = len(matched.get("knowledge", ()))
+        return hits >= 2 or (hits >= 1 and "howto" in matched)
 
     def _resolve_product_link(self, product: Dict[str, Any]) -> str:
         """直接返回API返回的原始链接，不进行任何优化。"""
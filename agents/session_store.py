@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+"""
+智能调度器会话存储
+提供内存（LRU + 空闲过期）与 SQLite（跨进程、重启后保留）两种实现
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field, fields
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# 会话状态枚举
+class SessionStatus(Enum):
+    ACTIVE = "活跃"
+    COLLABORATING = "协作中"
+    WAITING = "等待中"
+    COMPLETED = "已完成"
+    ERROR = "异常"
+
+
+@dataclass
+class SmartSession:
+    """智能会话管理"""
+    user_id: str
+    session_id: str
+    current_agents: List[str] = field(default_factory=list)
+    collaboration_tasks: List[str] = field(default_factory=list)
+    context: Dict[str, Any] = field(default_factory=dict)
+    conversation_history: List[Dict[str, Any]] = field(default_factory=list)
+    start_time: datetime = field(default_factory=datetime.now)
+    last_active: datetime = field(default_factory=datetime.now)
+    status: SessionStatus = SessionStatus.ACTIVE
+    performance_metrics: Dict[str, Any] = field(default_factory=dict)
+    # 以下字段由存储层维护、不参与序列化：读取时的版本号及对话记录/协作任务条数，用于并发保存时合并
+    version: int = field(default=0, repr=False)
+    loaded_history: int = field(default=0, repr=False)
+    loaded_tasks: int = field(default=0, repr=False)
+
+
+def serialize_session(session: SmartSession) -> str:
+    """会话序列化为紧凑JSON；含无法序列化的值时抛出 TypeError，而不是静默转成字符串"""
+    return json.dumps({
+        "user_id": session.user_id,
+        "session_id": session.session_id,
+        "current_agents": session.current_agents,
+        "collaboration_tasks": session.collaboration_tasks,
+        "context": session.context,
+        "conversation_history": session.conversation_history,
+        "start_time": session.start_time.isoformat(),
+        "last_active": session.last_active.isoformat(),
+        "status": session.status.name,
+        "performance_metrics": session.performance_metrics
+    }, ensure_ascii=False, separators=(",", ":"))
+
+
+def deserialize_session(data: str) -> SmartSession:
+    """从JSON还原会话"""
+    raw = json.loads(data)
+    return SmartSession(
+        user_id=raw["user_id"],
+        session_id=raw["session_id"],
+        current_agents=raw.get("current_agents", []),
+        collaboration_tasks=raw.get("collaboration_tasks", []),
+        context=raw.get("context", {}),
+        conversation_history=raw.get("conversation_history", []),
+        start_time=datetime.fromisoformat(raw["start_time"]),
+        last_active=datetime.fromisoformat(raw["last_active"]),
+        status=SessionStatus[raw.get("status", "ACTIVE")],
+        performance_metrics=raw.get("performance_metrics", {})
+    )
+
+
+def merge_session(stored: SmartSession, session: SmartSession) -> SmartSession:
+    """
+    合并并发保存的会话
+
+    以已保存的最新会话为基础，追加 session 读取之后新增的对话记录与协作任务；
+    当前智能体、状态以 session 为准，上下文与性能指标按键覆盖。
+    """
+    stored.conversation_history.extend(session.conversation_history[session.loaded_history:])
+    stored.collaboration_tasks.extend(session.collaboration_tasks[session.loaded_tasks:])
+    stored.current_agents = session.current_agents
+    stored.context.update(session.context)
+    stored.status = session.status
+    stored.last_active = max(stored.last_active, session.last_active)
+    stored.performance_metrics.update(session.performance_metrics)
+    return stored
+
+
+class SessionStore(ABC):
+    """会话存储抽象基类"""
+
+    def __init__(self, ttl: int = 86400, max_history: int = 50):
+        """
+        Args:
+            ttl: 会话空闲过期时间（秒）
+            max_history: 每个会话保留的最近对话记录条数
+        """
+        self.ttl = ttl
+        self.max_history = max_history
+
+    def trim(self, session: SmartSession) -> None:
+        """截断过长的对话记录与协作任务列表"""
+        if len(session.conversation_history) > self.max_history:
+            del session.conversation_history[:-self.max_history]
+        if len(session.collaboration_tasks) > self.max_history:
+            del session.collaboration_tasks[:-self.max_history]
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[SmartSession]:
+        """获取会话，不存在或已过期时返回 None"""
+        pass
+
+    @abstractmethod
+    async def save(self, key: str, session: SmartSession) -> None:
+        """保存会话"""
+        pass
+
+    @abstractmethod
+    async def delete(self, key: str) -> bool:
+        """删除会话"""
+        pass
+
+    @abstractmethod
+    async def cleanup(self, inactive_before: datetime) -> int:
+        """删除最后活跃时间早于 inactive_before 的会话，返回删除数量"""
+        pass
+
+    @abstractmethod
+    def count(self) -> int:
+        """当前保存的会话数"""
+        pass
+
+
+class MemorySessionStore(SessionStore):
+    """
+    内存会话存储
+
+    按最近活跃顺序保存在 OrderedDict 中：超过容量淘汰最久未活跃的会话，
+    空闲超过 ttl 的会话在读写时从队首顺带清理。
+    """
+
+    def __init__(self, max_sessions: int = 10000, ttl: int = 86400, max_history: int = 50):
+        super().__init__(ttl=ttl, max_history=max_history)
+        self.max_sessions = max_sessions
+        # key -> (会话, 最后访问时间戳)
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+        self.evicted = 0
+
+    def _purge_expired(self, now: float) -> None:
+        while self._sessions:
+            key, (_, touched_at) = next(iter(self._sessions.items()))
+            if now - touched_at <= self.ttl:
+                break
+            self._sessions.popitem(last=False)
+            self.evicted += 1
+
+    async def get(self, key: str) -> Optional[SmartSession]:
+        now = time.time()
+        self._purge_expired(now)
+        item = self._sessions.get(key)
+        if item is None:
+            return None
+        self._sessions[key] = (item[0], now)
+        self._sessions.move_to_end(key)
+        return item[0]
+
+    async def save(self, key: str, session: SmartSession) -> None:
+        now = time.time()
+        self.trim(session)
+        self._sessions[key] = (session, now)
+        self._sessions.move_to_end(key)
+        self._purge_expired(now)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evicted += 1
+
+    async def delete(self, key: str) -> bool:
+        return self._sessions.pop(key, None) is not None
+
+    async def cleanup(self, inactive_before: datetime) -> int:
+        stale = [key for key, (session, _) in self._sessions.items() if session.last_active < inactive_before]
+        for key in stale:
+            del self._sessions[key]
+        return len(stale)
+
+    def count(self) -> int:
+        return len(self._sessions)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    SQLite 会话存储
+
+    会话以紧凑JSON保存，同一主机上的多个工作进程共享，服务重启后保留。
+    数据库操作在线程池中执行，不阻塞事件循环；每隔 cleanup_interval 次写入清理一次过期会话。
+    每行带版本号（乐观并发控制）：读取后会话已被其他请求保存时，在最新版本上合并本次新增的记录再写入。
+    """
+
+    def __init__(self, path: str, ttl: int = 86400, max_history: int = 50, cleanup_interval: int = 500,
+                 count_refresh_interval: float = 5.0):
+        super().__init__(ttl=ttl, max_history=max_history)
+        self.path = path
+        self.cleanup_interval = cleanup_interval
+        self.count_refresh_interval = count_refresh_interval
+        self._writes = 0
+        self.conflicts = 0
+        self._count = 0
+        self._counted_at = 0.0
+        self._count_task: Optional[asyncio.Task] = None
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS dispatcher_sessions ("
+                "session_key TEXT PRIMARY KEY, "
+                "last_active REAL NOT NULL, "
+                "data TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_dispatcher_sessions_last_active "
+                "ON dispatcher_sessions (last_active)"
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(dispatcher_sessions)")]
+            if "version" not in columns:
+                conn.execute("ALTER TABLE dispatcher_sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        self._refresh_count_sync()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5.0)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _get_sync(self, key: str) -> Optional[SmartSession]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT data, last_active, version FROM dispatcher_sessions WHERE session_key = ?", (key,)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        session = deserialize_session(row[0])
+        session.version = row[2]
+        session.loaded_history = len(session.conversation_history)
+        session.loaded_tasks = len(session.collaboration_tasks)
+        return session
+
+    def _save_sync(self, key: str, session: SmartSession, purge: bool) -> tuple:
+        """在一个写事务中核对版本、必要时合并并写入，返回 (写入的会话, 新版本号)"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT data, last_active, version FROM dispatcher_sessions WHERE session_key = ?", (key,)
+            ).fetchone()
+            version = 1
+            if row is not None:
+                version = row[2] + 1
+                if row[2] != session.version and now - row[1] <= self.ttl:
+                    # 读取之后已被其他请求（或进程）保存：在最新版本上合并，避免覆盖对方的对话记录
+                    session = merge_session(deserialize_session(row[0]), session)
+                    self.conflicts += 1
+            self.trim(session)
+            conn.execute(
+                "INSERT INTO dispatcher_sessions (session_key, last_active, data, version) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(session_key) DO UPDATE SET last_active = excluded.last_active, "
+                "data = excluded.data, version = excluded.version",
+                (key, now, serialize_session(session), version)
+            )
+            if purge:
+                conn.execute("DELETE FROM dispatcher_sessions WHERE last_active < ?", (now - self.ttl,))
+        return session, version
+
+    def _execute_sync(self, sql: str, params: tuple) -> int:
+        with self._connect() as conn:
+            return conn.execute(sql, params).rowcount
+
+    async def get(self, key: str) -> Optional[SmartSession]:
+        try:
+            return await asyncio.to_thread(self._get_sync, key)
+        except Exception as e:
+            logger.error(f"读取会话失败 {key}: {e}")
+            return None
+
+    async def save(self, key: str, session: SmartSession) -> None:
+        """保存会话；会话含无法序列化的值时抛出 TypeError"""
+        self._writes += 1
+        purge = self._writes % self.cleanup_interval == 0
+        try:
+            saved, version = await asyncio.to_thread(self._save_sync, key, session, purge)
+        except sqlite3.Error as e:
+            logger.error(f"保存会话失败 {key}: {e}")
+            return
+        if saved is not session:
+            # 发生了合并：调用方持有的会话同步为写入后的内容
+            for f in fields(SmartSession):
+                setattr(session, f.name, getattr(saved, f.name))
+        session.version = version
+        session.loaded_history = len(session.conversation_history)
+        session.loaded_tasks = len(session.collaboration_tasks)
+
+    async def delete(self, key: str) -> bool:
+        return await asyncio.to_thread(
+            self._execute_sync, "DELETE FROM dispatcher_sessions WHERE session_key = ?", (key,)
+        ) > 0
+
+    async def cleanup(self, inactive_before: datetime) -> int:
+        return await asyncio.to_thread(
+            self._execute_sync, "DELETE FROM dispatcher_sessions WHERE last_active < ?", (inactive_before.timestamp(),)
+        )
+
+    def _refresh_count_sync(self) -> None:
+        try:
+            with self._connect() as conn:
+                self._count = conn.execute(
+                    "SELECT COUNT(*) FROM dispatcher_sessions WHERE last_active >= ?", (time.time() - self.ttl,)
+                ).fetchone()[0]
+        except Exception as e:
+            logger.error(f"统计会话数失败: {e}")
+        self._counted_at = time.monotonic()
+
+    def count(self) -> int:
+        """
+        返回缓存的会话数
+
+        缓存超过 count_refresh_interval 秒时刷新：在事件循环中于线程池后台刷新（本次仍返回旧值），
+        不在事件循环上执行同步查询；没有运行中的事件循环时直接刷新。
+        """
+        if time.monotonic() - self._counted_at > self.count_refresh_interval:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
+            if loop is None:
+                self._refresh_count_sync()
+            elif self._count_task is None or self._count_task.done():
+                self._count_task = loop.create_task(asyncio.to_thread(self._refresh_count_sync))
+        return self._count
+
+
+def create_session_store(config: Dict[str, Any]) -> SessionStore:
+    """按配置创建会话存储：memory / sqlite"""
+    if config.get("backend") == "sqlite":
+        return SQLiteSessionStore(
+            path=config["sqlite_path"],
+            ttl=config["ttl"],
+            max_history=config["max_history"]
+        )
+    return MemorySessionStore(
+        max_sessions=config["max_sessions"],
+        ttl=config["ttl"],
+        max_history=config["max_history"]
+    )
@@ -3,10 +3,13 @@ import asyncio
 import json
 import logging
 import uuid
-from typing import Any, Dict, List, Optional
+from typing import Any, Awaitable, Dict, List, Optional
 from datetime import datetime
 
 from .base_agent import Message, AgentResponse
+from .context_compaction import summarize_collaboration_results
+from config.settings import BaseConfig
+from utils.streaming import reset_stream_sink, set_stream_sink
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +23,11 @@ class SmartCollaborationSystem:
         # 代理性能统计（由调度器在每次协作后更新）
         # 结构: { agent_id: { total_calls, success_calls, avg_response_time, min_response_time, max_response_time, last_updated } }
         self._agent_performance: Dict[str, Dict[str, Any]] = {}
+        # 单个代理默认超时与支持代理软截止时间（秒）
+        self.default_agent_timeout = 30
+        self.support_soft_deadline = BaseConfig.PERFORMANCE_CONFIG.get("support_soft_deadline", 8.0)
+        # 因软截止被移除的支持代理次数
+        self._dropped_supports: Dict[str, int] = {}
 
     async def analyze_collaboration_need(self, message: Message, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """分析是否需要协作，并输出推荐的协作方案。优先使用 LLM，失败时返回保守默认值。"""
@@ -74,11 +82,78 @@ class SmartCollaborationSystem:
         }
         return task
 
-    async def execute_collaboration_task(self, task: Dict[str, Any], agents: Dict[str, Any]) -> Dict[str, Any]:
+    async def invoke_agent(self, agents: Dict[str, Any], agent_id: str, role: str,
+                           message: Message, context: Dict[str, Any]) -> Dict[str, Any]:
+        """调用单个代理并封装为协作结果项，超时或异常时返回 error 项。"""
+        agent = agents.get(agent_id)
+        if not agent:
+            return {"agent_id": agent_id, "role": role, "error": "agent_not_found"}
+        timeout = self._get_agent_timeout(agent_id)
+        # 仅主代理向客户端流式输出，支持代理的生成内容不推送
+        sink_token = set_stream_sink(None) if role != "primary" else None
+        try:
+            resp: AgentResponse = await asyncio.wait_for(agent.process_message(message, context=context), timeout=timeout)
+            return {
+                "agent_id": agent_id,
+                "role": role,
+                "response": {
+                    "content": resp.content,
+                    "confidence": resp.confidence,
+                    "next_action": resp.next_action,
+                    "suggested_agents": resp.suggested_agents,
+                    "requires_human": resp.requires_human,
+                    "agent_id": resp.agent_id,
+                    "metadata": resp.metadata,
+                    "intent_type": getattr(resp.intent_type, "value", resp.intent_type),
+                    "escalation_reason": resp.escalation_reason,
+                    "timestamp": getattr(resp.timestamp, "isoformat", lambda: str(resp.timestamp))()
+                }
+            }
+        except asyncio.TimeoutError:
+            logger.warning(f"{'主' if role == 'primary' else '支持'}代理 {agent_id} 执行超时（{timeout}s）")
+            return {"agent_id": agent_id, "role": role, "error": "timeout"}
+        except Exception as e:
+            logger.exception(f"{'主' if role == 'primary' else '支持'}代理 {agent_id} 执行失败：{e}")
+            return {"agent_id": agent_id, "role": role, "error": str(e)}
+        finally:
+            if sink_token is not None:
+                reset_stream_sink(sink_token)
+
+    def _get_agent_timeout(self, agent_id: str) -> float:
+        """单个代理的执行超时（秒），取自 AGENT_CONFIG"""
+        return BaseConfig.AGENT_CONFIG.get(agent_id, {}).get("timeout", self.default_agent_timeout)
+
+    async def _collect_supports(self, support_tasks: Dict[str, "asyncio.Task"], started_at: float) -> List[Dict[str, Any]]:
+        """
+        等待支持代理结果，最多等到软截止时间（自 started_at 起计）
+
+        等待与主代理是否已完成无关：主代理先完成时支持代理仍可在软截止前返回；
+        超过软截止时间仍未返回的支持代理将被取消并从响应中移除，不拖慢整体响应。
+        """
+        if not support_tasks:
+            return []
+        remaining = self.support_soft_deadline - (asyncio.get_running_loop().time() - started_at)
+        done, pending = await asyncio.wait(support_tasks.values(), timeout=max(0.0, remaining))
+        for t in pending:
+            t.cancel()
+
+        collected: List[Dict[str, Any]] = []
+        for aid, t in support_tasks.items():
+            if t in done:
+                collected.append(t.result())
+            else:
+                self._dropped_supports[aid] = self._dropped_supports.get(aid, 0) + 1
+                logger.info(f"支持代理 {aid} 未在软截止时间 {self.support_soft_deadline}s 内完成，已从本轮响应中移除")
+        return collected
+
+    async def execute_collaboration_task(self, task: Dict[str, Any], agents: Dict[str, Any],
+                                         primary_result: Optional[Awaitable[Dict[str, Any]]] = None) -> Dict[str, Any]:
         """执行协作任务：调用主代理与支持代理，聚合结果。
         支持两种模式：
         - parallel：主代理与支持代理分别处理原始消息（并发执行）
         - sequential：先执行主代理，再将主响应内容作为消息传递给支持代理
+
+        primary_result 为调度器预先启动（推测执行）的主代理结果，提供时不再重复调用主代理。
         """
         results: List[Dict[str, Any]] = []
         message_dict = task.get("message")
@@ -93,42 +168,12 @@ class SmartCollaborationSystem:
         )
 
         async def _invoke(agent_id: str, role: str) -> Dict[str, Any]:
-            agent = agents.get(agent_id)
-            if not agent:
-                return {"agent_id": agent_id, "role": role, "error": "agent_not_found"}
-            try:
-                resp: AgentResponse = await agent.process_message(msg, context=task.get("context", {}))
-                payload = {
-                    "agent_id": agent_id,
-                    "role": role,
-                    "response": {
-                        "content": resp.content,
-                        "confidence": resp.confidence,
-                        "next_action": resp.next_action,
-                        "suggested_agents": resp.suggested_agents,
-                        "requires_human": resp.requires_human,
-                        "agent_id": resp.agent_id,
-                        "metadata": resp.metadata,
-                        "intent_type": getattr(resp.intent_type, "value", resp.intent_type),
-                        "escalation_reason": resp.escalation_reason,
-                        "timestamp": getattr(resp.timestamp, "isoformat", lambda: str(resp.timestamp))()
-                    }
-                }
-                return payload
-            except Exception as e:
-                logger.exception(f"代理 {agent_id} 执行失败：{e}")
-                return {"agent_id": agent_id, "role": role, "error": str(e)}
+            return await self.invoke_agent(agents, agent_id, role, msg, task.get("context", {}))
 
         primary_id = task.get("primary_agent")
         support_ids: List[str] = task.get("support_agents", [])
         workflow_type = task.get("workflow_type", "single")
 
-        # 主代理先执行
-        primary_payload = None
-        if primary_id:
-            primary_payload = await _invoke(primary_id, role="primary")
-            results.append(primary_payload)
-
         # 在所有场景下强制穿搭→销售的顺序协作：
         # 如果主代理是穿搭智能体，且当前支持列表中没有销售智能体，则追加销售智能体并切换为顺序协作。
         try:
@@ -138,62 +183,63 @@ class SmartCollaborationSystem:
         except Exception:
             pass
 
-        # 支持代理执行
-        if support_ids:
-            if workflow_type == "sequential" and primary_payload:
-                # 以主响应的内容作为支持代理的输入消息，并在 metadata 中附加来源信息
-                primary_resp = primary_payload.get("response", {})
-                derived_msg = Message(
-                    content=primary_resp.get("content", msg.content),
-                    sender_id=msg.sender_id,
-                    conversation_id=msg.conversation_id,
-                    message_type=msg.message_type,
-                    priority=msg.priority,
-                    metadata={
-                        **(msg.metadata or {}),
-                        "source_agent": primary_payload.get("agent_id"),
-                        "primary_response": primary_resp,
-                        "original_message": self._serialize_message(msg),
-                    },
-                )
-
-                async def _invoke_support(aid: str) -> Dict[str, Any]:
-                    agent = agents.get(aid)
-                    if not agent:
-                        return {"agent_id": aid, "role": "support", "error": "agent_not_found"}
-                    try:
-                        resp: AgentResponse = await agent.process_message(derived_msg, context=task.get("context", {}))
-                        payload = {
-                            "agent_id": aid,
-                            "role": "support",
-                            "response": {
-                                "content": resp.content,
-                                "confidence": resp.confidence,
-                                "next_action": resp.next_action,
-                                "suggested_agents": resp.suggested_agents,
-                                "requires_human": resp.requires_human,
-                                "agent_id": resp.agent_id,
-                                "metadata": resp.metadata,
-                                "intent_type": getattr(resp.intent_type, "value", resp.intent_type),
-                                "escalation_reason": resp.escalation_reason,
-                                "timestamp": getattr(resp.timestamp, "isoformat", lambda: str(resp.timestamp))()
-                            }
-                        }
-                        return payload
-                    except Exception as e:
-                        logger.exception(f"支持代理 {aid} 执行失败：{e}")
-                        return {"agent_id": aid, "role": "support", "error": str(e)}
-
-                support_results = await asyncio.gather(*[ _invoke_support(aid) for aid in support_ids ])
-                results.extend(support_results)
-            else:
-                # 并行模式或无主响应内容，则支持代理使用原始消息
-                support_results = await asyncio.gather(*[ _invoke(aid, role="support") for aid in support_ids ])
-                results.extend(support_results)
+        loop = asyncio.get_running_loop()
+
+        if workflow_type == "sequential":
+            # 主代理先执行
+            primary_payload = None
+            if primary_id:
+                if primary_result is not None:
+                    primary_payload = await primary_result
+                else:
+                    primary_payload = await _invoke(primary_id, role="primary")
+                results.append(primary_payload)
+
+            # 支持代理执行
+            if support_ids:
+                support_msg = msg
+                if primary_payload:
+                    # 以主响应的内容作为支持代理的输入消息，并在 metadata 中附加来源信息
+                    primary_resp = primary_payload.get("response", {})
+                    support_msg = Message(
+                        content=primary_resp.get("content", msg.content),
+                        sender_id=msg.sender_id,
+                        conversation_id=msg.conversation_id,
+                        message_type=msg.message_type,
+                        priority=msg.priority,
+                        metadata={
+                            **(msg.metadata or {}),
+                            "source_agent": primary_payload.get("agent_id"),
+                            "primary_response": primary_resp,
+                            "original_message": self._serialize_message(msg),
+                        },
+                    )
+                support_tasks = {
+                    aid: asyncio.create_task(self.invoke_agent(agents, aid, "support", support_msg, task.get("context", {})))
+                    for aid in support_ids
+                }
+                # 顺序模式下支持代理在主代理之后启动，软截止时间从支持代理启动时计
+                results.extend(await self._collect_supports(support_tasks, loop.time()))
+        else:
+            # 非顺序模式：主代理与支持代理同时执行，支持代理使用原始消息
+            started_at = loop.time()
+            support_tasks = {aid: asyncio.create_task(_invoke(aid, role="support")) for aid in support_ids}
+            try:
+                if primary_id:
+                    if primary_result is not None:
+                        results.append(await primary_result)
+                    else:
+                        results.append(await _invoke(primary_id, role="primary"))
+            except BaseException:
+                for t in support_tasks.values():
+                    t.cancel()
+                raise
+            results.extend(await self._collect_supports(support_tasks, started_at))
 
         final_context = task.get("context", {}).copy()
         final_context.update({
-            "last_collaboration_results": results,
+            # 只保留结构化摘要：完整结果会进入会话上下文并在后续每轮提示词中重复出现
+            "last_collaboration_summary": summarize_collaboration_results(results),
             "workflow_type": workflow_type,
         })
 
@@ -401,5 +447,6 @@ class SmartCollaborationSystem:
         return {
             "agent_performance": agent_perf,
             "total_agents": len(agent_perf),
+            "dropped_supports": dict(self._dropped_supports),
             "updated_at": datetime.now().isoformat(),
         }
@@ -14,6 +14,7 @@ import logging
 from typing import Dict, List, Optional, Any
 
 from .base_agent import BaseAgent, AgentResponse, Message
+from .prompt_builder import get_section_budget
 
 logger = logging.getLogger(__name__)
 
@@ -176,16 +177,6 @@ class StylingAgent(BaseAgent):
 
     def _build_styling_prompt(self, message: Message, context: Dict[str, Any]) -> str:
         """构建穿搭咨询提示词"""
-        # 获取对话历史
-        conversation_history = context.get("conversation_history", [])
-        history_text = ""
-        if conversation_history:
-            recent_history = conversation_history[-3:]  # 最近3轮对话
-            history_text = "\n".join([
-                f"用户: {h.get('user', '')}\n助手: {h.get('assistant', '')}" 
-                for h in recent_history if h.get('user') and h.get('assistant')
-            ])
-
         # 解析用户偏好信号（风格/场景等），用于提示词定向
         prefs = self._extract_preferences(message.content or "")
         pref_text_parts = []
@@ -196,7 +187,8 @@ class StylingAgent(BaseAgent):
         pref_text = ("\n" + "；".join(pref_text_parts)) if pref_text_parts else ""
         
         # 构建完整提示词（自然语言输出，禁止JSON）
-        prompt = f"""
+        builder = self._new_prompt_builder(include_system_prompt=False)
+        builder.add("task", f"""
 作为专业的服装搭配顾问，请分析用户的穿搭需求并提供专业建议。
 
 ## 边界检查规则（必须严格遵守）：
@@ -206,17 +198,21 @@ class StylingAgent(BaseAgent):
   *知识相关*：面料、材质、洗涤、保养、成分 → 转接知识智能体
 
 用户需求：{message.content}{pref_text}
-
-{f"对话历史：{history_text}" if history_text else ""}
-
+""")
+        
+        # 对话历史（预算内尽量保留最近的轮次）
+        builder.add_items("history", self._history_items(context.get("conversation_history", [])), priority=1,
+                          header="对话历史：", max_tokens=get_section_budget("history"))
+        
+        builder.add("request", """
 请用自然语言直接给出建议，不要使用代码块或JSON。输出要求：
 - 先简短总结穿搭思路（1–2句）
 - 给出3–5条可执行的具体建议（分点列出）
 - 如涉及场合或风格，明确说明适用场景与理由
 - 如有身材或色彩关注点，给出优化建议与配色参考
 - 最后一行用一句话邀请用户补充偏好或预算
-"""
-        return prompt
+""")
+        return builder.build()
 
     def _extract_preferences(self, text: str) -> Dict[str, Any]:
         """轻量解析用户偏好：识别常见风格与场景关键词"""
@@ -246,12 +242,11 @@ class StylingAgent(BaseAgent):
             ]
             
             # 使用统一的智能体响应接口，自动选择模型并返回文本内容
-            llm_response = await self.llm_client.get_agent_response(
-                agent_name=self.agent_id,
+            content = await self._request_llm(
                 messages=messages,
                 context_info={"agent_type": "styling"}
             )
-            return llm_response.content or self._fallback_styling_response()
+            return content or self._fallback_styling_response()
             
         except Exception as e:
             logger.error(f"GPT-4o穿搭建议生成失败: {e}")
@@ -464,21 +459,22 @@ class StylingAgent(BaseAgent):
 
             # 为每个单品搜索商品
             grouped_results: Dict[str, List[Dict[str, Any]]] = {}
-            for item in items[:6]:
-                products = []
+            search_results: Dict[str, Dict[str, Any]] = {}
+            if self.product_search_service:
                 try:
-                    if self.product_search_service:
-                        search_result = await self.product_search_service.search_products(
-                            keyword=item,
-                            page=1,
-                            page_size=3,
-                            sort="total_sales_des",
-                        )
-                        products = (search_result or {}).get("items", [])
-                    else:
-                        products = self._get_mock_styling_products({"keyword": item}).get("items", [])[:3]
+                    search_results = await self.product_search_service.search_many(
+                        items[:6],
+                        page=1,
+                        page_size=3,
+                        sort="total_sales_des",
+                    )
                 except Exception as e:
-                    logger.warning(f"穿搭智能体搜索单品失败: {item} - {e}")
+                    logger.warning(f"穿搭智能体批量搜索单品失败: {items[:6]} - {e}")
+            for item in items[:6]:
+                if self.product_search_service:
+                    products = (search_results.get(item.strip()) or {}).get("items", [])
+                else:
+                    products = self._get_mock_styling_products({"keyword": item}).get("items", [])[:3]
                 grouped_results[item] = products
 
             # 格式化输出
@@ -84,6 +84,22 @@ def get_orchestrator(request: Request):
     return orchestrator
 
 
+async def load_order_statistics(days: int) -> Optional[Dict[str, Any]]:
+    """
+    读取订单计数表：全部订单按状态汇总与最近 days 天的每日订单数、金额
+
+    只读取按日、按状态的物化计数（O(天数) 行），不扫描订单表；订单库不可用时返回 None。
+    """
+    try:
+        from services.order_service import order_service
+        overall = await order_service.get_order_statistics_async()
+        daily = await order_service.get_daily_order_statistics_async(days)
+        return {"overall": overall, "daily": daily}
+    except Exception as e:
+        logger.warning(f"读取订单统计失败: {e}")
+        return None
+
+
 @router.get("/analytics/overview", response_model=AnalyticsResponse)
 async def get_analytics_overview(
     request: Request,
@@ -133,7 +149,7 @@ async def get_analytics_overview(
             )
             agents.append(agent_metrics)
         
-        # 构建业务指标（模拟数据）
+        # 构建业务指标（客户数为模拟数据，订单与收入读取订单计数表）
         business = BusinessMetrics(
             total_customers=1250 + (total_requests // 10),
             new_customers_today=15 + (total_requests // 50),
@@ -145,6 +161,13 @@ async def get_analytics_overview(
             sales_inquiries=agent_stats.get("sales_agent", 0),
             support_tickets=agent_stats.get("order_agent", 0)
         )
+        order_stats = await load_order_statistics(days=1)
+        if order_stats:
+            today = order_stats["daily"][-1]
+            business.total_orders = order_stats["overall"]["total_orders"]
+            business.total_revenue = round(order_stats["overall"]["total_amount"], 2)
+            business.orders_today = today["orders"]
+            business.revenue_today = round(today["amount"], 2)
         
         # 构建趋势数据
         trends = {}
@@ -378,17 +401,28 @@ async def get_business_analytics(
         
         data_points = []
         
+        # 订单与收入读取订单计数表的每日数据（按日期倒序，与 i 对应）
+        order_days = []
+        if metric in ("revenue", "orders"):
+            order_stats = await load_order_statistics(days)
+            if order_stats:
+                order_days = list(reversed(order_stats["daily"]))
+        
         for i in range(days):
             date = (datetime.now(beijing_tz) - timedelta(days=i)).strftime("%Y-%m-%d")
             
-            if metric == "revenue":
-                # 收入趋势（模拟数据）
+            if order_days:
+                date = order_days[i]["date"]
+                value = order_days[i]["amount"] if metric == "revenue" else order_days[i]["orders"]
+            
+            elif metric == "revenue":
+                # 收入趋势（订单库不可用时的模拟数据）
                 base_revenue = 3000 + (total_requests * 5)
                 daily_variation = 500 * (i % 7 - 3) / 3
                 value = max(1000, base_revenue + daily_variation)
             
             elif metric == "orders":
-                # 订单趋势
+                # 订单趋势（订单库不可用时的模拟数据）
                 base_orders = 15 + (total_requests // 20)
                 daily_variation = 5 * (i % 5 - 2) / 2
                 value = max(5, int(base_orders + daily_variation))
@@ -461,10 +495,10 @@ async def generate_report(
     try:
         performance_report = orchestrator.get_performance_report()
         generated_at = datetime.now(beijing_tz).isoformat()
+        total_requests = performance_report.get("总请求数", 0)
         
         if report_type == "performance":
             # 性能报告
-            total_requests = performance_report.get("总请求数", 0)
             data = {
                 "概览": {
                     "总请求数": total_requests,
@@ -497,12 +531,19 @@ async def generate_report(
         elif report_type == "business":
             # 业务报告
             agent_stats = performance_report.get("智能体使用统计", {})
+            order_stats = await load_order_statistics(days=1)
+            if order_stats:
+                total_orders = order_stats["overall"]["total_orders"]
+                total_revenue = order_stats["overall"]["total_amount"]
+            else:
+                total_orders = 890 + (total_requests // 15)
+                total_revenue = 125000 + (total_requests * 50)
             data = {
                 "业务概览": {
                     "总客户数": 1250 + (total_requests // 10),
                     "新增客户": 15 + (total_requests // 50),
-                    "总订单数": 890 + (total_requests // 15),
-                    "总收入": f"{125000 + (total_requests * 50):,.2f}元"
+                    "总订单数": total_orders,
+                    "总收入": f"{total_revenue:,.2f}元"
                 },
                 "服务分布": {
                     "知识咨询": agent_stats.get("knowledge_agent", 0),
@@ -3,6 +3,7 @@
 对话服务API路由
 提供客户与智能体的交互接口
 """
+import asyncio
 import uuid
 from datetime import datetime, timezone, timedelta
 from typing import Dict, Any, List, Optional
@@ -32,6 +33,7 @@ from models.session import MessageType
 from agents.base_agent import Priority, Message
 from utils.dependencies import get_dispatcher, get_orchestrator
 from utils.logger import get_logger
+from utils.streaming import StreamSink, reset_stream_sink, set_stream_sink
 
 logger = get_logger(__name__)
 router = APIRouter()
@@ -352,61 +354,87 @@ async def escalate_session(
 async def chat_stream(
     session_id: str,
     request: Request,
+    message: str,
+    customer_id: Optional[str] = None,
     orchestrator=Depends(get_orchestrator)
 ):
-    """流式对话接口（Server-Sent Events）"""
+    """
+    流式对话接口（Server-Sent Events）
+    
+    处理一条消息，主智能体生成过程中逐段推送 bot_response_delta 事件，
+    处理完成后推送完整的 bot_response 事件。
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    
+    async def send_delta(payload: Dict[str, Any]):
+        await queue.put(payload)
+    
+    chat_message = Message(
+        content=message,
+        conversation_id=session_id,
+        sender_id=customer_id or "anonymous",
+        message_type=MessageType.TEXT,
+        priority=Priority.NORMAL,
+        metadata={"channel": "sse"}
+    )
+    
     async def event_generator():
+        # 接收器需在创建任务前设置，任务会复制当前上下文
+        sink_token = set_stream_sink(StreamSink(send_delta))
         try:
-            # 检查会话是否存在
-            session_info = orchestrator.get_session_info(session_id)
-            if not session_info:
-                yield {
-                    "event": "error",
-                    "data": '{"error": "会话不存在"}'
-                }
-                return
-            
-            session = orchestrator.sessions[session_id]
-            last_message_count = len(session.context.get("message_history", []))
+            task = asyncio.create_task(orchestrator.process_message(
+                user_id=customer_id or "anonymous",
+                message=chat_message
+            ))
+        finally:
+            reset_stream_sink(sink_token)
+        
+        try:
+            while True:
+                getter = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+                if getter in done:
+                    payload = getter.result()
+                    yield {
+                        "event": "bot_response_delta",
+                        "data": json.dumps({"session_id": session_id, **payload}, ensure_ascii=False)
+                    }
+                    continue
+                getter.cancel()
+                break
             
-            # 持续监听会话更新
-            while session.is_active:
-                current_message_count = len(session.context.get("message_history", []))
-                
-                # 检查是否有新消息
-                if current_message_count > last_message_count:
-                    message_history = session.context.get("message_history", [])
-                    new_messages = message_history[last_message_count:]
-                    
-                    for message in new_messages:
-                        yield {
-                            "event": "message",
-                            "data": f'{{"type": "new_message", "content": {message}}}'
-                        }
-                    
-                    last_message_count = current_message_count
-                
-                # 检查会话状态变化
+            # 推送剩余片段
+            while not queue.empty():
+                payload = queue.get_nowait()
                 yield {
-                    "event": "status",
-                    "data": f'{{"session_id": "{session_id}", "is_active": {str(session.is_active).lower()}, "current_agent": "{session.current_agent or ""}", "escalation_level": "{session.escalation_level.value}"}}'
+                    "event": "bot_response_delta",
+                    "data": json.dumps({"session_id": session_id, **payload}, ensure_ascii=False)
                 }
-                
-                # 等待一段时间再检查
-                await asyncio.sleep(1)
             
-            # 会话结束
+            response = task.result()
             yield {
-                "event": "close",
-                "data": '{"message": "会话已结束"}'
+                "event": "bot_response",
+                "data": json.dumps({
+                    "session_id": session_id,
+                    "message": response.content,
+                    "agent_id": response.agent_id,
+                    "confidence": response.confidence,
+                    "intent_type": getattr(response.intent_type, "value", response.intent_type),
+                    "requires_human": response.requires_human,
+                    "timestamp": datetime.now(beijing_tz).isoformat()
+                }, ensure_ascii=False)
             }
             
         except Exception as e:
             logger.error(f"流式对话错误: {e}")
             yield {
                 "event": "error",
-                "data": f'{{"error": "{str(e)}"}}'
+                "data": json.dumps({"error": str(e)}, ensure_ascii=False)
             }
+        finally:
+            # 客户端断开时停止处理
+            if not task.done():
+                task.cancel()
     
     return EventSourceResponse(event_generator())
 
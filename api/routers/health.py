@@ -282,12 +282,15 @@ async def performance_metrics(request: Request, orchestrator=Depends(get_orchest
         }
     
     try:
+        from services.llm_service import llm_service
         performance = orchestrator.get_performance_report()
         
         return {
             "status": "success",
             "timestamp": datetime.now(beijing_tz).isoformat(),
-            "metrics": performance
+            "metrics": performance,
+            "caches": get_cache_stats(),
+            "llm_admission": llm_service.get_admission_stats()
         }
         
     except Exception as e:
@@ -299,6 +302,36 @@ async def performance_metrics(request: Request, orchestrator=Depends(get_orchest
         }
 
 
+def get_cache_stats() -> Dict[str, Any]:
+    """获取各缓存的命中统计"""
+    from services.product_search_service import product_search_service
+    from services.llm_service import llm_service
+    
+    return {
+        "product_search": product_search_service.get_cache_stats(),
+        "llm_response": llm_service.get_response_cache_stats()
+    }
+
+
+@router.get("/health/cache")
+async def cache_health():
+    """缓存命中统计"""
+    try:
+        return {
+            "status": "success",
+            "timestamp": datetime.now(beijing_tz).isoformat(),
+            "caches": get_cache_stats()
+        }
+        
+    except Exception as e:
+        logger.error(f"获取缓存统计失败: {e}")
+        return {
+            "status": "error",
+            "message": str(e),
+            "timestamp": datetime.now(beijing_tz).isoformat()
+        }
+
+
 @router.get("/health/system")
 async def system_health():
     """系统资源健康状态"""
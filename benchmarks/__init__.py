@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+"""
+性能基准脚本
+
+使用方式: python -m benchmarks.<脚本名>
+"""
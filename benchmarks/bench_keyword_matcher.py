@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+关键词匹配基准
+
+对比逐个关键词子串扫描与 Aho-Corasick 单次扫描在路由覆盖规则上的单条消息耗时。
+
+    python -m benchmarks.bench_keyword_matcher --rounds 20000
+"""
+
+import argparse
+import time
+
+from agents.agent_dispatcher import OVERRIDE_KEYWORDS, OVERRIDE_KEYWORD_MATCHER
+
+SAMPLE_MESSAGES = [
+    "你好，我想买一件适合通勤的白衬衫，预算300以内，有什么推荐吗？",
+    "帮我查一下订单号 202401150001 的物流到哪了",
+    "这件羊毛大衣的面料怎么保养，可以机洗吗",
+    "好的，可以转销售",
+    "周末要去约会，想要法式复古一点的穿搭风格，配什么颜色的裙子好看",
+]
+
+# 原实现每条消息最多对关键词列表做约15次 contains_any 扫描
+RULE_CHECKS = [
+    "affirmative", "transfer_to_sales", "transfer_to_order", "transfer_to_knowledge", "transfer_to_styling",
+    "order", "styling", "sales", "order", "sales", "order", "styling", "sales", "order", "sales_strong",
+]
+
+
+def naive(content: str) -> set:
+    content = content.lower()
+    return {name for name in RULE_CHECKS if any(k in content for k in OVERRIDE_KEYWORDS[name])}
+
+
+def automaton(content: str) -> set:
+    return OVERRIDE_KEYWORD_MATCHER.match(content)
+
+
+def bench(func, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for message in SAMPLE_MESSAGES:
+            func(message)
+    return (time.perf_counter() - start) / (rounds * len(SAMPLE_MESSAGES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="关键词匹配基准")
+    parser.add_argument("--rounds", type=int, default=20000)
+    args = parser.parse_args()
+
+    for message in SAMPLE_MESSAGES:
+        assert naive(message) == automaton(message), message
+
+    naive_cost = bench(naive, args.rounds)
+    automaton_cost = bench(automaton, args.rounds)
+    print(f"逐词扫描: {naive_cost * 1e6:.2f}µs/条")
+    print(f"自动机:   {automaton_cost * 1e6:.2f}µs/条 (x{naive_cost / automaton_cost:.1f})")
+
+
+if __name__ == "__main__":
+    main()
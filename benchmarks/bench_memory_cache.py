@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+内存缓存基准
+
+以满容量、读多写少（默认 80% 读）的随机负载对比原实现（每次淘汰 min() 全表扫描、单锁串行）
+与基于 OrderedDict 的 O(1) LRU 实现。
+
+    python -m benchmarks.bench_memory_cache --ops 1000000 --size 10000
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from typing import Any, Dict, Optional
+
+from utils.cache import MemoryCache
+
+
+class ScanLRUMemoryCache:
+    """原 MemoryCache 的读写路径（仅保留基准涉及的部分）"""
+
+    def __init__(self, max_size: int = 1000, default_ttl: int = 3600):
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self._cache: Dict[str, Dict[str, Any]] = {}
+        self._access_times: Dict[str, float] = {}
+        self._lock = asyncio.Lock()
+
+    async def get(self, key: str) -> Optional[Any]:
+        async with self._lock:
+            if key not in self._cache:
+                return None
+            cache_item = self._cache[key]
+            if cache_item['expires_at'] and time.time() > cache_item['expires_at']:
+                await self._remove_key(key)
+                return None
+            self._access_times[key] = time.time()
+            return cache_item['value']
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+        async with self._lock:
+            if len(self._cache) >= self.max_size and key not in self._cache:
+                await self._evict_lru()
+            ttl = ttl or self.default_ttl
+            self._cache[key] = {
+                'value': value,
+                'created_at': time.time(),
+                'expires_at': time.time() + ttl if ttl > 0 else None
+            }
+            self._access_times[key] = time.time()
+            return True
+
+    async def _remove_key(self, key: str) -> bool:
+        self._cache.pop(key, None)
+        self._access_times.pop(key, None)
+        return True
+
+    async def _evict_lru(self):
+        if not self._access_times:
+            return
+        lru_key = min(self._access_times.keys(), key=lambda k: self._access_times[k])
+        await self._remove_key(lru_key)
+
+
+def build_workload(ops: int, key_space: int, read_ratio: float, seed: int):
+    rng = random.Random(seed)
+    return [(rng.random() < read_ratio, f"key:{rng.randrange(key_space)}") for _ in range(ops)]
+
+
+async def run(cache, workload, size: int) -> float:
+    # 预热至满容量，使每次新键写入都触发淘汰
+    for i in range(size):
+        await cache.set(f"warm:{i}", i)
+    start = time.perf_counter()
+    for is_read, key in workload:
+        if is_read:
+            await cache.get(key)
+        else:
+            await cache.set(key, key)
+    return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="内存缓存基准")
+    parser.add_argument("--ops", type=int, default=1_000_000, help="操作总数")
+    parser.add_argument("--size", type=int, default=10_000, help="缓存容量")
+    parser.add_argument("--read-ratio", type=float, default=0.8)
+    parser.add_argument("--legacy-ops", type=int, default=20_000,
+                        help="原实现的操作数（全表扫描淘汰过慢，按此抽样后折算）")
+    args = parser.parse_args()
+
+    key_space = args.size * 2
+    workload = build_workload(args.ops, key_space, args.read_ratio, seed=42)
+
+    lru = MemoryCache(max_size=args.size)
+    lru_cost = await run(lru, workload, args.size)
+    stats = await lru.get_stats()
+    print(f"O(1) LRU: {args.ops} 次 {lru_cost:.2f}s，{lru_cost / args.ops * 1e6:.2f}µs/次，"
+          f"命中率 {stats['hit_rate']:.1%}，淘汰 {stats['evictions']}")
+
+    legacy_ops = min(args.legacy_ops, args.ops)
+    legacy_cost = await run(ScanLRUMemoryCache(max_size=args.size), workload[:legacy_ops], args.size)
+    per_op = legacy_cost / legacy_ops
+    print(f"原实现:   {legacy_ops} 次 {legacy_cost:.2f}s，{per_op * 1e6:.2f}µs/次，"
+          f"折算 {args.ops} 次约 {per_op * args.ops:.1f}s (x{per_op * args.ops / lru_cost:.0f})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+订单批量写入基准
+
+对比逐条写入（每个订单与每条物流轨迹各一个事务）与 bulk_insert_orders（单事务 executemany）
+载入模拟订单的耗时，以及物流轨迹逐条写入与缓冲写入器的吞吐。
+
+    python -m benchmarks.bench_order_bulk_load --orders 1000000 --batch-size 5000
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from services.order_service import OrderService
+
+
+def load_one_by_one(service: OrderService, count: int) -> float:
+    """原 seed_mock_orders 的写入方式"""
+    orders = list(service.iter_mock_orders(count))
+    start = time.perf_counter()
+    for order in orders:
+        service._save_order(order)
+        logistics = order.logistics_info
+        for record in logistics.tracking_history:
+            service._save_logistics_tracking(order.order_id, logistics.tracking_number, logistics.company, record)
+    return time.perf_counter() - start
+
+
+def load_bulk(service: OrderService, count: int, batch_size: int) -> tuple:
+    """边生成边批量写入（单事务、延后重建索引），返回 (生成耗时, 写入耗时)"""
+    generate_cost = [0.0]
+
+    def timed_source():
+        source = service.iter_mock_orders(count)
+        while True:
+            start = time.perf_counter()
+            order = next(source, None)
+            generate_cost[0] += time.perf_counter() - start
+            if order is None:
+                return
+            yield order
+
+    start = time.perf_counter()
+    service.bulk_insert_orders(timed_source(), batch_size, defer_indexes=True)
+    total = time.perf_counter() - start
+    return generate_cost[0], total - generate_cost[0]
+
+
+async def tracking_events(service: OrderService, order_ids: list, events: int, buffered: bool) -> float:
+    record = {"status": "运输中", "location": "杭州市", "description": "快件正在杭州市处理中", "timestamp": "2024-01-01T00:00:00"}
+    start = time.perf_counter()
+    for i in range(events):
+        order_id = order_ids[i % len(order_ids)]
+        if buffered:
+            await service.add_tracking_event_async(order_id, "SF000000000000", "顺丰速运", record)
+        else:
+            await service.pool.run(service._save_logistics_tracking, order_id, "SF000000000000", "顺丰速运", record)
+    if buffered:
+        await service.tracking_writer.flush()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="订单批量写入基准")
+    parser.add_argument("--orders", type=int, default=1_000_000, help="批量写入的订单数")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--legacy-orders", type=int, default=2000,
+                        help="逐条写入的订单数（过慢，按此抽样后折算）")
+    parser.add_argument("--events", type=int, default=20_000, help="物流轨迹事件数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = OrderService(db_path=str(Path(tmp) / "one_by_one.db"))
+        legacy_cost = load_one_by_one(legacy, args.legacy_orders)
+        legacy.close()
+        per_order = legacy_cost / args.legacy_orders
+        print(f"逐条写入: {args.legacy_orders} 条 {legacy_cost:.2f}s，{per_order * 1e6:.0f}µs/条，"
+              f"折算 {args.orders} 条约 {per_order * args.orders:.0f}s")
+
+        service = OrderService(db_path=str(Path(tmp) / "bulk.db"))
+        generate_cost, write_cost = load_bulk(service, args.orders, args.batch_size)
+        print(f"批量写入: {args.orders} 条 {write_cost:.2f}s（另含生成模拟数据 {generate_cost:.2f}s），"
+              f"{write_cost / args.orders * 1e6:.1f}µs/条 (x{per_order * args.orders / write_cost:.0f})")
+
+        with service.pool.connection() as conn:
+            order_ids = [row[0] for row in conn.execute("SELECT order_id FROM orders LIMIT 1000")]
+
+        async def run_events():
+            direct = await tracking_events(service, order_ids, args.events, buffered=False)
+            buffered = await tracking_events(service, order_ids, args.events, buffered=True)
+            await service.aclose()
+            return direct, buffered
+
+        direct, buffered = asyncio.run(run_events())
+        print(f"物流轨迹 {args.events} 条: 逐条写入 {direct:.2f}s，缓冲写入 {buffered:.2f}s (x{direct / buffered:.0f})")
+
+
+if __name__ == "__main__":
+    main()
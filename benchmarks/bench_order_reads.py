@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+订单读路径基准
+
+生成 N 条订单的原 JSON 列布局库（商品、地址、物流整体存为 orders 表中的 JSON 文本），
+复制一份用 services.order_schema 迁移为规范化布局，对比两种布局下常见查询的耗时：
+按订单号、按用户最近订单、按运单号、按城市区县筛选。
+
+    python -m benchmarks.bench_order_reads --orders 100000 --queries 2000
+"""
+
+import argparse
+import json
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from services.order_schema import migrate
+from services.order_service import LogisticsInfo, Order, OrderItem, OrderService, ShippingAddress
+
+CITIES = [("北京市", "朝阳区"), ("上海市", "浦东新区"), ("广州市", "天河区"), ("深圳市", "南山区"), ("杭州市", "西湖区")]
+
+# 原库的建表语句（JSON 列布局）
+LEGACY_ORDERS_TABLE = """
+    CREATE TABLE orders (
+        order_id TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        items TEXT NOT NULL,
+        total_amount REAL NOT NULL,
+        shipping_fee REAL NOT NULL,
+        discount_amount REAL NOT NULL,
+        final_amount REAL NOT NULL,
+        status TEXT NOT NULL,
+        payment_method TEXT NOT NULL,
+        shipping_address TEXT NOT NULL,
+        logistics_info TEXT,
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        notes TEXT
+    )
+"""
+
+LEGACY_TRACKING_TABLE = """
+    CREATE TABLE logistics_tracking (
+        tracking_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        order_id TEXT NOT NULL,
+        tracking_number TEXT NOT NULL,
+        company TEXT NOT NULL,
+        status TEXT NOT NULL,
+        location TEXT NOT NULL,
+        description TEXT NOT NULL,
+        timestamp TEXT NOT NULL,
+        FOREIGN KEY (order_id) REFERENCES orders (order_id)
+    )
+"""
+
+
+class BlobOrderReader:
+    """原 OrderService 的读路径：整行读取后解析 JSON 列"""
+
+    COLUMNS = ("order_id, user_id, items, total_amount, shipping_fee, discount_amount, final_amount, "
+               "status, payment_method, shipping_address, logistics_info, created_at, updated_at, notes")
+
+    def __init__(self, path: Path):
+        self.conn = sqlite3.connect(path)
+
+    @staticmethod
+    def _row_to_order(row: tuple) -> Order:
+        logistics = json.loads(row[10]) if row[10] else None
+        return Order(
+            order_id=row[0], user_id=row[1],
+            items=[OrderItem(**item) for item in json.loads(row[2])],
+            total_amount=row[3], shipping_fee=row[4], discount_amount=row[5], final_amount=row[6],
+            status=row[7], payment_method=row[8],
+            shipping_address=ShippingAddress(**json.loads(row[9])),
+            logistics_info=LogisticsInfo(**logistics) if logistics else None,
+            created_at=row[11], updated_at=row[12], notes=row[13] or ""
+        )
+
+    def _query(self, where: str, params: tuple) -> List[Order]:
+        rows = self.conn.execute(f"SELECT {self.COLUMNS} FROM orders {where}", params).fetchall()
+        return [self._row_to_order(row) for row in rows]
+
+    def get_order(self, order_id: str) -> Optional[Order]:
+        orders = self._query("WHERE order_id = ?", (order_id,))
+        return orders[0] if orders else None
+
+    def get_user_orders(self, user_id: str, limit: int = 10) -> List[Order]:
+        return self._query("WHERE user_id = ? ORDER BY created_at DESC LIMIT ?", (user_id, limit))
+
+    def get_order_by_tracking_number(self, tracking_number: str) -> Optional[Order]:
+        orders = self._query("WHERE json_extract(logistics_info, '$.tracking_number') = ?", (tracking_number,))
+        return orders[0] if orders else None
+
+    def get_orders_by_city(self, city: str, district: str, limit: int = 20) -> List[Order]:
+        return self._query(
+            "WHERE json_extract(shipping_address, '$.city') = ? AND json_extract(shipping_address, '$.district') = ? "
+            "ORDER BY created_at DESC LIMIT ?",
+            (city, district, limit)
+        )
+
+
+def build_legacy_db(path: Path, count: int, users: int, seed: int) -> List[tuple]:
+    """生成原布局的订单库，返回 (订单号, 用户ID, 运单号) 样本"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    conn = sqlite3.connect(path)
+    conn.execute(LEGACY_ORDERS_TABLE)
+    conn.execute(LEGACY_TRACKING_TABLE)
+    samples, rows, events = [], [], []
+    for i in range(count):
+        order_id = f"{10_000_000_000 + i}"
+        user_id = f"u{rng.randrange(users):06d}"
+        created_at = (start + timedelta(seconds=i * 30)).isoformat()
+        city, district = rng.choice(CITIES)
+        items = [{
+            "product_id": f"p{rng.randrange(10000)}", "product_name": "时尚休闲T恤", "price": 199.0,
+            "quantity": rng.randint(1, 3), "image_url": "", "product_sku": f"SKU{rng.randrange(100000, 999999)}",
+            "product_category": "上衣", "specifications": {"颜色": "白色", "尺码": "M"}
+        } for _ in range(rng.randint(1, 3))]
+        address = {"name": "张三", "phone": f"1{rng.randrange(3000000000, 9999999999)}", "province": city,
+                   "city": city, "district": district, "address": "XX路XX号XX小区", "postal_code": "100000"}
+        tracking_number = f"SF{100000000000 + i}"
+        history = [{"status": status, "location": city, "description": f"快件{status}", "timestamp": created_at}
+                   for status in ("已下单", "已发货", "运输中")[:rng.randint(1, 3)]]
+        logistics = {
+            "tracking_number": tracking_number, "company": "顺丰速运", "status": history[-1]["status"],
+            "current_location": city, "estimated_delivery": "2024-12-31", "tracking_history": history,
+            "origin_address": "杭州市转运中心", "destination_address": f"{city}{district}",
+            "route_nodes": [{"node": record["location"], "arrived_at": created_at} for record in history]
+        }
+        total = sum(item["price"] * item["quantity"] for item in items)
+        rows.append((order_id, user_id, json.dumps(items, ensure_ascii=False), total, 0.0, 0.0, total,
+                     "shipped", "支付宝", json.dumps(address, ensure_ascii=False),
+                     json.dumps(logistics, ensure_ascii=False), created_at, created_at, ""))
+        events.extend((order_id, tracking_number, "顺丰速运", r["status"], r["location"], r["description"],
+                       r["timestamp"]) for r in history)
+        samples.append((order_id, user_id, tracking_number))
+    conn.executemany(f"INSERT INTO orders VALUES ({','.join('?' * 14)})", rows)
+    conn.executemany(
+        "INSERT INTO logistics_tracking (order_id, tracking_number, company, status, location, description, timestamp) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        events
+    )
+    conn.commit()
+    conn.close()
+    return samples
+
+
+def timed(name: str, fn: Callable, args: List[tuple]) -> float:
+    start = time.perf_counter()
+    for arg in args:
+        fn(*arg)
+    cost = time.perf_counter() - start
+    print(f"  {name:<12} {len(args)} 次 {cost:.3f}s，{cost / len(args) * 1e6:.1f}µs/次")
+    return cost
+
+
+def main():
+    parser = argparse.ArgumentParser(description="订单读路径基准")
+    parser.add_argument("--orders", type=int, default=100_000, help="订单数")
+    parser.add_argument("--users", type=int, default=10_000, help="用户数")
+    parser.add_argument("--queries", type=int, default=2_000, help="每类查询的次数")
+    parser.add_argument("--scan-queries", type=int, default=50,
+                        help="原布局需全表扫描的查询（按运单号、按城市）的次数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = Path(tmp) / "orders_blob.db"
+        normalized_path = Path(tmp) / "orders_normalized.db"
+
+        start = time.perf_counter()
+        samples = build_legacy_db(legacy_path, args.orders, args.users, seed=42)
+        print(f"生成 {args.orders} 条订单: {time.perf_counter() - start:.2f}s")
+
+        shutil.copy(legacy_path, normalized_path)
+        start = time.perf_counter()
+        conn = sqlite3.connect(normalized_path)
+        migrate(conn)
+        conn.close()
+        print(f"迁移为规范化布局: {time.perf_counter() - start:.2f}s")
+
+        rng = random.Random(7)
+        picks = [rng.choice(samples) for _ in range(args.queries)]
+        by_id = [(order_id,) for order_id, _, _ in picks]
+        by_user = [(user_id, 10) for _, user_id, _ in picks]
+        by_tracking = [(tracking,) for _, _, tracking in picks]
+        by_city = [rng.choice(CITIES) + (20,) for _ in range(args.queries)]
+        scans = args.scan_queries
+
+        legacy = BlobOrderReader(legacy_path)
+        print("原 JSON 列布局:")
+        legacy_costs = [
+            timed("按订单号", legacy.get_order, by_id) / len(by_id),
+            timed("按用户", legacy.get_user_orders, by_user) / len(by_user),
+            timed("按运单号", legacy.get_order_by_tracking_number, by_tracking[:scans]) / scans,
+            timed("按城市区县", legacy.get_orders_by_city, by_city[:scans]) / scans,
+        ]
+        legacy.conn.close()
+
+        service = OrderService(db_path=str(normalized_path))
+
+        def orders_by_city(city: str, district: str, limit: int) -> List[Order]:
+            return service._query_orders(
+                "WHERE order_id IN (SELECT order_id FROM shipping_addresses WHERE city = ? AND district = ?) "
+                "ORDER BY created_at DESC LIMIT ?",
+                (city, district, limit)
+            )
+
+        print("规范化布局:")
+        normalized_costs = [
+            timed("按订单号", service.get_order, by_id) / len(by_id),
+            timed("按用户", service.get_user_orders, by_user) / len(by_user),
+            timed("按运单号", service.get_order_by_tracking_number, by_tracking) / len(by_tracking),
+            timed("按城市区县", orders_by_city, by_city) / len(by_city),
+        ]
+        service.close()
+
+        print("单次耗时对比（原/规范化）: " + "  ".join(
+            f"{name} x{old / new:.1f}" for name, old, new in
+            zip(("按订单号", "按用户", "按运单号", "按城市区县"), legacy_costs, normalized_costs)
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+商品搜索并发基准
+
+通过注入 httpx.MockTransport 模拟上游搜索API，统计并发搜索的 p50/p99 延迟。
+
+    python -m benchmarks.bench_product_search --concurrency 200 --latency 0.2 --mode hedge
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import List
+
+import httpx
+
+from services.product_search_service import ProductSearchService
+
+
+def build_stand_in_upstream(latency: float, jitter: float) -> httpx.MockTransport:
+    """构建模拟上游：固定延迟 + 随机抖动，返回一个商品"""
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+        keyword = request.url.params.get("q", "")
+        return httpx.Response(200, json={
+            "status": 200,
+            "content": [{"tao_title": f"{keyword} 测试商品", "quanhou_jiage": "99", "nick": "测试店铺"}]
+        })
+    return httpx.MockTransport(handler)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run(concurrency: int, latency: float, jitter: float, mode: str) -> None:
+    service = ProductSearchService(
+        transport=build_stand_in_upstream(latency, jitter),
+        config={"per_host_concurrency": concurrency, "strategy_mode": mode, "cache_enabled": False}
+    )
+    service.base_url = "http://upstream.test/search"
+    keywords = ["白衬衫", "牛仔裤", "连衣裙", "卫衣", "风衣"]
+
+    async def one(i: int) -> float:
+        start = time.perf_counter()
+        await service.search_products(keywords[i % len(keywords)])
+        return time.perf_counter() - start
+
+    wall_start = time.perf_counter()
+    samples = await asyncio.gather(*(one(i) for i in range(concurrency)))
+    wall = time.perf_counter() - wall_start
+    await service.aclose()
+
+    print(f"并发数: {concurrency}, 上游延迟: {latency}s±{jitter}s, 策略模式: {mode}")
+    print(f"p50: {percentile(samples, 50) * 1000:.1f}ms  "
+          f"p99: {percentile(samples, 99) * 1000:.1f}ms  "
+          f"mean: {statistics.mean(samples) * 1000:.1f}ms  "
+          f"总耗时: {wall * 1000:.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="商品搜索并发基准")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--mode", choices=["sequential", "race", "hedge"], default="hedge")
+    args = parser.parse_args()
+    asyncio.run(run(args.concurrency, args.latency, args.jitter, args.mode))
+
+
+if __name__ == "__main__":
+    main()
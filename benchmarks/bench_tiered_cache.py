@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+两级缓存演练
+
+用 fakeredis 在本地模拟共享同一 Redis 的多个工作进程，验证写入后其他进程的 L1 被失效广播清除，
+并输出各级命中率。无需真实 Redis：
+
+    pip install fakeredis
+    python -m benchmarks.bench_tiered_cache --workers 4 --ops 20000
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+try:
+    import fakeredis
+    FAKEREDIS_AVAILABLE = True
+except ImportError:
+    fakeredis = None
+    FAKEREDIS_AVAILABLE = False
+
+from utils.cache import MemoryCache, RedisCache, TieredCache
+
+
+def make_worker(server, l1_ttl: int) -> TieredCache:
+    client = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    return TieredCache(RedisCache(client=client), l1=MemoryCache(max_size=1000, default_ttl=l1_ttl), l1_ttl=l1_ttl)
+
+
+async def wait_until(predicate, timeout: float = 1.0) -> bool:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if await predicate():
+            return True
+        await asyncio.sleep(0.005)
+    return False
+
+
+async def check_invalidation(workers) -> None:
+    """一个进程写入后，其他进程读到的必须是新值而不是各自 L1 中的旧值"""
+    writer, readers = workers[0], workers[1:]
+    await writer.set("session:demo", {"version": 1}, ttl=300)
+    for reader in readers:
+        assert await reader.get("session:demo") == {"version": 1}
+
+    await writer.set("session:demo", {"version": 2}, ttl=300)
+    for index, reader in enumerate(readers, start=1):
+        async def refreshed(reader=reader):
+            return await reader.get("session:demo") == {"version": 2}
+        assert await wait_until(refreshed), f"worker {index} 的 L1 未被失效"
+
+    await writer.delete_pattern("session:*")
+    for reader in readers:
+        async def removed(reader=reader):
+            return await reader.get("session:demo") is None
+        assert await wait_until(removed), "按模式删除未广播到其他进程"
+    print(f"失效广播: {len(readers)} 个进程均已收敛")
+
+
+async def run_load(workers, ops: int, key_space: int, write_ratio: float) -> None:
+    rng = random.Random(7)
+    start = time.perf_counter()
+    for _ in range(ops):
+        worker = rng.choice(workers)
+        key = f"session:{rng.randrange(key_space)}"
+        if rng.random() < write_ratio:
+            await worker.set(key, {"key": key}, ttl=300)
+        else:
+            await worker.get(key)
+    elapsed = time.perf_counter() - start
+    await asyncio.sleep(0.05)  # 等待广播处理完
+
+    print(f"{ops} 次操作 {elapsed:.2f}s")
+    for index, worker in enumerate(workers):
+        stats = await worker.get_stats()
+        print(f"worker {index}: L1命中率 {stats['l1_hit_rate']:.1%}，总命中率 {stats['hit_rate']:.1%}，"
+              f"发送失效 {stats['invalidations_sent']}，收到失效 {stats['invalidations_received']}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="两级缓存演练")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--ops", type=int, default=20000)
+    parser.add_argument("--keys", type=int, default=500)
+    parser.add_argument("--write-ratio", type=float, default=0.05)
+    parser.add_argument("--l1-ttl", type=int, default=60)
+    args = parser.parse_args()
+
+    if not FAKEREDIS_AVAILABLE:
+        raise SystemExit("需要安装 fakeredis: pip install fakeredis")
+
+    server = fakeredis.FakeServer()
+    workers = [make_worker(server, args.l1_ttl) for _ in range(args.workers)]
+    try:
+        # 先启动各进程的订阅，避免首批广播丢失
+        for worker in workers:
+            await worker.exists("warmup")
+            worker._ensure_listener()
+        await asyncio.sleep(0.05)
+
+        await check_invalidation(workers)
+        await run_load(workers, args.ops, args.keys, args.write_ratio)
+    finally:
+        for worker in workers:
+            await worker.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
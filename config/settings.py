@@ -164,7 +164,9 @@ class BaseConfig:
         "default_agent": "reception_agent",
         "fallback_agent": "reception_agent",
         "max_routing_attempts": 3,
-        "routing_timeout": 10
+        "routing_timeout": 10,
+        "rule_pre_routing": True,  # 规则可确定路由时跳过LLM协作分析
+        "speculative_execution": True  # LLM分析期间推测执行上一轮的主智能体
     }
     
     # 性能配置
@@ -172,7 +174,8 @@ class BaseConfig:
         "max_sessions": 1000,
         "session_timeout": 1800,  # 30分钟
         "cleanup_interval": 300,  # 5分钟
-        "metrics_retention_days": 30
+        "metrics_retention_days": 30,
+        "support_soft_deadline": 8.0  # 支持智能体软截止时间（秒），超时未完成的支持结果将被丢弃
     }
     
     # 业务配置
@@ -375,12 +378,115 @@ MONITORING_CONFIG = {
 
 # 缓存配置
 CACHE_CONFIG = {
+    "backend": os.getenv("CACHE_BACKEND", "memory"),  # memory / redis / tiered（进程内L1 + Redis L2）
+    "l1_max_size": 1000,
+    "l1_ttl": 60,  # tiered 模式下L1最长保留时间（秒），失效广播丢失时的兜底
     "default_ttl": 3600,  # 1小时
     "knowledge_cache_ttl": 7200,  # 2小时
     "session_cache_ttl": 1800,  # 30分钟
     "analytics_cache_ttl": 300  # 5分钟
 }
 
+# 速率限制配置
+RATE_LIMIT_CONFIG = {
+    "backend": os.getenv("RATE_LIMIT_BACKEND", "memory"),  # memory / redis（多进程共享限额）
+    "max_requests": 100,  # 每个会话/客户在时间窗口内的最大消息数
+    "time_window": 60  # 秒
+}
+
+# 商品搜索配置
+PRODUCT_SEARCH_CONFIG = {
+    "max_connections": 100,  # 连接池最大连接数
+    "max_keepalive_connections": 20,  # 保持长连接数
+    "keepalive_expiry": 30.0,  # 空闲连接保持时间（秒）
+    "per_host_concurrency": 32,  # 单个上游主机的并发请求上限
+    "connect_timeout": 3.0,  # 建连超时（秒）
+    "request_timeout": 8.0,  # 单次请求超时（秒）
+    "request_deadline": 15.0,  # 整次搜索（含重试与多策略）的总时限（秒）
+    "max_retries": 2,
+    # 多关键词策略执行模式：sequential 依次尝试；race 同时发起；hedge 按 hedge_delay 错峰发起
+    "strategy_mode": "hedge",
+    "hedge_delay": 0.3,  # 对冲请求的错峰间隔（秒）
+    "dispatcher_latency_budget": 8.0,  # 调度器为单轮对话内商品搜索设定的延迟预算（秒）
+    "batch_concurrency": 4,  # search_many 同时进行的关键词搜索数
+    # 搜索结果缓存
+    "cache_enabled": True,
+    "cache_backend": os.getenv("PRODUCT_SEARCH_CACHE_BACKEND", "memory"),  # memory / redis
+    "cache_max_size": 2000,
+    "cache_ttl": 600,  # 有结果时的新鲜期（秒）
+    "cache_negative_ttl": 120,  # 无结果（301）的缓存时间（秒）
+    "cache_stale_ttl": 1800  # 过期后仍可先返回旧值并后台刷新的时间（秒）
+}
+
+# LLM上游并发控制配置（AIMD 自适应并发 + 令牌预算 + 优先级排队）
+LLM_CONCURRENCY_CONFIG = {
+    "enabled": True,
+    "initial_limit": 8,  # 初始并发上限
+    "min_limit": 2,
+    "max_limit": 32,
+    "latency_target": 20.0,  # 单次调用超过该延迟（秒）视为上游过载
+    "backoff": 0.5,  # 限流或过载时并发上限的乘性下调系数
+    "decrease_cooldown": 2.0,  # 两次下调的最小间隔（秒）
+    "tokens_per_minute": int(os.getenv("LLM_TOKENS_PER_MINUTE", "300000")),  # 按上游账户TPM限额设置，0 表示不限制
+    "queue_timeout": 20.0  # 排队截止时间（秒），超过则丢弃请求
+}
+
+# LLM响应缓存配置（默认关闭，按智能体单独开启）
+LLM_RESPONSE_CACHE_CONFIG = {
+    "enabled": os.getenv("LLM_RESPONSE_CACHE_ENABLED", "false").lower() == "true",
+    "backend": os.getenv("LLM_RESPONSE_CACHE_BACKEND", "memory"),  # memory / redis（redis 作为内存之下的第二层）
+    "max_size": 1000,  # 内存层最大条目数
+    "max_temperature": 0.7,  # 温度高于该值的调用不缓存（输出随机性大）
+    # 各智能体缓存时间（秒），未列出的智能体不缓存
+    "agent_ttl": {
+        "reception_agent": 1800,
+        "knowledge_agent": 21600,
+        "smart_collaboration_system": 600,
+        "collaboration_analyzer": 600
+    }
+}
+
+# 订单库（SQLite）访问配置
+ORDER_DB_CONFIG = {
+    "pool_size": int(os.getenv("ORDER_DB_POOL_SIZE", "4")),  # 长连接数，同时也是专用线程池的线程数
+    # 覆盖连接池默认 PRAGMA（默认 WAL、synchronous=NORMAL、busy_timeout=5000、16MB 页缓存、256MB mmap）
+    "pragmas": {},
+    "bulk_batch_size": int(os.getenv("ORDER_BULK_BATCH_SIZE", "5000")),  # 批量导入时每次 executemany 的订单数
+    "bulk_cache_size": -262144,  # 批量导入期间临时使用的页缓存（KiB，负数），减少随机主键插入的缺页
+    "tracking_flush_size": int(os.getenv("ORDER_TRACKING_FLUSH_SIZE", "500")),  # 物流轨迹缓冲达到该条数即写库
+    "tracking_flush_interval": float(os.getenv("ORDER_TRACKING_FLUSH_INTERVAL", "1.0"))  # 最长缓冲秒数
+}
+
+# 提示词构建配置
+PROMPT_CONFIG = {
+    # 各智能体单次提示词的 token 预算（系统提示等必需段落不参与裁剪）
+    "agent_budgets": {
+        "default": 4000,
+        "sales_agent": 5000,
+        "order_agent": 4000,
+        "knowledge_agent": 3000,
+        "styling_agent": 3000
+    },
+    # 各提示词段落的 token 上限
+    "section_budgets": {
+        "history": 600,
+        "context": 400,
+        "search_results": 1500
+    },
+    "history_turns": 10,  # 参与提示词构建的最近对话轮数（实际保留条数由预算决定）
+    "context_value_tokens": 120,  # 上下文中单个字段渲染的最大 token 数
+    "context_history_limit": 10  # 会话上下文中保留的对话历史条数
+}
+
+# 智能调度器会话存储配置
+SESSION_STORE_CONFIG = {
+    "backend": os.getenv("SESSION_STORE_BACKEND", "memory"),  # memory / sqlite（多进程部署或需重启保留时使用）
+    "max_sessions": 10000,  # 内存存储最大会话数，超出淘汰最久未活跃的会话
+    "ttl": 86400,  # 会话空闲过期时间（秒）
+    "max_history": 50,  # 每个会话保留的最近对话记录条数
+    "sqlite_path": os.getenv("SESSION_STORE_PATH", str(PROJECT_ROOT / "data" / "sessions.db"))
+}
+
 # Settings类定义
 class Settings(BaseConfig):
     """应用设置类"""
@@ -436,6 +542,41 @@ class Settings(BaseConfig):
     def cache_config(self):
         """获取缓存配置"""
         return CACHE_CONFIG
+    
+    @property
+    def rate_limit_config(self):
+        """获取速率限制配置"""
+        return RATE_LIMIT_CONFIG
+    
+    @property
+    def product_search_config(self):
+        """获取商品搜索配置"""
+        return PRODUCT_SEARCH_CONFIG
+    
+    @property
+    def llm_concurrency_config(self):
+        """获取LLM并发控制配置"""
+        return LLM_CONCURRENCY_CONFIG
+    
+    @property
+    def llm_response_cache_config(self):
+        """获取LLM响应缓存配置"""
+        return LLM_RESPONSE_CACHE_CONFIG
+    
+    @property
+    def order_db_config(self):
+        """获取订单库访问配置"""
+        return ORDER_DB_CONFIG
+    
+    @property
+    def prompt_config(self):
+        """获取提示词构建配置"""
+        return PROMPT_CONFIG
+    
+    @property
+    def session_store_config(self):
+        """获取会话存储配置"""
+        return SESSION_STORE_CONFIG
 
 # 全局设置实例
 _settings = None
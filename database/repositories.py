@@ -3,13 +3,15 @@
 为每个模型提供专门的数据访问方法
 """
 from typing import List, Optional, Dict, Any, Tuple
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, or_, desc, text
+from sqlalchemy import select, func, and_, or_, desc, text, delete, insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import selectinload, joinedload
 
 from .base_repository import BaseRepository
-from models import Customer, ChatSession, KnowledgeEntry, Order, PerformanceMetric
+from models import Customer, ChatSession, KnowledgeEntry, Order, OrderDailyStatistic, PerformanceMetric
 import logging
 
 logger = logging.getLogger(__name__)
@@ -390,31 +392,25 @@ class OrderRepository(BaseRepository[Order]):
             raise
     
     async def get_order_statistics(self, days: int = 30) -> Dict[str, Any]:
-        """获取订单统计信息"""
+        """获取订单统计信息（读取按日、按状态的订单计数表，统计粒度为天）"""
         try:
-            cutoff_date = datetime.utcnow() - timedelta(days=days)
-            
-            # 总订单数
-            total_result = await self.session.execute(
-                select(func.count(self.model.id))
-                .where(self.model.created_at >= cutoff_date)
+            cutoff_date = (datetime.utcnow() - timedelta(days=days)).date()
+            stats = OrderDailyStatistic
+            result = await self.session.execute(
+                select(stats.status, func.sum(stats.order_count), func.sum(stats.total_amount))
+                .where(stats.date >= cutoff_date)
+                .group_by(stats.status)
             )
-            total_orders = total_result.scalar()
             
-            # 总金额
-            amount_result = await self.session.execute(
-                select(func.sum(self.model.total_amount))
-                .where(self.model.created_at >= cutoff_date)
-            )
-            total_amount = amount_result.scalar() or 0
-            
-            # 各状态订单数
-            status_result = await self.session.execute(
-                select(self.model.status, func.count(self.model.id))
-                .where(self.model.created_at >= cutoff_date)
-                .group_by(self.model.status)
-            )
-            status_counts = {row[0]: row[1] for row in status_result.fetchall()}
+            status_counts = {}
+            total_orders = 0
+            total_amount = 0
+            for status, count, amount in result.fetchall():
+                if not count:
+                    continue
+                status_counts[status] = int(count)
+                total_orders += int(count)
+                total_amount += amount or 0
             
             return {
                 "total_orders": total_orders,
@@ -425,6 +421,138 @@ class OrderRepository(BaseRepository[Order]):
         except Exception as e:
             logger.error(f"获取订单统计信息失败: {e}")
             raise
+    
+    async def get_daily_order_statistics(self, days: int = 30) -> List[Dict[str, Any]]:
+        """获取最近 days 天每日的订单数与金额"""
+        try:
+            cutoff_date = (datetime.utcnow() - timedelta(days=days)).date()
+            stats = OrderDailyStatistic
+            result = await self.session.execute(
+                select(stats.date, func.sum(stats.order_count), func.sum(stats.total_amount))
+                .where(stats.date >= cutoff_date)
+                .group_by(stats.date)
+                .order_by(stats.date)
+            )
+            return [
+                {"date": day.isoformat(), "orders": int(count or 0), "amount": float(amount or 0)}
+                for day, count, amount in result.fetchall()
+            ]
+        except Exception as e:
+            logger.error(f"获取每日订单统计失败: {e}")
+            raise
+    
+    # ---------------- 订单计数维护 ----------------
+    # 创建、删除订单以及状态或金额变化时增量更新 order_daily_statistics，
+    # 统计接口只读取 O(天数×状态数) 行；计数与订单不一致时调用 rebuild_order_statistics 重建
+    
+    @staticmethod
+    def _stat_key(order: Order) -> Tuple[date, str, Any]:
+        day = order.created_at.date() if order.created_at else date.today()
+        status = getattr(order.status, "value", order.status)
+        return day, status, order.total_amount or 0
+    
+    async def _adjust_daily_stat(self, day: date, status: str, count: int, amount: Any) -> None:
+        """在数据库端原子地增减某日某状态的订单计数"""
+        dialect = self.session.get_bind().dialect.name
+        insert_stmt = pg_insert if dialect == "postgresql" else sqlite_insert
+        stats = OrderDailyStatistic
+        stmt = insert_stmt(stats).values(date=day, status=status, order_count=count, total_amount=amount)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[stats.date, stats.status],
+            set_={
+                "order_count": stats.order_count + count,
+                "total_amount": stats.total_amount + amount
+            }
+        )
+        await self.session.execute(stmt)
+    
+    async def _move_daily_stat(self, before: Tuple[date, str, Any], after: Tuple[date, str, Any]) -> None:
+        if before == after:
+            return
+        await self._adjust_daily_stat(before[0], before[1], -1, -before[2])
+        await self._adjust_daily_stat(after[0], after[1], 1, after[2])
+    
+    async def create(self, obj_in) -> Order:
+        """创建订单并计入订单计数"""
+        db_obj = await super().create(obj_in)
+        day, status, amount = self._stat_key(db_obj)
+        await self._adjust_daily_stat(day, status, 1, amount)
+        return db_obj
+    
+    async def bulk_create(self, objs_in) -> List[Order]:
+        """批量创建订单，按 (日期, 状态) 合并后更新订单计数"""
+        db_objs = await super().bulk_create(objs_in)
+        grouped: Dict[Tuple[date, str], List[Any]] = {}
+        for db_obj in db_objs:
+            day, status, amount = self._stat_key(db_obj)
+            entry = grouped.setdefault((day, status), [0, 0])
+            entry[0] += 1
+            entry[1] += amount
+        for (day, status), (count, amount) in grouped.items():
+            await self._adjust_daily_stat(day, status, count, amount)
+        return db_objs
+    
+    async def update(self, id: Any, obj_in) -> Optional[Order]:
+        """更新订单；状态、金额或创建日期变化时把计数从旧分组移到新分组"""
+        db_obj = await self.get(id)
+        if not db_obj:
+            return None
+        before = self._stat_key(db_obj)
+        db_obj = await super().update(id, obj_in)
+        await self._move_daily_stat(before, self._stat_key(db_obj))
+        return db_obj
+    
+    async def update_status(self, id: Any, status: str) -> Optional[Order]:
+        """更新订单状态"""
+        return await self.update(id, {"status": status})
+    
+    async def delete(self, id: Any) -> bool:
+        """删除订单并扣减订单计数"""
+        db_obj = await self.get(id)
+        if not db_obj:
+            return False
+        day, status, amount = self._stat_key(db_obj)
+        deleted = await super().delete(id)
+        if deleted:
+            await self._adjust_daily_stat(day, status, -1, -amount)
+        return deleted
+    
+    async def bulk_update(self, filters: Dict[str, Any], update_data: Dict[str, Any]) -> int:
+        """批量更新订单；涉及计数字段时重建订单计数"""
+        updated = await super().bulk_update(filters, update_data)
+        if updated and {"status", "total_amount", "created_at"} & set(update_data):
+            await self.rebuild_order_statistics()
+        return updated
+    
+    async def bulk_delete(self, filters: Dict[str, Any]) -> int:
+        """批量删除订单并重建订单计数"""
+        deleted = await super().bulk_delete(filters)
+        if deleted:
+            await self.rebuild_order_statistics()
+        return deleted
+    
+    async def rebuild_order_statistics(self) -> int:
+        """按订单表全量重建订单计数，返回计数分组数"""
+        try:
+            stats = OrderDailyStatistic
+            day = func.date(self.model.created_at)
+            await self.session.execute(delete(stats))
+            await self.session.execute(
+                insert(stats).from_select(
+                    ["date", "status", "order_count", "total_amount"],
+                    select(
+                        day,
+                        self.model.status,
+                        func.count(self.model.id),
+                        func.coalesce(func.sum(self.model.total_amount), 0)
+                    ).group_by(day, self.model.status)
+                )
+            )
+            result = await self.session.execute(select(func.count()).select_from(stats))
+            return result.scalar()
+        except Exception as e:
+            logger.error(f"重建订单计数失败: {e}")
+            raise
 
 class AnalyticsRepository(BaseRepository[PerformanceMetric]):
     """分析统计仓储"""
@@ -38,6 +38,7 @@ from config.settings import settings
 from utils.logger import get_logger, setup_logger
 from models.database import DatabaseManager, init_db
 from services.chat_service import get_chat_service
+from utils.streaming import StreamSink, reset_stream_sink, set_stream_sink
 
 # 设置日志
 setup_logger("customer_service", settings.LOG_LEVEL, settings.LOG_FILE)
@@ -60,6 +61,10 @@ async def lifespan(app: FastAPI):
         logger.info("📊 初始化数据库...")
         init_db()
         
+        # 订单库结构迁移（导入订单服务时不会自动执行）
+        from services.order_service import order_service
+        order_service.init_database()
+        
         # 检查数据库连接
         if db_manager.health_check():
             logger.info("✅ 数据库连接正常")
@@ -94,6 +99,14 @@ async def lifespan(app: FastAPI):
         db_manager.close()
         logger.info("✅ 数据库连接已关闭")
         
+        # 关闭商品搜索HTTP连接池
+        from services.product_search_service import product_search_service
+        await product_search_service.aclose()
+        
+        # 写入缓冲中的物流轨迹并关闭订单库连接池
+        from services.order_service import order_service
+        await order_service.aclose()
+
         # 清理智能体资源
         logger.info("🧹 清理智能体资源...")
         if hasattr(app.state, 'dispatcher'):
@@ -400,6 +413,16 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str = None):
                             chat_service = get_chat_service()
                             db = db_manager.get_session()
                             
+                            # 主智能体生成回复时逐段推送 bot_response_delta，最终仍以 bot_response 为准
+                            async def send_delta(payload: dict, _session_id=current_session_id):
+                                await safe_websocket_send(websocket, {
+                                    "type": "bot_response_delta",
+                                    "session_id": _session_id,
+                                    **payload,
+                                    "timestamp": datetime.now(beijing_tz).isoformat()
+                                })
+                            
+                            sink_token = set_stream_sink(StreamSink(send_delta))
                             try:
                                 # 处理消息并获取AI响应
                                 result = await chat_service.process_message(
@@ -415,6 +438,7 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str = None):
                                     db=db
                                 )
                             finally:
+                                reset_stream_sink(sink_token)
                                 # 确保数据库连接被正确关闭
                                 db.close()
                             
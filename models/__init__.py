@@ -15,7 +15,7 @@ from .customer import (
 
 # 导入订单相关模型
 from .order import (
-    Order, OrderItem, PaymentInfo, ShippingInfo,
+    Order, OrderItem, PaymentInfo, ShippingInfo, OrderDailyStatistic,
     OrderStatus, PaymentStatus, PaymentMethod, ShippingStatus
 )
 
@@ -49,7 +49,7 @@ __all__ = [
     "CustomerStatus", "CustomerSegment", "InteractionType",
     
     # 订单模型
-    "Order", "OrderItem", "PaymentInfo", "ShippingInfo",
+    "Order", "OrderItem", "PaymentInfo", "ShippingInfo", "OrderDailyStatistic",
     "OrderStatus", "PaymentStatus", "PaymentMethod", "ShippingStatus",
     
     # 知识库模型
@@ -8,7 +8,7 @@ from enum import Enum
 from typing import Optional, List, Dict, Any
 from decimal import Decimal
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float, Boolean, JSON, ForeignKey, Numeric
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, Float, Boolean, JSON, ForeignKey, Numeric
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.hybrid import hybrid_property
 
@@ -375,4 +375,23 @@ class ShippingInfo(Base):
             "insurance_cost": float(self.insurance_cost) if self.insurance_cost else 0,
             "total_cost": float(self.total_cost),
             "notes": self.notes
-        }
\ No newline at end of file
+        }
+
+
+class OrderDailyStatistic(Base):
+    """订单按日、按状态的物化计数（OrderRepository 在订单创建、状态或金额变化时增量维护）"""
+    __tablename__ = "order_daily_statistics"
+    
+    date = Column(Date, primary_key=True)            # 订单创建日期
+    status = Column(String(20), primary_key=True)    # 订单当前状态
+    order_count = Column(Integer, nullable=False, default=0)
+    total_amount = Column(Numeric(14, 2), nullable=False, default=0)
+    
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            "date": self.date.isoformat() if self.date else None,
+            "status": self.status,
+            "order_count": self.order_count,
+            "total_amount": float(self.total_amount) if self.total_amount else 0
+        }
@@ -22,9 +22,9 @@ def get_agent_dispatcher():
     return SmartAgentDispatcher
 
 from utils.logger import get_logger
-from utils.cache import CacheManager, MemoryCache
-from utils.rate_limiter import RateLimiter
-from config.settings import settings
+from utils.cache import CacheManager, create_cache_backend
+from utils.rate_limiter import create_rate_limiter
+from config.settings import settings, CACHE_CONFIG, RATE_LIMIT_CONFIG
 
 logger = get_logger(__name__)
 beijing_tz = timezone(timedelta(hours=8))
@@ -42,8 +42,22 @@ class ChatService:
         llm_service = LLMService()
         
         self.dispatcher = SmartAgentDispatcher(llm_service)
-        self.cache_manager = CacheManager(backend=MemoryCache())
-        self.rate_limiter = RateLimiter()
+        # tiered 模式下各工作进程共享 Redis L2，并通过失效广播保持 L1 一致
+        self.cache_manager = CacheManager(backend=create_cache_backend(
+            CACHE_CONFIG["backend"],
+            redis_url=settings.REDIS_URL,
+            redis_password=settings.REDIS_PASSWORD,
+            max_size=CACHE_CONFIG["l1_max_size"],
+            default_ttl=CACHE_CONFIG["default_ttl"],
+            l1_ttl=CACHE_CONFIG["l1_ttl"]
+        ))
+        self.rate_limiter = create_rate_limiter(
+            RATE_LIMIT_CONFIG["backend"],
+            max_requests=RATE_LIMIT_CONFIG["max_requests"],
+            time_window=RATE_LIMIT_CONFIG["time_window"],
+            redis_url=settings.REDIS_URL,
+            redis_password=settings.REDIS_PASSWORD
+        )
         self.active_sessions: Dict[str, Dict[str, Any]] = {}
     
     def _convert_to_priority(self, priority_str: str) -> 'Priority':
@@ -199,16 +213,7 @@ class ChatService:
                 ).first()
                 
                 if session:
-                    session_info = {
-                        "session_id": session.id,
-                        "customer_id": session.customer_id,
-                        "status": session.status,
-                        "created_at": session.created_at.isoformat(),
-                        "updated_at": session.updated_at.isoformat(),
-                        "message_count": len(session.messages) if hasattr(session, 'messages') else 0,
-                        "current_agent": session.current_agent,
-                        "context": session.context or {}
-                    }
+                    session_info = self._serialize_session(session)
                     
                     # 缓存会话信息
                     await self.cache_manager.set(
@@ -235,6 +240,19 @@ class ChatService:
                 "details": str(e)
             }
     
+    def _serialize_session(self, session: ChatSession) -> Dict[str, Any]:
+        """会话记录转换为会话信息"""
+        return {
+            "session_id": session.id,
+            "customer_id": session.customer_id,
+            "status": session.status,
+            "created_at": session.created_at.isoformat(),
+            "updated_at": session.updated_at.isoformat(),
+            "message_count": len(session.messages) if hasattr(session, 'messages') else 0,
+            "current_agent": session.current_agent,
+            "context": session.context or {}
+        }
+    
     async def get_conversation_history(
         self,
         session_id: str,
@@ -7,14 +7,20 @@ import time
 import httpx
 import asyncio
 import json
+import unicodedata
 from abc import ABC, abstractmethod
-from typing import List, Dict, Optional, Union, Any
+from contextvars import ContextVar
+from typing import List, Dict, Optional, Union, Any, AsyncIterator
 from dataclasses import dataclass
 from openai import AsyncOpenAI
 
-from config.settings import BaseConfig
+from config.settings import BaseConfig, LLM_RESPONSE_CACHE_CONFIG, LLM_CONCURRENCY_CONFIG
 from config.settings import get_settings
+from utils.cache import CacheKeyGenerator, MemoryCache, RedisCache, REDIS_AVAILABLE, stable_hash
+from utils.exceptions import OverloadException
 from utils.logger import get_logger
+from utils.rate_limiter import AdaptiveConcurrencyLimiter
+from utils.tokenizer import count_tokens
 
 logger = get_logger(__name__)
 
@@ -61,6 +67,21 @@ class LLMClient(ABC):
     ) -> LLMResponse:
         """聊天完成接口"""
         pass
+    
+    async def stream_chat_completion(
+        self,
+        messages: List[ChatMessage],
+        model: str,
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """流式聊天完成接口，逐段返回生成文本；默认退化为一次性返回完整结果"""
+        response = await self.chat_completion(messages, model, temperature, max_tokens, **kwargs)
+        if not response.success:
+            raise Exception(response.error or "LLM调用失败")
+        if response.content:
+            yield response.content
 
 class OpenAIClient(LLMClient):
     """OpenAI客户端实现"""
@@ -86,18 +107,10 @@ class OpenAIClient(LLMClient):
         start_time = time.time()
         
         try:
-            # 转换消息格式
-            openai_messages = []
-            for msg in messages:
-                message_dict = {"role": msg.role, "content": msg.content}
-                if msg.name:
-                    message_dict["name"] = msg.name
-                openai_messages.append(message_dict)
-            
             # 调用OpenAI API
             response = await self.client.chat.completions.create(
                 model=model,
-                messages=openai_messages,
+                messages=self._to_openai_messages(messages),
                 temperature=temperature,
                 max_tokens=max_tokens,
                 **kwargs
@@ -131,7 +144,180 @@ class OpenAIClient(LLMClient):
                 success=False,
                 error=str(e)
             )
+    
+    async def stream_chat_completion(
+        self,
+        messages: List[ChatMessage],
+        model: str,
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """OpenAI流式聊天完成"""
+        stream = await self.client.chat.completions.create(
+            model=model,
+            messages=self._to_openai_messages(messages),
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            **kwargs
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    
+    def _to_openai_messages(self, messages: List[ChatMessage]) -> List[Dict[str, str]]:
+        """转换消息格式"""
+        openai_messages = []
+        for msg in messages:
+            message_dict = {"role": msg.role, "content": msg.content}
+            if msg.name:
+                message_dict["name"] = msg.name
+            openai_messages.append(message_dict)
+        return openai_messages
+
+
+
+# 请求在排队截止时间内未获准执行（被丢弃）时返回给用户的回复，流式与非流式接口一致
+OVERLOAD_REPLY = "抱歉，当前咨询人数较多，请稍后再试。"
+
+# 当前调用链的LLM请求优先级（数值越小越优先），由调度器按 Message.priority 设置
+_PRIORITY_RANKS = {"urgent": 0, "high": 1, "medium": 2, "normal": 2, "low": 3}
+_request_priority: ContextVar[int] = ContextVar("llm_request_priority", default=2)
+
+
+def set_llm_priority(priority: Any):
+    """按消息优先级（Priority 枚举或字符串）设置当前调用链的LLM排队优先级，返回用于恢复的 token"""
+    value = getattr(priority, "value", priority)
+    return _request_priority.set(_PRIORITY_RANKS.get(str(value).lower(), 2))
+
 
+def reset_llm_priority(token) -> None:
+    """恢复之前的LLM排队优先级"""
+    _request_priority.reset(token)
+
+
+def estimate_tokens(messages: List[ChatMessage], max_tokens: int = 0) -> int:
+    """
+    粗略估算一次调用消耗的 token 数
+    
+    每条消息另计格式开销；上游按 max_tokens 预占输出额度，因此一并计入。
+    """
+    return sum(count_tokens(msg.content or "") + 4 for msg in messages) + max_tokens
+
+
+def _is_throttle_error(error: Optional[str]) -> bool:
+    """判断错误是否为上游限流（HTTP 429）"""
+    if not error:
+        return False
+    lowered = error.lower()
+    return "429" in lowered or "rate limit" in lowered or "rate_limit" in lowered
+
+
+# 归一化时去除的句末标点（NFKC 后全角标点已转为半角）
+_TRAILING_PUNCTUATION = "。.!?,~、 "
+
+
+class LLMResponseCache:
+    """
+    LLM响应缓存
+    
+    键由 (智能体, 模型, 温度, 归一化消息哈希) 组成；内存为第一层，可选 Redis 为第二层。
+    仅缓存配置了 TTL 且温度不高于阈值的智能体调用。
+    """
+    
+    def __init__(self, config: Optional[Dict[str, Any]] = None,
+                 memory_cache: Optional[MemoryCache] = None,
+                 redis_cache: Optional[RedisCache] = None):
+        self.config = {**LLM_RESPONSE_CACHE_CONFIG, **(config or {})}
+        self.enabled = self.config["enabled"]
+        self._memory = memory_cache or MemoryCache(max_size=self.config["max_size"])
+        self._redis = redis_cache if redis_cache is not None else self._create_redis_tier()
+        # 各智能体命中统计: {agent_name: {hits, misses, stores}}
+        self.stats: Dict[str, Dict[str, int]] = {}
+    
+    def _create_redis_tier(self) -> Optional[RedisCache]:
+        """按配置创建 Redis 第二层缓存"""
+        if self.config["backend"] != "redis":
+            return None
+        if not REDIS_AVAILABLE:
+            logger.warning("未安装redis，LLM响应缓存仅使用内存层")
+            return None
+        return RedisCache.from_url(BaseConfig.REDIS_URL, password=BaseConfig.REDIS_PASSWORD, key_prefix="cs:llm:")
+    
+    def get_ttl(self, agent_name: str, temperature: float) -> int:
+        """该次调用的缓存时间（秒），0 表示不缓存"""
+        if not self.enabled or temperature > self.config["max_temperature"]:
+            return 0
+        return int(self.config["agent_ttl"].get(agent_name, 0))
+    
+    @staticmethod
+    def normalize_content(text: str) -> str:
+        """归一化消息文本：统一全半角、合并空白、忽略大小写与句末标点"""
+        text = unicodedata.normalize("NFKC", text or "")
+        text = " ".join(text.split()).lower()
+        return text.rstrip(_TRAILING_PUNCTUATION)
+    
+    def make_key(self, agent_name: str, model: str, temperature: float,
+                 messages: List[Union[ChatMessage, Dict[str, str]]]) -> str:
+        """生成缓存键"""
+        normalized = []
+        for msg in messages:
+            role = msg.get("role") if isinstance(msg, dict) else msg.role
+            content = msg.get("content") if isinstance(msg, dict) else msg.content
+            normalized.append([role, self.normalize_content(content)])
+        return CacheKeyGenerator.agent_response(agent_name, f"{model}:{temperature}:{stable_hash(normalized)}")
+    
+    def _agent_stats(self, agent_name: str) -> Dict[str, int]:
+        return self.stats.setdefault(agent_name, {"hits": 0, "misses": 0, "stores": 0})
+    
+    async def get(self, agent_name: str, key: str) -> Optional[LLMResponse]:
+        """查询缓存：先内存后 Redis，Redis 命中时回填内存"""
+        stats = self._agent_stats(agent_name)
+        entry = await self._memory.get(key)
+        if entry is None and self._redis is not None:
+            entry = await self._redis.get(key)
+            if isinstance(entry, dict):
+                ttl = await self._redis.get_ttl(key)
+                if ttl:
+                    await self._memory.set(key, entry, ttl)
+            else:
+                entry = None
+        if entry is None:
+            stats["misses"] += 1
+            return None
+        
+        stats["hits"] += 1
+        return LLMResponse(
+            content=entry["content"],
+            model=entry["model"],
+            provider=entry["provider"],
+            usage={"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            response_time=0.0,
+            success=True
+        )
+    
+    async def set(self, agent_name: str, key: str, response: LLMResponse, ttl: int) -> None:
+        """写入成功的响应"""
+        if not response.success or not response.content:
+            return
+        entry = {"content": response.content, "model": response.model, "provider": response.provider}
+        await self._memory.set(key, entry, ttl)
+        if self._redis is not None:
+            await self._redis.set(key, entry, ttl)
+        self._agent_stats(agent_name)["stores"] += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取各智能体的缓存命中统计"""
+        agents = {}
+        for agent_name, stats in self.stats.items():
+            lookups = stats["hits"] + stats["misses"]
+            agents[agent_name] = {**stats, "hit_rate": round(stats["hits"] / lookups, 4) if lookups else 0.0}
+        return {
+            "enabled": self.enabled,
+            "backend": "memory+redis" if self._redis is not None else "memory",
+            "agents": agents
+        }
 
 
 class LLMService:
@@ -140,6 +326,19 @@ class LLMService:
     def __init__(self):
         self.clients: Dict[str, LLMClient] = {}
         self.config = BaseConfig()
+        self.response_cache = LLMResponseCache()
+        # 上游并发与令牌预算控制
+        self.admission = AdaptiveConcurrencyLimiter(
+            name="LLM服务",
+            initial_limit=LLM_CONCURRENCY_CONFIG["initial_limit"],
+            min_limit=LLM_CONCURRENCY_CONFIG["min_limit"],
+            max_limit=LLM_CONCURRENCY_CONFIG["max_limit"],
+            latency_target=LLM_CONCURRENCY_CONFIG["latency_target"],
+            backoff=LLM_CONCURRENCY_CONFIG["backoff"],
+            decrease_cooldown=LLM_CONCURRENCY_CONFIG["decrease_cooldown"],
+            tokens_per_minute=LLM_CONCURRENCY_CONFIG["tokens_per_minute"],
+            queue_timeout=LLM_CONCURRENCY_CONFIG["queue_timeout"]
+        ) if LLM_CONCURRENCY_CONFIG["enabled"] else None
         self._initialize_clients()
     
     def _initialize_clients(self):
@@ -150,6 +349,14 @@ class LLMService:
         if "openai" in llm_config:
             self.clients["openai"] = OpenAIClient("openai", llm_config["openai"])
     
+    def get_response_cache_stats(self) -> Dict[str, Any]:
+        """获取LLM响应缓存统计"""
+        return self.response_cache.get_stats()
+    
+    def get_admission_stats(self) -> Dict[str, Any]:
+        """获取LLM并发控制统计"""
+        return self.admission.get_stats() if self.admission else {"enabled": False}
+    
     def get_client(self, provider: str) -> Optional[LLMClient]:
         """获取指定提供商的客户端"""
         return self.clients.get(provider)
@@ -176,7 +383,69 @@ class LLMService:
                 error=f"未找到提供商 {provider} 的客户端"
             )
         
-        # 转换消息格式
+        chat_messages = self._to_chat_messages(messages)
+        if self.admission is None:
+            return await client.chat_completion(
+                messages=chat_messages,
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                **kwargs
+            )
+        
+        async with self.admission.slot(_request_priority.get(), estimate_tokens(chat_messages, max_tokens)) as permit:
+            response = await client.chat_completion(
+                messages=chat_messages,
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                **kwargs
+            )
+            permit.throttled = not response.success and _is_throttle_error(response.error)
+            return response
+    
+    async def stream_chat_completion(
+        self,
+        provider: str,
+        model: str,
+        messages: List[Union[ChatMessage, Dict[str, str]]],
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """统一的流式聊天完成接口，逐段返回生成文本"""
+        client = self.get_client(provider)
+        if not client:
+            raise ValueError(f"未找到提供商 {provider} 的客户端")
+        
+        chat_messages = self._to_chat_messages(messages)
+        if self.admission is None:
+            async for delta in client.stream_chat_completion(
+                messages=chat_messages,
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                **kwargs
+            ):
+                yield delta
+            return
+        
+        async with self.admission.slot(_request_priority.get(), estimate_tokens(chat_messages, max_tokens)) as permit:
+            try:
+                async for delta in client.stream_chat_completion(
+                    messages=chat_messages,
+                    model=model,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    **kwargs
+                ):
+                    yield delta
+            except Exception as e:
+                permit.throttled = _is_throttle_error(str(e))
+                raise
+    
+    def _to_chat_messages(self, messages: List[Union[ChatMessage, Dict[str, str]]]) -> List[ChatMessage]:
+        """转换消息格式"""
         chat_messages = []
         for msg in messages:
             if isinstance(msg, dict):
@@ -187,14 +456,7 @@ class LLMService:
                 ))
             else:
                 chat_messages.append(msg)
-        
-        return await client.chat_completion(
-            messages=chat_messages,
-            model=model,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            **kwargs
-        )
+        return chat_messages
     
     async def _make_chat_completion(
         self,
@@ -232,6 +494,93 @@ class LLMService:
         else:
             raise Exception(response.error or "LLM调用失败")
 
+    def _prepare_agent_request(self, agent_name: str, messages: List[Dict[str, str]],
+                               context_info: Dict[str, Any] = None) -> tuple:
+        """解析智能体模型配置并构建完整消息列表，返回 (智能体配置, 完整消息)"""
+        settings = get_settings()
+        
+        # 获取智能体配置
+        agent_config = settings.AGENT_MODEL_CONFIG.get(agent_name, {})
+        if not agent_config:
+            logger.warning(f"未找到智能体 {agent_name} 的配置，使用默认配置")
+            agent_config = {
+                "primary_model": "openai/gpt-4o-mini",
+                "fallback_model": "openai/gpt-3.5-turbo",
+                "temperature": 0.7,
+                "max_tokens": 1000
+            }
+        
+        # 构建系统提示
+        system_prompt = agent_config.get("system_prompt", "你是一个智能客服助手。")
+        if context_info:
+            system_prompt += f"\n\n当前上下文信息：{json.dumps(context_info, ensure_ascii=False)}"
+
+        # 如果调用方已经提供了system消息，则避免重复注入，保持指令单一
+        has_system = any(m.get("role") == "system" for m in messages)
+        full_messages = messages if has_system else [{"role": "system", "content": system_prompt}] + messages
+        return agent_config, full_messages
+
+    async def stream_agent_response(self, agent_name: str, messages: List[Dict[str, str]],
+                                    context_info: Dict[str, Any] = None) -> AsyncIterator[str]:
+        """
+        流式获取智能体响应，逐段返回生成文本
+        
+        主模型在输出首段文本前失败时切换备用模型；已开始输出后的异常直接抛出。
+        排队超时被丢弃时与 get_agent_response 一致，输出 OVERLOAD_REPLY 后结束。
+        """
+        agent_config, full_messages = self._prepare_agent_request(agent_name, messages, context_info)
+        temperature = agent_config.get("temperature", 0.7)
+        max_tokens = agent_config.get("max_tokens", 1000)
+        primary_model = agent_config.get("primary_model", "openai/gpt-4o-mini")
+        
+        # 命中响应缓存时一次性返回
+        cache_ttl = self.response_cache.get_ttl(agent_name, temperature)
+        cache_key = None
+        if cache_ttl:
+            cache_key = self.response_cache.make_key(agent_name, primary_model, temperature, full_messages)
+            cached = await self.response_cache.get(agent_name, cache_key)
+            if cached is not None:
+                yield cached.content
+                return
+        
+        last_error: Optional[Exception] = None
+        for model_ref in (primary_model, agent_config.get("fallback_model", "openai/gpt-3.5-turbo")):
+            emitted = False
+            parts = []
+            try:
+                provider, model = model_ref.split("/", 1)
+                async for delta in self.stream_chat_completion(
+                    provider=provider,
+                    model=model,
+                    messages=full_messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens
+                ):
+                    emitted = True
+                    parts.append(delta)
+                    yield delta
+                if cache_key:
+                    await self.response_cache.set(agent_name, cache_key, LLMResponse(
+                        content="".join(parts), model=model, provider=provider,
+                        usage={}, response_time=0.0, success=True
+                    ), cache_ttl)
+                return
+            except OverloadException as e:
+                # 排队超时时备用模型同样需要排队，不再切换
+                if emitted:
+                    raise
+                logger.warning(f"智能体 {agent_name} 请求被丢弃: {e.message}")
+                yield OVERLOAD_REPLY
+                return
+            except Exception as e:
+                # 已开始输出后不再切换
+                if emitted:
+                    raise
+                last_error = e
+                logger.warning(f"模型 {model_ref} 流式调用失败: {str(e)}")
+        
+        raise Exception(f"智能体 {agent_name} 流式响应生成失败: {last_error}")
+
     async def get_agent_response(self, agent_name: str, messages: List[Dict[str, str]], context_info: Dict[str, Any] = None) -> LLMResponse:
         """
         获取智能体响应
@@ -246,17 +595,7 @@ class LLMService:
         """
         try:
             settings = get_settings()
-            
-            # 获取智能体配置
-            agent_config = settings.AGENT_MODEL_CONFIG.get(agent_name, {})
-            if not agent_config:
-                logger.warning(f"未找到智能体 {agent_name} 的配置，使用默认配置")
-                agent_config = {
-                    "primary_model": "openai/gpt-4o-mini",
-                    "fallback_model": "openai/gpt-3.5-turbo",
-                    "temperature": 0.7,
-                    "max_tokens": 1000
-                }
+            agent_config, full_messages = self._prepare_agent_request(agent_name, messages, context_info)
             
             # 解析主模型和备用模型
             primary_model = agent_config.get("primary_model", "openai/gpt-4o-mini")
@@ -266,14 +605,15 @@ class LLMService:
             temperature = agent_config.get("temperature", 0.7)
             max_tokens = agent_config.get("max_tokens", 1000)
             
-            # 构建系统提示
-            system_prompt = agent_config.get("system_prompt", "你是一个智能客服助手。")
-            if context_info:
-                system_prompt += f"\n\n当前上下文信息：{json.dumps(context_info, ensure_ascii=False)}"
-
-            # 如果调用方已经提供了system消息，则避免重复注入，保持指令单一
-            has_system = any(m.get("role") == "system" for m in messages)
-            full_messages = messages if has_system else [{"role": "system", "content": system_prompt}] + messages
+            # 查询响应缓存（按智能体开启，高温度调用不缓存）
+            cache_ttl = self.response_cache.get_ttl(agent_name, temperature)
+            cache_key = None
+            if cache_ttl:
+                cache_key = self.response_cache.make_key(agent_name, primary_model, temperature, full_messages)
+                cached = await self.response_cache.get(agent_name, cache_key)
+                if cached is not None:
+                    logger.info(f"智能体 {agent_name} 命中响应缓存")
+                    return cached
             
             # 尝试使用主模型
             try:
@@ -291,9 +631,13 @@ class LLMService:
                     max_tokens=max_tokens
                 )
                 
+                if cache_key:
+                    await self.response_cache.set(agent_name, cache_key, response, cache_ttl)
                 logger.info(f"智能体 {agent_name} 使用主模型 {primary_model} 成功生成响应")
                 return response
                 
+            except OverloadException:
+                raise
             except Exception as e:
                 logger.warning(f"主模型 {primary_model} 调用失败: {str(e)}，尝试备用模型")
                 
@@ -313,6 +657,8 @@ class LLMService:
                         max_tokens=max_tokens
                     )
                     
+                    if cache_key:
+                        await self.response_cache.set(agent_name, cache_key, response, cache_ttl)
                     logger.info(f"智能体 {agent_name} 使用备用模型 {fallback_model} 成功生成响应")
                     return response
                     
@@ -320,6 +666,17 @@ class LLMService:
                     logger.error(f"备用模型 {fallback_model} 也调用失败: {str(fallback_error)}")
                     raise fallback_error
                     
+        except OverloadException as e:
+            logger.warning(f"智能体 {agent_name} 请求被丢弃: {e.message}")
+            return LLMResponse(
+                content=OVERLOAD_REPLY,
+                model="overloaded",
+                provider="error",
+                usage={},
+                response_time=0.0,
+                success=False,
+                error=e.message
+            )
         except Exception as e:
             logger.error(f"智能体 {agent_name} 响应生成失败: {str(e)}")
             return LLMResponse(
@@ -0,0 +1,413 @@
+"""
+订单库表结构与迁移
+
+OrderService 使用的 SQLite 库按 PRAGMA user_version 记录结构版本：
+新库直接按当前结构建表；已有库在启动时自动执行未应用的迁移，也可以手动执行：
+
+    python -m services.order_schema data/mock_orders.db data/orders.db
+
+各版本：
+    v1 orders 新增规范化收件手机号列 shipping_phone 并建索引
+    v2 商品、收货地址、物流由 orders 表中的 JSON 列拆分为 order_items / shipping_addresses / logistics 表，
+       物流轨迹统一保存在 logistics_tracking 表
+    v3 新增按日、按状态的订单计数表 order_daily_stats，由 orders 表上的触发器增量维护
+
+计数表与订单不一致时（如直接改库后）可以重建：
+
+    python -m services.order_schema --rebuild-stats data/mock_orders.db
+"""
+
+import argparse
+import json
+import logging
+import re
+import sqlite3
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 迁移时每批处理的行数
+BACKFILL_BATCH_SIZE = 1000
+
+_NON_DIGITS = re.compile(r"\D")
+
+
+def normalize_phone(phone: Optional[str]) -> str:
+    """规范化手机号：去除空格、横线等符号及 +86/0086 国家码，仅保留数字"""
+    digits = _NON_DIGITS.sub("", phone or "")
+    if len(digits) == 13 and digits.startswith("86"):
+        digits = digits[2:]
+    elif len(digits) == 15 and digits.startswith("0086"):
+        digits = digits[4:]
+    return digits
+
+
+CREATE_ORDERS_TABLE = """
+    CREATE TABLE IF NOT EXISTS orders (
+        order_id TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        total_amount REAL NOT NULL,
+        shipping_fee REAL NOT NULL,
+        discount_amount REAL NOT NULL,
+        final_amount REAL NOT NULL,
+        status TEXT NOT NULL,
+        payment_method TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        notes TEXT,
+        shipping_phone TEXT
+    )
+"""
+
+CREATE_ORDER_ITEMS_TABLE = """
+    CREATE TABLE IF NOT EXISTS order_items (
+        order_id TEXT NOT NULL,
+        line_no INTEGER NOT NULL,
+        product_id TEXT NOT NULL,
+        product_name TEXT NOT NULL,
+        product_sku TEXT,
+        product_category TEXT,
+        price REAL NOT NULL,
+        quantity INTEGER NOT NULL,
+        image_url TEXT,
+        specifications TEXT,
+        PRIMARY KEY (order_id, line_no)
+    ) WITHOUT ROWID
+"""
+
+CREATE_SHIPPING_ADDRESSES_TABLE = """
+    CREATE TABLE IF NOT EXISTS shipping_addresses (
+        order_id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        phone TEXT NOT NULL,
+        province TEXT,
+        city TEXT,
+        district TEXT,
+        address TEXT,
+        postal_code TEXT
+    )
+"""
+
+CREATE_LOGISTICS_TABLE = """
+    CREATE TABLE IF NOT EXISTS logistics (
+        order_id TEXT PRIMARY KEY,
+        tracking_number TEXT NOT NULL,
+        company TEXT NOT NULL,
+        status TEXT NOT NULL,
+        current_location TEXT,
+        estimated_delivery TEXT,
+        origin_address TEXT,
+        destination_address TEXT,
+        route_nodes TEXT
+    )
+"""
+
+CREATE_LOGISTICS_TRACKING_TABLE = """
+    CREATE TABLE IF NOT EXISTS logistics_tracking (
+        tracking_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        order_id TEXT NOT NULL,
+        tracking_number TEXT NOT NULL,
+        company TEXT NOT NULL,
+        status TEXT NOT NULL,
+        location TEXT NOT NULL,
+        description TEXT NOT NULL,
+        timestamp TEXT NOT NULL,
+        FOREIGN KEY (order_id) REFERENCES orders (order_id)
+    )
+"""
+
+CREATE_ORDER_DAILY_STATS_TABLE = """
+    CREATE TABLE IF NOT EXISTS order_daily_stats (
+        day TEXT NOT NULL,
+        status TEXT NOT NULL,
+        order_count INTEGER NOT NULL DEFAULT 0,
+        total_amount REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, status)
+    ) WITHOUT ROWID
+"""
+
+# 计数按订单创建日（created_at 前 10 位）与当前状态归类，状态或金额变化时从旧分组移到新分组
+_STATS_ADD = """
+        INSERT INTO order_daily_stats (day, status, order_count, total_amount)
+        VALUES (substr(NEW.created_at, 1, 10), NEW.status, 1, NEW.final_amount)
+        ON CONFLICT (day, status) DO UPDATE SET
+            order_count = order_count + 1,
+            total_amount = total_amount + excluded.total_amount;
+"""
+
+_STATS_REMOVE = """
+        UPDATE order_daily_stats
+        SET order_count = order_count - 1, total_amount = total_amount - OLD.final_amount
+        WHERE day = substr(OLD.created_at, 1, 10) AND status = OLD.status;
+        DELETE FROM order_daily_stats
+        WHERE day = substr(OLD.created_at, 1, 10) AND status = OLD.status AND order_count <= 0;
+"""
+
+ORDER_STATS_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_orders_stats_insert AFTER INSERT ON orders
+    BEGIN {_STATS_ADD}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_orders_stats_update AFTER UPDATE OF status, final_amount, created_at ON orders
+    WHEN OLD.status IS NOT NEW.status OR OLD.final_amount IS NOT NEW.final_amount
+         OR OLD.created_at IS NOT NEW.created_at
+    BEGIN {_STATS_REMOVE} {_STATS_ADD}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_orders_stats_delete AFTER DELETE ON orders
+    BEGIN {_STATS_REMOVE}
+    END
+    """,
+]
+
+ORDER_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_orders_shipping_phone ON orders (shipping_phone, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_orders_user_created ON orders (user_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_orders_status ON orders (status)",
+]
+
+DETAIL_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_order_items_sku ON order_items (product_sku)",
+    "CREATE INDEX IF NOT EXISTS idx_shipping_addresses_city ON shipping_addresses (city, district)",
+    "CREATE INDEX IF NOT EXISTS idx_logistics_tracking_number ON logistics (tracking_number)",
+    "CREATE INDEX IF NOT EXISTS idx_logistics_status ON logistics (status)",
+    "CREATE INDEX IF NOT EXISTS idx_logistics_tracking_order ON logistics_tracking (order_id, tracking_id)",
+]
+
+
+def _index_name(ddl: str) -> str:
+    return ddl.split(" ON ", 1)[0].split()[-1]
+
+
+def drop_secondary_indexes(conn: sqlite3.Connection) -> None:
+    """删除订单相关表的二级索引（批量导入前调用，导入后由 create_secondary_indexes 重建）"""
+    for ddl in ORDER_INDEXES + DETAIL_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {_index_name(ddl)}")
+
+
+def create_secondary_indexes(conn: sqlite3.Connection) -> None:
+    for ddl in ORDER_INDEXES + DETAIL_INDEXES:
+        conn.execute(ddl)
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _create_detail_tables(conn: sqlite3.Connection) -> None:
+    for ddl in (CREATE_ORDER_ITEMS_TABLE, CREATE_SHIPPING_ADDRESSES_TABLE,
+                CREATE_LOGISTICS_TABLE, CREATE_LOGISTICS_TRACKING_TABLE):
+        conn.execute(ddl)
+    for ddl in DETAIL_INDEXES:
+        conn.execute(ddl)
+
+
+def _iter_batches(conn: sqlite3.Connection, sql: str):
+    """按 rowid 分批读取（sql 需以 rowid 为第一列并包含 rowid > ? ... LIMIT ? 占位符）"""
+    last_rowid = 0
+    while True:
+        rows = conn.execute(sql, (last_rowid, BACKFILL_BATCH_SIZE)).fetchall()
+        if not rows:
+            return
+        yield rows
+        last_rowid = rows[-1][0]
+
+
+def _add_shipping_phone(conn: sqlite3.Connection) -> None:
+    """v1: 新增规范化收件手机号列并建立索引，回填已有订单"""
+    if "shipping_phone" not in _columns(conn, "orders"):
+        conn.execute("ALTER TABLE orders ADD COLUMN shipping_phone TEXT")
+
+    backfilled = 0
+    for rows in _iter_batches(conn, "SELECT rowid, shipping_address FROM orders "
+                                    "WHERE rowid > ? AND shipping_phone IS NULL ORDER BY rowid LIMIT ?"):
+        updates = []
+        for rowid, address in rows:
+            try:
+                phone = normalize_phone(json.loads(address).get("phone"))
+            except (TypeError, ValueError, AttributeError):
+                phone = ""
+            updates.append((phone, rowid))
+        conn.executemany("UPDATE orders SET shipping_phone = ? WHERE rowid = ?", updates)
+        backfilled += len(updates)
+
+    conn.execute(ORDER_INDEXES[0])
+    if backfilled:
+        logger.info(f"已回填 {backfilled} 条订单的收件手机号")
+
+
+def _normalize_order_blobs(conn: sqlite3.Connection) -> None:
+    """v2: 商品、收货地址、物流拆分为独立表，orders 表去除 JSON 列"""
+    _create_detail_tables(conn)
+
+    migrated = 0
+    for rows in _iter_batches(conn, "SELECT rowid, order_id, items, shipping_address, logistics_info FROM orders "
+                                    "WHERE rowid > ? ORDER BY rowid LIMIT ?"):
+        items, addresses, logistics, events, order_ids = [], [], [], [], []
+        for _, order_id, items_json, address_json, logistics_json in rows:
+            order_ids.append((order_id,))
+            for line_no, item in enumerate(json.loads(items_json or "[]")):
+                items.append((
+                    order_id, line_no, item.get("product_id", ""), item.get("product_name", ""),
+                    item.get("product_sku", ""), item.get("product_category", ""), item.get("price", 0.0),
+                    item.get("quantity", 1), item.get("image_url", ""),
+                    json.dumps(item.get("specifications") or {}, ensure_ascii=False)
+                ))
+            address = json.loads(address_json or "{}")
+            addresses.append((
+                order_id, address.get("name", ""), address.get("phone", ""), address.get("province", ""),
+                address.get("city", ""), address.get("district", ""), address.get("address", ""),
+                address.get("postal_code", "")
+            ))
+            if logistics_json:
+                info = json.loads(logistics_json)
+                logistics.append((
+                    order_id, info.get("tracking_number", ""), info.get("company", ""), info.get("status", ""),
+                    info.get("current_location", ""), info.get("estimated_delivery", ""),
+                    info.get("origin_address", ""), info.get("destination_address", ""),
+                    json.dumps(info.get("route_nodes") or [], ensure_ascii=False)
+                ))
+                # JSON 中的轨迹是此前读取时的唯一来源，以它为准重建轨迹表
+                for record in info.get("tracking_history") or []:
+                    events.append((
+                        order_id, info.get("tracking_number", ""), info.get("company", ""),
+                        record.get("status", ""), record.get("location", ""),
+                        record.get("description", ""), record.get("timestamp", "")
+                    ))
+
+        conn.executemany("DELETE FROM logistics_tracking WHERE order_id = ?", order_ids)
+        conn.executemany("INSERT OR REPLACE INTO order_items VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", items)
+        conn.executemany("INSERT OR REPLACE INTO shipping_addresses VALUES (?, ?, ?, ?, ?, ?, ?, ?)", addresses)
+        conn.executemany("INSERT OR REPLACE INTO logistics VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", logistics)
+        conn.executemany(
+            "INSERT INTO logistics_tracking (order_id, tracking_number, company, status, location, description, timestamp) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            events
+        )
+        migrated += len(rows)
+
+    # 重建 orders 表去除 JSON 列（SQLite 无法直接删除 NOT NULL 列）：
+    # 先建新表再改名，使 logistics_tracking 的外键仍指向 orders
+    conn.execute(CREATE_ORDERS_TABLE.replace("orders (", "orders_rebuilt (", 1))
+    conn.execute("""
+        INSERT INTO orders_rebuilt (order_id, user_id, total_amount, shipping_fee, discount_amount, final_amount,
+                                    status, payment_method, created_at, updated_at, notes, shipping_phone)
+        SELECT order_id, user_id, total_amount, shipping_fee, discount_amount, final_amount,
+               status, payment_method, created_at, updated_at, notes, shipping_phone
+        FROM orders
+    """)
+    conn.execute("DROP TABLE orders")
+    conn.execute("ALTER TABLE orders_rebuilt RENAME TO orders")
+    for ddl in ORDER_INDEXES:
+        conn.execute(ddl)
+    logger.info(f"已拆分 {migrated} 条订单的商品、地址与物流数据")
+
+
+def rebuild_order_daily_stats(conn: sqlite3.Connection) -> int:
+    """按 orders 表全量重建订单计数表，返回计数分组数"""
+    conn.execute("DELETE FROM order_daily_stats")
+    conn.execute("""
+        INSERT INTO order_daily_stats (day, status, order_count, total_amount)
+        SELECT substr(created_at, 1, 10), status, COUNT(*), COALESCE(SUM(final_amount), 0)
+        FROM orders GROUP BY 1, 2
+    """)
+    return conn.execute("SELECT COUNT(*) FROM order_daily_stats").fetchone()[0]
+
+
+def _create_order_daily_stats(conn: sqlite3.Connection) -> None:
+    conn.execute(CREATE_ORDER_DAILY_STATS_TABLE)
+    for ddl in ORDER_STATS_TRIGGERS:
+        conn.execute(ddl)
+
+
+def _add_order_daily_stats(conn: sqlite3.Connection) -> None:
+    """v3: 新增按日、按状态的订单计数表及维护触发器，并按已有订单回填"""
+    _create_order_daily_stats(conn)
+    groups = rebuild_order_daily_stats(conn)
+    logger.info(f"已回填 {groups} 个订单计数分组")
+
+
+# 按版本顺序排列的迁移，第 N 项把库升级到版本 N
+MIGRATIONS: List[Callable[[sqlite3.Connection], None]] = [
+    _add_shipping_phone,
+    _normalize_order_blobs,
+    _add_order_daily_stats,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def is_order_service_schema(conn: sqlite3.Connection) -> bool:
+    """库中的 orders 表是否为 OrderService 的结构（同名表可能属于其他模块）"""
+    columns = _columns(conn, "orders")
+    return not columns or "order_id" in columns
+
+
+def _create_current_schema(conn: sqlite3.Connection) -> None:
+    conn.execute(CREATE_ORDERS_TABLE)
+    for ddl in ORDER_INDEXES:
+        conn.execute(ddl)
+    _create_detail_tables(conn)
+    _create_order_daily_stats(conn)
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """建表或执行未应用的迁移（每个版本一个事务），返回迁移后的版本号"""
+    if not is_order_service_schema(conn):
+        raise RuntimeError("orders 表结构与订单服务不一致，无法迁移")
+    if conn.in_transaction:
+        conn.commit()
+
+    if not _columns(conn, "orders"):
+        # 新库：直接按当前结构建表
+        conn.execute("BEGIN")
+        _create_current_schema(conn)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+        return SCHEMA_VERSION
+
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for target, migration in enumerate(MIGRATIONS, start=1):
+        if version >= target:
+            continue
+        conn.execute("BEGIN")
+        try:
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {target}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        logger.info(f"订单库已迁移到版本 {target}: {migration.__doc__.strip()}")
+        version = target
+    return version
+
+
+def main():
+    parser = argparse.ArgumentParser(description="订单库结构迁移")
+    parser.add_argument("databases", nargs="+", help="SQLite 库文件路径")
+    parser.add_argument("--rebuild-stats", action="store_true", help="迁移后按订单全量重建订单计数表")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    for path in args.databases:
+        conn = sqlite3.connect(path)
+        try:
+            before = conn.execute("PRAGMA user_version").fetchone()[0]
+            after = migrate(conn)
+            print(f"{path}: 版本 {before} -> {after}")
+            if args.rebuild_stats:
+                with conn:
+                    groups = rebuild_order_daily_stats(conn)
+                print(f"{path}: 已重建订单计数表（{groups} 个分组）")
+        except RuntimeError as e:
+            print(f"{path}: 跳过（{e}）")
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
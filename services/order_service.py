@@ -3,16 +3,31 @@
 提供订单创建、查询、状态更新和物流跟踪功能
 """
 
-import sqlite3
 import json
+import logging
 import uuid
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass, asdict
+from typing import Dict, Iterable, Iterator, List, Optional, Any
+from dataclasses import dataclass
 import random
 import asyncio
 from pathlib import Path
 
+from config.settings import ORDER_DB_CONFIG
+from services.order_schema import (
+    create_secondary_indexes, drop_secondary_indexes, migrate, normalize_phone, rebuild_order_daily_stats
+)
+from services.tracking_writer import INSERT_TRACKING_SQL, TrackingEventWriter, tracking_row
+from utils.sqlite_pool import SQLitePool
+
+logger = logging.getLogger(__name__)
+
+# 订单主表查询的列顺序（与 _query_orders 对应）
+ORDER_COLUMNS = (
+    "order_id, user_id, total_amount, shipping_fee, discount_amount, final_amount, "
+    "status, payment_method, created_at, updated_at, notes"
+)
+
 @dataclass
 class OrderItem:
     """订单商品项"""
@@ -67,14 +82,107 @@ class Order:
     updated_at: str
     notes: str = ""
 
+UPSERT_ORDER_SQL = """
+    INSERT INTO orders
+    (order_id, user_id, total_amount, shipping_fee, discount_amount, final_amount,
+     status, payment_method, created_at, updated_at, notes, shipping_phone)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(order_id) DO UPDATE SET
+        user_id = excluded.user_id, total_amount = excluded.total_amount,
+        shipping_fee = excluded.shipping_fee, discount_amount = excluded.discount_amount,
+        final_amount = excluded.final_amount, status = excluded.status,
+        payment_method = excluded.payment_method, updated_at = excluded.updated_at,
+        notes = excluded.notes, shipping_phone = excluded.shipping_phone
+"""
+
+INSERT_ORDER_ITEM_SQL = """
+    INSERT INTO order_items
+    (order_id, line_no, product_id, product_name, product_sku, product_category,
+     price, quantity, image_url, specifications)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+UPSERT_ADDRESS_SQL = """
+    INSERT OR REPLACE INTO shipping_addresses
+    (order_id, name, phone, province, city, district, address, postal_code)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+UPSERT_LOGISTICS_SQL = """
+    INSERT OR REPLACE INTO logistics
+    (order_id, tracking_number, company, status, current_location, estimated_delivery,
+     origin_address, destination_address, route_nodes)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def _order_row(order: Order) -> tuple:
+    return (
+        order.order_id,
+        order.user_id,
+        order.total_amount,
+        order.shipping_fee,
+        order.discount_amount,
+        order.final_amount,
+        order.status,
+        order.payment_method,
+        order.created_at,
+        order.updated_at,
+        order.notes,
+        normalize_phone(order.shipping_address.phone)
+    )
+
+
+def _item_rows(order: Order) -> List[tuple]:
+    return [
+        (order.order_id, line_no, item.product_id, item.product_name, item.product_sku, item.product_category,
+         item.price, item.quantity, item.image_url, json.dumps(item.specifications or {}, ensure_ascii=False))
+        for line_no, item in enumerate(order.items)
+    ]
+
+
+def _address_row(order: Order) -> tuple:
+    address = order.shipping_address
+    return (order.order_id, address.name, address.phone, address.province, address.city,
+            address.district, address.address, address.postal_code)
+
+
+def _logistics_row(order: Order) -> tuple:
+    logistics = order.logistics_info
+    return (order.order_id, logistics.tracking_number, logistics.company, logistics.status,
+            logistics.current_location, logistics.estimated_delivery, logistics.origin_address,
+            logistics.destination_address, json.dumps(logistics.route_nodes or [], ensure_ascii=False))
+
 class OrderService:
     """订单服务类"""
     
-    def __init__(self, db_path: str = "data/customer_service.db"):
-        """初始化订单服务"""
+    def __init__(self, db_path: str = "data/customer_service.db", auto_migrate: bool = True):
+        """
+        初始化订单服务
+        
+        Args:
+            db_path: 订单库路径
+            auto_migrate: 构造时即建表并执行结构迁移；为 False 时不访问库文件，
+                需在启动阶段显式调用 init_database()
+        """
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        self._init_database()
+        # 长连接池（WAL），异步接口在专用线程池中执行，不阻塞事件循环
+        self.pool = SQLitePool(
+            self.db_path,
+            size=ORDER_DB_CONFIG["pool_size"],
+            pragmas=ORDER_DB_CONFIG["pragmas"],
+            name="orders"
+        )
+        self.schema_version: Optional[int] = None
+        if auto_migrate:
+            self.init_database()
+        # 物流轨迹缓冲写入（异步接口与批量模拟使用）
+        self.tracking_writer = TrackingEventWriter(
+            self.pool,
+            flush_size=ORDER_DB_CONFIG["tracking_flush_size"],
+            flush_interval=ORDER_DB_CONFIG["tracking_flush_interval"]
+        )
         
         # 模拟物流公司
         self.logistics_companies = [
@@ -101,41 +209,16 @@ class OrderService:
         """生成11位纯数字订单号"""
         return str(random.randint(10_000_000_000, 99_999_999_999))
 
-    def _init_database(self):
-        """初始化数据库"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS orders (
-                    order_id TEXT PRIMARY KEY,
-                    user_id TEXT NOT NULL,
-                    items TEXT NOT NULL,
-                    total_amount REAL NOT NULL,
-                    shipping_fee REAL NOT NULL,
-                    discount_amount REAL NOT NULL,
-                    final_amount REAL NOT NULL,
-                    status TEXT NOT NULL,
-                    payment_method TEXT NOT NULL,
-                    shipping_address TEXT NOT NULL,
-                    logistics_info TEXT,
-                    created_at TEXT NOT NULL,
-                    updated_at TEXT NOT NULL,
-                    notes TEXT
-                )
-            """)
-            
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS logistics_tracking (
-                    tracking_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    order_id TEXT NOT NULL,
-                    tracking_number TEXT NOT NULL,
-                    company TEXT NOT NULL,
-                    status TEXT NOT NULL,
-                    location TEXT NOT NULL,
-                    description TEXT NOT NULL,
-                    timestamp TEXT NOT NULL,
-                    FOREIGN KEY (order_id) REFERENCES orders (order_id)
-                )
-            """)
+    def init_database(self) -> Optional[int]:
+        """初始化数据库（建表并执行未应用的结构迁移），返回结构版本；重复调用不再访问库文件"""
+        if self.schema_version is not None:
+            return self.schema_version
+        with self.pool.connection() as conn:
+            try:
+                self.schema_version = migrate(conn)
+            except RuntimeError as e:
+                logger.warning(f"订单库 {self.db_path} 初始化失败: {e}")
+        return self.schema_version
 
     def create_order(self, user_id: str, items: List[Dict], 
                     shipping_address: Dict, payment_method: str = "支付宝",
@@ -191,69 +274,179 @@ class OrderService:
         return order
 
     def _save_order(self, order: Order):
-        """保存订单到数据库"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                INSERT OR REPLACE INTO orders 
-                (order_id, user_id, items, total_amount, shipping_fee, 
-                 discount_amount, final_amount, status, payment_method, 
-                 shipping_address, logistics_info, created_at, updated_at, notes)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                order.order_id,
-                order.user_id,
-                json.dumps([asdict(item) for item in order.items], ensure_ascii=False),
-                order.total_amount,
-                order.shipping_fee,
-                order.discount_amount,
-                order.final_amount,
-                order.status,
-                order.payment_method,
-                json.dumps(asdict(order.shipping_address), ensure_ascii=False),
-                json.dumps(asdict(order.logistics_info), ensure_ascii=False) if order.logistics_info else None,
-                order.created_at,
-                order.updated_at,
-                order.notes
-            ))
+        """保存订单到数据库（订单主表与商品、地址、物流明细表；物流轨迹由 _save_logistics_tracking 追加）"""
+        with self.pool.connection() as conn:
+            conn.execute(UPSERT_ORDER_SQL, _order_row(order))
+            conn.execute("DELETE FROM order_items WHERE order_id = ?", (order.order_id,))
+            conn.executemany(INSERT_ORDER_ITEM_SQL, _item_rows(order))
+            conn.execute(UPSERT_ADDRESS_SQL, _address_row(order))
+            if order.logistics_info:
+                conn.execute(UPSERT_LOGISTICS_SQL, _logistics_row(order))
+            else:
+                conn.execute("DELETE FROM logistics WHERE order_id = ?", (order.order_id,))
+
+    def bulk_insert_orders(self, orders: Iterable[Order], batch_size: Optional[int] = None,
+                           defer_indexes: bool = False) -> int:
+        """
+        批量写入订单（含商品、地址、物流与全部物流轨迹），返回写入的订单数
+
+        全部订单在同一个事务中写入，每 batch_size 个订单执行一轮 executemany；
+        已存在的订单号整体替换（明细与轨迹以传入的订单为准），任一批失败时整体回滚。
+        defer_indexes 为 True 时先删除二级索引、写完后重建，适合向空库载入大批量压测数据。
+        """
+        batch_size = batch_size or ORDER_DB_CONFIG["bulk_batch_size"]
+        total = 0
+        with self.pool.connection() as conn:
+            cache_size = conn.execute("PRAGMA cache_size").fetchone()[0]
+            conn.execute(f"PRAGMA cache_size = {ORDER_DB_CONFIG['bulk_cache_size']}")
+            try:
+                if defer_indexes:
+                    drop_secondary_indexes(conn)
+                batch: List[Order] = []
+                for order in orders:
+                    batch.append(order)
+                    if len(batch) >= batch_size:
+                        self._write_order_batch(conn, batch)
+                        total += len(batch)
+                        batch = []
+                if batch:
+                    self._write_order_batch(conn, batch)
+                    total += len(batch)
+                if defer_indexes:
+                    create_secondary_indexes(conn)
+            finally:
+                conn.execute(f"PRAGMA cache_size = {cache_size}")
+        logger.info(f"批量写入 {total} 条订单")
+        return total
+
+    @staticmethod
+    def _write_order_batch(conn, orders: List[Order]) -> None:
+        # 按主键排序写入，减少 B 树页的随机访问
+        orders = sorted(orders, key=lambda order: order.order_id)
+        order_ids = [order.order_id for order in orders]
+        placeholders = ",".join("?" * len(order_ids))
+        existing = [row[0] for row in conn.execute(
+            f"SELECT order_id FROM orders WHERE order_id IN ({placeholders})", order_ids
+        )]
+        if existing:
+            existing_placeholders = ",".join("?" * len(existing))
+            conn.execute(f"DELETE FROM order_items WHERE order_id IN ({existing_placeholders})", existing)
+            conn.execute(f"DELETE FROM logistics_tracking WHERE order_id IN ({existing_placeholders})", existing)
+
+        conn.executemany(UPSERT_ORDER_SQL, [_order_row(order) for order in orders])
+        conn.executemany(INSERT_ORDER_ITEM_SQL, [row for order in orders for row in _item_rows(order)])
+        conn.executemany(UPSERT_ADDRESS_SQL, [_address_row(order) for order in orders])
+        with_logistics = [order for order in orders if order.logistics_info]
+        conn.executemany(UPSERT_LOGISTICS_SQL, [_logistics_row(order) for order in with_logistics])
+        conn.executemany(INSERT_TRACKING_SQL, [
+            tracking_row(order.order_id, order.logistics_info.tracking_number, order.logistics_info.company, record)
+            for order in with_logistics
+            for record in order.logistics_info.tracking_history or []
+        ])
 
     def get_order(self, order_id: str) -> Optional[Order]:
         """获取订单信息"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute("""
-                SELECT * FROM orders WHERE order_id = ?
-            """, (order_id,))
-            row = cursor.fetchone()
-            
-            if not row:
-                return None
-            
-            # 解析数据
-            items_data = json.loads(row[2])
-            items = [OrderItem(**item) for item in items_data]
-            
-            shipping_address = ShippingAddress(**json.loads(row[9]))
-            
-            logistics_info = None
-            if row[10]:
-                logistics_data = json.loads(row[10])
-                logistics_info = LogisticsInfo(**logistics_data)
-            
-            return Order(
+        orders = self._query_orders("WHERE order_id = ?", (order_id,))
+        return orders[0] if orders else None
+
+    def get_order_by_tracking_number(self, tracking_number: str) -> Optional[Order]:
+        """按运单号查询订单"""
+        orders = self._query_orders(
+            "WHERE order_id IN (SELECT order_id FROM logistics WHERE tracking_number = ?)",
+            (tracking_number,)
+        )
+        return orders[0] if orders else None
+
+    def _query_orders(self, where: str, params: tuple) -> List[Order]:
+        """按条件查询订单主表，并批量加载明细组装为订单对象（保持主表查询的顺序）"""
+        with self.pool.connection() as conn:
+            rows = conn.execute(f"SELECT {ORDER_COLUMNS} FROM orders {where}", params).fetchall()
+            if not rows:
+                return []
+
+            order_ids = [row[0] for row in rows]
+            placeholders = ",".join("?" * len(order_ids))
+            # 先取缓冲中尚未落库的轨迹再查轨迹表，期间落库的记录按内容去重
+            pending = self.tracking_writer.pending(order_ids)
+
+            items: Dict[str, List[OrderItem]] = {}
+            for row in conn.execute(f"""
+                SELECT order_id, product_id, product_name, price, quantity, image_url,
+                       product_sku, product_category, specifications
+                FROM order_items WHERE order_id IN ({placeholders}) ORDER BY order_id, line_no
+            """, order_ids):
+                items.setdefault(row[0], []).append(OrderItem(
+                    product_id=row[1],
+                    product_name=row[2],
+                    price=row[3],
+                    quantity=row[4],
+                    image_url=row[5] or "",
+                    product_sku=row[6] or "",
+                    product_category=row[7] or "",
+                    specifications=json.loads(row[8]) if row[8] else {}
+                ))
+
+            addresses = {
+                row[0]: ShippingAddress(*row[1:])
+                for row in conn.execute(f"""
+                    SELECT order_id, name, phone, province, city, district, address, postal_code
+                    FROM shipping_addresses WHERE order_id IN ({placeholders})
+                """, order_ids)
+            }
+
+            history: Dict[str, List[Dict[str, Any]]] = {}
+            for row in conn.execute(f"""
+                SELECT order_id, status, location, description, timestamp
+                FROM logistics_tracking WHERE order_id IN ({placeholders}) ORDER BY order_id, tracking_id
+            """, order_ids):
+                history.setdefault(row[0], []).append({
+                    "status": row[1],
+                    "location": row[2],
+                    "description": row[3],
+                    "timestamp": row[4]
+                })
+
+            for order_id, records in pending.items():
+                stored = history.setdefault(order_id, [])
+                stored.extend(record for record in records if record not in stored)
+
+            logistics: Dict[str, LogisticsInfo] = {}
+            for row in conn.execute(f"""
+                SELECT order_id, tracking_number, company, status, current_location, estimated_delivery,
+                       origin_address, destination_address, route_nodes
+                FROM logistics WHERE order_id IN ({placeholders})
+            """, order_ids):
+                logistics[row[0]] = LogisticsInfo(
+                    tracking_number=row[1],
+                    company=row[2],
+                    status=row[3],
+                    current_location=row[4] or "",
+                    estimated_delivery=row[5] or "",
+                    tracking_history=history.get(row[0], []),
+                    origin_address=row[6] or "",
+                    destination_address=row[7] or "",
+                    route_nodes=json.loads(row[8]) if row[8] else []
+                )
+
+        return [
+            Order(
                 order_id=row[0],
                 user_id=row[1],
-                items=items,
-                total_amount=row[3],
-                shipping_fee=row[4],
-                discount_amount=row[5],
-                final_amount=row[6],
-                status=row[7],
-                payment_method=row[8],
-                shipping_address=shipping_address,
-                logistics_info=logistics_info,
-                created_at=row[11],
-                updated_at=row[12],
-                notes=row[13] or ""
+                items=items.get(row[0], []),
+                total_amount=row[2],
+                shipping_fee=row[3],
+                discount_amount=row[4],
+                final_amount=row[5],
+                status=row[6],
+                payment_method=row[7],
+                shipping_address=addresses.get(row[0]) or ShippingAddress("", "", "", "", "", ""),
+                logistics_info=logistics.get(row[0]),
+                created_at=row[8],
+                updated_at=row[9],
+                notes=row[10] or ""
             )
+            for row in rows
+        ]
 
     def update_order_status(self, order_id: str, status: str) -> bool:
         """更新订单状态"""
@@ -301,6 +494,7 @@ class OrderService:
         )
         
         order.logistics_info = logistics_info
+        self._save_logistics_tracking(order.order_id, tracking_number, company, logistics_info.tracking_history[0])
 
     def _start_logistics_tracking(self, order: Order):
         """开始物流跟踪"""
@@ -333,39 +527,31 @@ class OrderService:
                                     order.logistics_info.company, tracking_record)
 
     def _save_logistics_tracking(self, order_id: str, tracking_number: str, 
-                               company: str, record: Dict):
-        """保存物流跟踪记录"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                INSERT INTO logistics_tracking 
-                (order_id, tracking_number, company, status, location, description, timestamp)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (
-                order_id,
-                tracking_number,
-                company,
-                record["status"],
-                record["location"],
-                record["description"],
-                record["timestamp"]
-            ))
-
-    def seed_mock_orders(self, count: int = 30) -> List[Dict[str, Any]]:
-        """生成并写入模拟订单到数据库，同时保存到txt文件
-
-        - 订单号为11位纯数字
-        - 每个订单包含随机物流状态与轨迹
-        - 在 data/mock_orders.txt 输出便于测试
-        """
+                               company: str, record: Dict, buffered: bool = False):
+        """保存物流跟踪记录；buffered 为 True 时交给缓冲写入器批量落库"""
+        if buffered:
+            self.tracking_writer.add(order_id, tracking_number, company, record)
+            return
+        with self.pool.connection() as conn:
+            conn.execute(INSERT_TRACKING_SQL, tracking_row(order_id, tracking_number, company, record))
+
+    def iter_mock_orders(self, count: int) -> Iterator[Order]:
+        """逐个生成模拟订单（订单号为11位纯数字且互不重复，每个订单包含随机物流状态与轨迹）"""
         statuses = ["已下单", "已发货", "运输中", "派送中", "已签收"]
-        generated = []
+        used_numbers = set()
 
         for _ in range(count):
             order_number = self._generate_11_digit_number()
+            while order_number in used_numbers:
+                order_number = self._generate_11_digit_number()
+            used_numbers.add(order_number)
+            # 同一订单的各时间字段取同一时刻，避免逐字段调用 datetime.now()
+            now = datetime.now()
+            timestamp = now.isoformat()
 
             # 随机商品
             item = OrderItem(
-                product_id=str(uuid.uuid4())[:8],
+                product_id=f"{random.getrandbits(32):08x}",
                 product_name=random.choice(["时尚休闲T恤", "牛仔裤", "运动鞋", "连衣裙", "羽绒服"]),
                 product_sku=f"SKU{random.randint(100000,999999)}",
                 product_category=random.choice(["上衣","裤装","鞋靴","裙装","外套"]),
@@ -400,7 +586,7 @@ class OrderService:
                 "status": "已下单",
                 "location": "商家仓库",
                 "description": self.logistics_templates["已下单"],
-                "timestamp": datetime.now().isoformat()
+                "timestamp": timestamp
             }]
 
             # 如果随机状态在后续环节，补齐必要轨迹
@@ -409,7 +595,7 @@ class OrderService:
                     "status": "已发货",
                     "location": origin_city,
                     "description": self.logistics_templates["已发货"].format(origin=origin_city),
-                    "timestamp": datetime.now().isoformat()
+                    "timestamp": timestamp
                 }
                 history.append(record)
                 if init_status in ["运输中", "派送中", "已签收"]:
@@ -418,7 +604,7 @@ class OrderService:
                         "status": "运输中",
                         "location": loc,
                         "description": self.logistics_templates["运输中"].format(location=loc),
-                        "timestamp": datetime.now().isoformat()
+                        "timestamp": timestamp
                     }
                     history.append(record2)
                     if init_status in ["派送中", "已签收"]:
@@ -427,7 +613,7 @@ class OrderService:
                             "status": "派送中",
                             "location": dest,
                             "description": self.logistics_templates["派送中"].format(destination=dest),
-                            "timestamp": datetime.now().isoformat()
+                            "timestamp": timestamp
                         }
                         history.append(record3)
                         if init_status == "已签收":
@@ -435,7 +621,7 @@ class OrderService:
                                 "status": "已签收",
                                 "location": addr.address,
                                 "description": self.logistics_templates["已签收"].format(destination=addr.address),
-                                "timestamp": datetime.now().isoformat()
+                                "timestamp": timestamp
                             }
                             history.append(record4)
 
@@ -449,7 +635,7 @@ class OrderService:
                 company=company,
                 status=init_status,
                 current_location=origin_city if init_status != "已签收" else addr.address,
-                estimated_delivery=(datetime.now() + timedelta(days=random.randint(1, 5))).strftime("%Y-%m-%d"),
+                estimated_delivery=(now + timedelta(days=random.randint(1, 5))).strftime("%Y-%m-%d"),
                 tracking_history=history,
                 origin_address=origin_hub,
                 destination_address=destination_hub,
@@ -458,7 +644,7 @@ class OrderService:
 
             order = Order(
                 order_id=order_number,  # 使用11位纯数字作为订单号
-                user_id=str(uuid.uuid4())[:8],
+                user_id=f"{random.getrandbits(32):08x}",
                 items=[item],
                 total_amount=total,
                 shipping_fee=shipping_fee,
@@ -468,52 +654,66 @@ class OrderService:
                 payment_method="支付宝",
                 shipping_address=addr,
                 logistics_info=logistics,
-                created_at=datetime.now().isoformat(),
-                updated_at=datetime.now().isoformat(),
+                created_at=timestamp,
+                updated_at=timestamp,
                 notes="模拟订单"
             )
 
-            self._save_order(order)
-
-            # 保存每条物流轨迹到表
-            for rec in history:
-                self._save_logistics_tracking(order.order_id, tracking_number, company, rec)
-
-            generated.append({
-                "order_number": order_number,
-                "status": init_status,
-                "company": company,
-                "tracking_number": tracking_number,
-                "product_name": item.product_name,
-                "product_sku": item.product_sku,
-                "product_category": item.product_category,
-                "quantity": item.quantity,
-                "unit_price": item.price,
-                "origin": origin_hub,
-                "destination": destination_hub,
-                "current_location": logistics.current_location
-            })
-
-        # 写入txt文件
-        txt_path = self.db_path.parent / "mock_orders.txt"
-        with open(txt_path, "w", encoding="utf-8") as f:
-            # 订单号	状态	承运商	运单号	商品	SKU	类目	数量	单价	发货地	收货地	当前所在
-            for g in generated:
-                f.write(
-                    f"{g['order_number']}\t{g['status']}\t{g['company']}\t{g['tracking_number']}\t"
-                    f"{g['product_name']}\t{g['product_sku']}\t{g['product_category']}\t{g['quantity']}\t{g['unit_price']}\t"
-                    f"{g['origin']}\t{g['destination']}\t{g['current_location']}\n"
-                )
+            yield order
+
+    @staticmethod
+    def _mock_order_summary(order: Order) -> Dict[str, Any]:
+        item = order.items[0]
+        logistics = order.logistics_info
+        return {
+            "order_number": order.order_id,
+            "status": logistics.status,
+            "company": logistics.company,
+            "tracking_number": logistics.tracking_number,
+            "product_name": item.product_name,
+            "product_sku": item.product_sku,
+            "product_category": item.product_category,
+            "quantity": item.quantity,
+            "unit_price": item.price,
+            "origin": logistics.origin_address,
+            "destination": logistics.destination_address,
+            "current_location": logistics.current_location
+        }
+
+    def seed_mock_orders(self, count: int = 30, export_txt: bool = True,
+                         batch_size: Optional[int] = None) -> List[Dict[str, Any]]:
+        """生成并批量写入模拟订单，返回订单摘要
+
+        - 订单与物流轨迹经 bulk_insert_orders 在一个事务中写入
+        - export_txt 为 True 时在 data/mock_orders.txt 输出便于测试
+        - 大批量压测数据请直接使用 bulk_insert_orders(iter_mock_orders(n))，不在内存中保留摘要
+        """
+        orders = list(self.iter_mock_orders(count))
+        self.bulk_insert_orders(orders, batch_size)
+        generated = [self._mock_order_summary(order) for order in orders]
+
+        if export_txt:
+            txt_path = self.db_path.parent / "mock_orders.txt"
+            with open(txt_path, "w", encoding="utf-8") as f:
+                # 订单号	状态	承运商	运单号	商品	SKU	类目	数量	单价	发货地	收货地	当前所在
+                for g in generated:
+                    f.write(
+                        f"{g['order_number']}\t{g['status']}\t{g['company']}\t{g['tracking_number']}\t"
+                        f"{g['product_name']}\t{g['product_sku']}\t{g['product_category']}\t{g['quantity']}\t{g['unit_price']}\t"
+                        f"{g['origin']}\t{g['destination']}\t{g['current_location']}\n"
+                    )
 
         return generated
 
     async def get_order_by_number(self, order_number: str) -> Dict[str, Any]:
         """按订单号查询并返回Agent友好结构"""
-        order = self.get_order(order_number)
+        order = await self.pool.run(self.get_order, order_number)
         if not order:
             return {"success": False, "orders": []}
+        return {"success": True, "orders": [self._to_agent_info(order)]}
 
-        # 构造响应
+    def _to_agent_info(self, order: Order) -> Dict[str, Any]:
+        """订单转换为Agent友好结构"""
         item = order.items[0] if order.items else None
         info = {
             "order_number": order.order_id,
@@ -555,28 +755,22 @@ class OrderService:
                 "route_nodes": order.logistics_info.route_nodes or []
             }
 
-        return {"success": True, "orders": [info]}
+        return info
 
     async def get_orders_by_phone(self, phone: str, limit: int = 5) -> Dict[str, Any]:
-        """按收件手机号查询订单（地址JSON里包含phone）"""
-        results: List[Dict[str, Any]] = []
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute("SELECT * FROM orders")
-            for row in cursor.fetchall():
-                addr = json.loads(row[9])
-                if addr.get("phone") == phone:
-                    # 复用 get_order_by_number 的结构
-                    order_id = row[0]
-                    data = await self.get_order_by_number(order_id)
-                    if data.get("orders"):
-                        results.extend(data["orders"])
-                    if len(results) >= limit:
-                        break
-        return {"success": True, "orders": results}
-
-
-    def simulate_logistics_progress(self, order_id: str) -> bool:
-        """模拟物流进度更新"""
+        """按收件手机号查询最近的订单（走规范化手机号索引）"""
+        normalized = normalize_phone(phone)
+        if not normalized:
+            return {"success": True, "orders": []}
+        orders = await self.pool.run(self._get_orders_by_phone, normalized, limit)
+        return {"success": True, "orders": [self._to_agent_info(order) for order in orders]}
+
+    def _get_orders_by_phone(self, normalized_phone: str, limit: int) -> List[Order]:
+        return self._query_orders("WHERE shipping_phone = ? ORDER BY created_at DESC LIMIT ?",
+                                  (normalized_phone, limit))
+
+    def simulate_logistics_progress(self, order_id: str, buffered: bool = False) -> bool:
+        """模拟物流进度更新；buffered 为 True 时新轨迹经缓冲写入器批量落库"""
         order = self.get_order(order_id)
         if not order or not order.logistics_info:
             return False
@@ -631,7 +825,7 @@ class OrderService:
                 # 保存更新
                 self._save_order(order)
                 self._save_logistics_tracking(order_id, order.logistics_info.tracking_number,
-                                            order.logistics_info.company, tracking_record)
+                                            order.logistics_info.company, tracking_record, buffered)
                 
                 return True
         except ValueError:
@@ -641,43 +835,7 @@ class OrderService:
 
     def get_user_orders(self, user_id: str, limit: int = 10) -> List[Order]:
         """获取用户订单列表"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute("""
-                SELECT * FROM orders WHERE user_id = ? 
-                ORDER BY created_at DESC LIMIT ?
-            """, (user_id, limit))
-            
-            orders = []
-            for row in cursor.fetchall():
-                items_data = json.loads(row[2])
-                items = [OrderItem(**item) for item in items_data]
-                
-                shipping_address = ShippingAddress(**json.loads(row[9]))
-                
-                logistics_info = None
-                if row[10]:
-                    logistics_data = json.loads(row[10])
-                    logistics_info = LogisticsInfo(**logistics_data)
-                
-                order = Order(
-                    order_id=row[0],
-                    user_id=row[1],
-                    items=items,
-                    total_amount=row[3],
-                    shipping_fee=row[4],
-                    discount_amount=row[5],
-                    final_amount=row[6],
-                    status=row[7],
-                    payment_method=row[8],
-                    shipping_address=shipping_address,
-                    logistics_info=logistics_info,
-                    created_at=row[11],
-                    updated_at=row[12],
-                    notes=row[13] or ""
-                )
-                orders.append(order)
-            
-            return orders
+        return self._query_orders("WHERE user_id = ? ORDER BY created_at DESC LIMIT ?", (user_id, limit))
 
     def cancel_order(self, order_id: str, reason: str = "") -> bool:
         """取消订单"""
@@ -696,21 +854,27 @@ class OrderService:
         self._save_order(order)
         return True
 
-    def get_order_statistics(self, user_id: str = None) -> Dict[str, Any]:
-        """获取订单统计信息"""
-        with sqlite3.connect(self.db_path) as conn:
+    def get_order_statistics(self, user_id: str = None, days: Optional[int] = None) -> Dict[str, Any]:
+        """
+        获取订单统计信息
+
+        全部订单的统计读取按日、按状态的计数表（O(天数×状态数) 行）；
+        指定用户时按 (user_id, created_at) 索引聚合该用户的订单。days 为空时统计全部日期。
+        """
+        since = (datetime.now() - timedelta(days=days - 1)).strftime("%Y-%m-%d") if days else ""
+        with self.pool.connection() as conn:
             if user_id:
                 cursor = conn.execute("""
                     SELECT status, COUNT(*), SUM(final_amount) 
-                    FROM orders WHERE user_id = ? 
+                    FROM orders WHERE user_id = ? AND created_at >= ?
                     GROUP BY status
-                """, (user_id,))
+                """, (user_id, since))
             else:
                 cursor = conn.execute("""
-                    SELECT status, COUNT(*), SUM(final_amount) 
-                    FROM orders 
+                    SELECT status, SUM(order_count), SUM(total_amount)
+                    FROM order_daily_stats WHERE day >= ?
                     GROUP BY status
-                """)
+                """, (since,))
             
             stats = {}
             total_orders = 0
@@ -731,7 +895,89 @@ class OrderService:
                 "by_status": stats
             }
 
+    def get_daily_order_statistics(self, days: int = 30) -> List[Dict[str, Any]]:
+        """按日订单数与金额（最近 days 天，含今天，缺少订单的日期补 0），读取订单计数表"""
+        today = datetime.now().date()
+        dates = [(today - timedelta(days=offset)).isoformat() for offset in range(days - 1, -1, -1)]
+        daily = {date: {"date": date, "orders": 0, "amount": 0.0, "by_status": {}} for date in dates}
+        with self.pool.connection() as conn:
+            rows = conn.execute("""
+                SELECT day, status, order_count, total_amount FROM order_daily_stats
+                WHERE day >= ? ORDER BY day
+            """, (dates[0],)).fetchall()
+        for day, status, count, amount in rows:
+            entry = daily.get(day)
+            if entry is None:
+                continue
+            entry["orders"] += count
+            entry["amount"] += amount
+            entry["by_status"][status] = count
+        return list(daily.values())
+
+    def rebuild_order_statistics(self) -> int:
+        """按订单全量重建订单计数表，返回计数分组数"""
+        with self.pool.connection() as conn:
+            groups = rebuild_order_daily_stats(conn)
+        logger.info(f"已重建订单计数表（{groups} 个分组）")
+        return groups
+
+    # ------------------------ 异步接口 ------------------------
+    # 同步方法在订单库专用线程池中执行，整个调用共用一个连接、一个事务
+
+    async def create_order_async(self, user_id: str, items: List[Dict], shipping_address: Dict,
+                                 payment_method: str = "支付宝", notes: str = "") -> Order:
+        return await self.pool.run(self.create_order, user_id, items, shipping_address, payment_method, notes)
+
+    async def get_order_async(self, order_id: str) -> Optional[Order]:
+        return await self.pool.run(self.get_order, order_id)
+
+    async def update_order_status_async(self, order_id: str, status: str) -> bool:
+        return await self.pool.run(self.update_order_status, order_id, status)
+
+    async def cancel_order_async(self, order_id: str, reason: str = "") -> bool:
+        return await self.pool.run(self.cancel_order, order_id, reason)
+
+    async def simulate_logistics_progress_async(self, order_id: str) -> bool:
+        self.tracking_writer.start()
+        return await self.pool.run(self.simulate_logistics_progress, order_id, True)
+
+    async def add_tracking_event_async(self, order_id: str, tracking_number: str, company: str,
+                                       record: Dict[str, Any]) -> None:
+        """追加一条物流轨迹（如承运商回调），按条数或时间批量落库"""
+        self.tracking_writer.start()
+        self.tracking_writer.add(order_id, tracking_number, company, record)
+
+    async def bulk_insert_orders_async(self, orders: Iterable[Order], batch_size: Optional[int] = None) -> int:
+        return await self.pool.run(self.bulk_insert_orders, orders, batch_size)
+
+    async def get_order_by_tracking_number_async(self, tracking_number: str) -> Optional[Order]:
+        return await self.pool.run(self.get_order_by_tracking_number, tracking_number)
+
+    async def get_user_orders_async(self, user_id: str, limit: int = 10) -> List[Order]:
+        return await self.pool.run(self.get_user_orders, user_id, limit)
+
+    async def get_order_statistics_async(self, user_id: str = None, days: Optional[int] = None) -> Dict[str, Any]:
+        return await self.pool.run(self.get_order_statistics, user_id, days)
+
+    async def get_daily_order_statistics_async(self, days: int = 30) -> List[Dict[str, Any]]:
+        return await self.pool.run(self.get_daily_order_statistics, days)
+
+    async def aclose(self):
+        """写入缓冲中的物流轨迹并关闭连接池（写入失败时仍关闭连接池并抛出异常）"""
+        try:
+            await self.tracking_writer.close()
+        finally:
+            self.pool.close()
+
+    def close(self):
+        """写入缓冲中的物流轨迹并关闭订单库连接池（事件循环中请使用 aclose）"""
+        try:
+            self.tracking_writer.close_sync()
+        finally:
+            self.pool.close()
+
 # 导出一个全局实例，便于在智能体与API中复用
-order_service = OrderService(db_path="data/mock_orders.db")
+# 导入时不访问库文件（也不切换 WAL）；由应用启动时调用 init_database()，或离线执行 python -m services.order_schema 迁移
+order_service = OrderService(db_path="data/mock_orders.db", auto_migrate=False)
 
 __all__ = ["OrderService", "order_service"]
\ No newline at end of file
@@ -3,23 +3,189 @@
 商品搜索服务 - 集成全网商品搜索API
 """
 
-import requests
+import asyncio
+import httpx
 import json
 import logging
-from typing import Dict, List, Optional, Any
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime
 from urllib.parse import quote_plus
 
+from config.settings import BaseConfig, PRODUCT_SEARCH_CONFIG
+from utils.keyword_matcher import KeywordMatcher
+from utils.cache import CacheBackend, CacheKeyGenerator, MemoryCache, RedisCache, REDIS_AVAILABLE
+
 logger = logging.getLogger(__name__)
 
+# 当前调用链上的搜索延迟预算（秒），由调度器按对话轮次设置
+_latency_budget: ContextVar[Optional[float]] = ContextVar("search_latency_budget", default=None)
+
+
+def set_search_latency_budget(seconds: Optional[float]):
+    """设置当前调用链的搜索延迟预算，返回用于恢复的 token"""
+    return _latency_budget.set(seconds)
+
+
+def reset_search_latency_budget(token) -> None:
+    """恢复之前的搜索延迟预算"""
+    _latency_budget.reset(token)
+
+
+# 常见的关键词扩展映射
+_CATEGORY_EXPANSIONS = {
+    '衬衫': '衬衫 衬衣 shirt',
+    '裤子': '裤子 长裤 pants',
+    '裙子': '裙子 连衣裙 dress skirt',
+    '外套': '外套 夹克 jacket coat',
+    '鞋子': '鞋子 鞋 shoes',
+    '包': '包 包包 bag',
+    '帽子': '帽子 hat cap',
+    '手表': '手表 腕表 watch',
+    '眼镜': '眼镜 glasses',
+    '项链': '项链 necklace',
+    '耳环': '耳环 earrings',
+    '戒指': '戒指 ring',
+    '手链': '手链 bracelet',
+    '围巾': '围巾 scarf',
+    '手套': '手套 gloves',
+    '袜子': '袜子 socks',
+    '内衣': '内衣 underwear',
+    '睡衣': '睡衣 pajamas',
+    '运动服': '运动服 sportswear',
+    '牛仔裤': '牛仔裤 jeans',
+    'T恤': 'T恤 t-shirt tshirt',
+    '毛衣': '毛衣 sweater',
+    '西装': '西装 suit',
+    '连衣裙': '连衣裙 dress',
+    '短裤': '短裤 shorts',
+    '背心': '背心 vest',
+    '风衣': '风衣 trench coat',
+    '羽绒服': '羽绒服 down jacket',
+    '卫衣': '卫衣 hoodie',
+    'polo衫': 'polo衫 polo shirt',
+    '马甲': '马甲 vest waistcoat',
+}
+
+# 颜色扩展
+_COLOR_EXPANSIONS = {
+    '红': '红色 red',
+    '蓝': '蓝色 blue',
+    '绿': '绿色 green',
+    '黄': '黄色 yellow',
+    '黑': '黑色 black',
+    '白': '白色 white',
+    '灰': '灰色 gray grey',
+    '粉': '粉色 pink',
+    '紫': '紫色 purple',
+    '橙': '橙色 orange',
+    '棕': '棕色 brown',
+    '米': '米色 beige',
+    '卡其': '卡其色 khaki',
+    '藏青': '藏青色 navy',
+}
+
+# 尺码扩展
+_SIZE_EXPANSIONS = {
+    'xs': 'XS 加小号',
+    's': 'S 小号',
+    'm': 'M 中号',
+    'l': 'L 大号',
+    'xl': 'XL 加大号',
+    'xxl': 'XXL 特大号',
+    'xxxl': 'XXXL 超大号',
+}
+
+KEYWORD_EXPANSIONS = {**_CATEGORY_EXPANSIONS, **_COLOR_EXPANSIONS, **_SIZE_EXPANSIONS}
+KEYWORD_EXPANSION_MATCHER = KeywordMatcher({"expansion": KEYWORD_EXPANSIONS.keys()})
+
+# 性别标记词
+MALE_MARKERS = ['男士', '男生', '男性', '男装', '男款', '男']
+FEMALE_MARKERS = ['女士', '女生', '女性', '女装', '女款', '女']
+UNISEX_MARKERS = ['中性', '男女同款', '情侣', '通用', 'unisex', '男女']
+GENDER_MATCHER = KeywordMatcher({
+    "male": MALE_MARKERS,
+    "female": FEMALE_MARKERS,
+    "unisex": UNISEX_MARKERS
+})
+
+
 class ProductSearchService:
     """全网商品搜索服务"""
     
-    def __init__(self):
+    def __init__(self,
+                 transport: Optional[httpx.AsyncBaseTransport] = None,
+                 config: Optional[Dict[str, Any]] = None,
+                 cache_backend: Optional[CacheBackend] = None):
         self.appkey = ""
         self.sid = ""
         self.pid = ""
         self.base_url = ""
+        self.config = {**PRODUCT_SEARCH_CONFIG, **(config or {})}
+        # 可注入的上游传输层（如 httpx.MockTransport），用于压测或离线调试
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        
+        # 搜索结果缓存
+        self._result_cache = cache_backend
+        if self._result_cache is None and self.config["cache_enabled"]:
+            self._result_cache = self._create_cache_backend()
+        self._refresh_tasks: Dict[str, asyncio.Task] = {}
+        self.cache_stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "refreshes": 0
+        }
+    
+    def _create_cache_backend(self) -> CacheBackend:
+        """按配置创建缓存后端，Redis不可用时退回内存缓存"""
+        backend_ttl = self.config["cache_ttl"] + self.config["cache_stale_ttl"]
+        if self.config["cache_backend"] == "redis":
+            if REDIS_AVAILABLE:
+                return RedisCache.from_url(
+                    BaseConfig.REDIS_URL,
+                    password=BaseConfig.REDIS_PASSWORD,
+                    default_ttl=backend_ttl
+                )
+            logger.warning("未安装redis，商品搜索缓存使用内存后端")
+        return MemoryCache(max_size=self.config["cache_max_size"], default_ttl=backend_ttl)
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """获取共享的异步HTTP客户端（懒加载，连接池复用长连接）"""
+        if self._client is None or self._client.is_closed:
+            limits = httpx.Limits(
+                max_connections=self.config["max_connections"],
+                max_keepalive_connections=self.config["max_keepalive_connections"],
+                keepalive_expiry=self.config["keepalive_expiry"]
+            )
+            timeout = httpx.Timeout(
+                self.config["request_timeout"],
+                connect=self.config["connect_timeout"]
+            )
+            self._client = httpx.AsyncClient(limits=limits, timeout=timeout, transport=self._transport)
+        return self._client
+    
+    def _get_host_semaphore(self, url: str) -> asyncio.Semaphore:
+        """获取目标主机的并发信号量"""
+        try:
+            host = httpx.URL(url).host or "default"
+        except Exception:
+            host = "default"
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.config["per_host_concurrency"])
+            self._host_semaphores[host] = semaphore
+        return semaphore
+    
+    async def aclose(self):
+        """关闭HTTP客户端，释放连接池"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
     
     async def search_products(self, 
                             keyword: str, 
@@ -27,7 +193,9 @@ class ProductSearchService:
                             page_size: int = 10, 
                             sort: str = 'total_sales_des',
                             price_min: Optional[float] = None,
-                            price_max: Optional[float] = None) -> Dict[str, Any]:
+                            price_max: Optional[float] = None,
+                            deadline: Optional[float] = None,
+                            strategy_mode: Optional[str] = None) -> Dict[str, Any]:
         """
         搜索商品 - 支持模糊搜索和关键词扩展
         
@@ -38,116 +206,200 @@ class ProductSearchService:
             sort: 排序方式 (total_sales_des, price_asc, price_desc等)
             price_min: 最低价格
             price_max: 最高价格
+            deadline: 整次搜索的总时限（秒），默认取调用链延迟预算或配置 request_deadline
+            strategy_mode: 关键词策略执行模式（sequential/race/hedge），默认取配置
             
         Returns:
             搜索结果字典
         """
-        # 尝试多种搜索策略
-        search_strategies = [
-            keyword,  # 原始关键词
-            self._expand_keyword(keyword),  # 扩展关键词
-            self._simplify_keyword(keyword),  # 简化关键词
-        ]
+        if deadline is None:
+            deadline = _latency_budget.get()
+        budget = deadline if deadline is not None else self.config["request_deadline"]
+        mode = strategy_mode or self.config["strategy_mode"]
         
-        for strategy_keyword in search_strategies:
-            if not strategy_keyword:
-                continue
-                
-            params = {
-                'appkey': self.appkey,
-                'sid': self.sid,
-                'pid': self.pid,
-                'q': strategy_keyword,
-                'page': page,
-                'page_size': page_size,
-                'sort': sort
-            }
-            
-            # 添加API原生价格过滤支持
-            if price_min is not None:
-                params['price_min'] = price_min
-            if price_max is not None:
-                params['price_max'] = price_max
+        if self._result_cache is None:
+            result, _ = await self._fetch(keyword, page, page_size, sort, price_min, price_max, budget, mode)
+            return result or self._empty_result(keyword)
+        
+        cache_key = self._make_cache_key(keyword, page, page_size, sort, price_min, price_max)
+        cached = await self._cache_lookup(cache_key)
+        if cached is not None:
+            result, fresh = cached
+            if not fresh:
+                self._schedule_refresh(cache_key, keyword, page, page_size, sort, price_min, price_max, mode)
+            return result
+        
+        self.cache_stats["misses"] += 1
+        return await self._fetch_and_store(cache_key, keyword, page, page_size, sort, price_min, price_max, budget, mode)
+    
+    async def search_many(self,
+                          keywords: List[str],
+                          page: int = 1,
+                          page_size: int = 10,
+                          sort: str = 'total_sales_des',
+                          price_min: Optional[float] = None,
+                          price_max: Optional[float] = None,
+                          deadline: Optional[float] = None,
+                          max_concurrency: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        批量搜索多个关键词 - 并发执行、关键词去重、共享总时限
+        
+        Args:
+            keywords: 关键词列表
+            deadline: 整批搜索的总时限（秒），默认取调用链延迟预算或配置 request_deadline
+            max_concurrency: 同时进行的搜索数，默认取配置 batch_concurrency
             
-            try:
-                logger.info(f"尝试搜索关键词: {strategy_keyword}")
-                logger.info(f"请求参数: {params}")
-                
-                # 添加重试机制和更详细的超时处理
-                max_retries = 2
-                for attempt in range(max_retries + 1):
-                    try:
-                        response = requests.get(self.base_url, params=params, timeout=8)
-                        logger.info(f"API响应状态码: {response.status_code}")
-                        
-                        # 检查HTTP状态码
-                        if response.status_code != 200:
-                            logger.warning(f"API返回非200状态码: {response.status_code}, 尝试: {attempt + 1}/{max_retries + 1}")
-                            if attempt < max_retries:
-                                continue
-                            else:
-                                raise Exception(f"API返回状态码: {response.status_code}")
-                        
-                        result = response.json()
-                        logger.info(f"API响应内容: {result}")
-                        
-                        if result.get('status') == 200:
-                            items = result.get('content', [])
-                            
-                            # 如果找到商品，处理并返回
-                            if items:
-                                # 价格过滤
-                                if price_min is not None or price_max is not None:
-                                    items = self._filter_by_price(items, price_min, price_max)
-                                
-                                # 性别过滤（根据关键词中的性别意图）
-                                target_gender = self._detect_gender_from_keyword(strategy_keyword)
-                                if target_gender:
-                                    before_count = len(items)
-                                    items = self._filter_by_gender(items, target_gender)
-                                    logger.info(f"性别过滤({target_gender})：{before_count} -> {len(items)}")
-                                
-                                # 格式化商品信息
-                                formatted_items = [self._format_product_info(item) for item in items]
-                                
-                                return {
-                                    'success': True,
-                                    'count': len(formatted_items),
-                                    'items': formatted_items,
-                                    'message': f'找到 {len(formatted_items)} 个相关商品',
-                                    'search_keyword': strategy_keyword
-                                }
-                        
-                        # 如果是301状态（无结果），继续尝试下一个策略
-                        elif result.get('status') == 301:
-                            logger.info(f"关键词 '{strategy_keyword}' 无搜索结果，尝试下一个策略")
-                            break  # 跳出重试循环，继续下一个搜索策略
-                            
-                    except requests.exceptions.Timeout:
-                        logger.warning(f"搜索关键词 '{strategy_keyword}' 超时, 尝试: {attempt + 1}/{max_retries + 1}")
-                        if attempt < max_retries:
-                            continue
-                        else:
-                            raise Exception("API请求超时")
-                    except requests.exceptions.ConnectionError:
-                        logger.warning(f"搜索关键词 '{strategy_keyword}' 连接错误, 尝试: {attempt + 1}/{max_retries + 1}")
-                        if attempt < max_retries:
-                            continue
-                        else:
-                            raise Exception("API连接错误")
-                    except requests.exceptions.RequestException as e:
-                        logger.warning(f"搜索关键词 '{strategy_keyword}' 请求异常: {str(e)}, 尝试: {attempt + 1}/{max_retries + 1}")
-                        if attempt < max_retries:
-                            continue
-                        else:
-                            raise
-                    
-            except Exception as e:
-                logger.error(f"搜索关键词 '{strategy_keyword}' 时出现异常: {str(e)}")
+        Returns:
+            按关键词首次出现顺序排列的 {关键词: 搜索结果}；超时未完成的关键词返回空结果并标记 timed_out
+        """
+        unique_keywords = list(dict.fromkeys(k.strip() for k in keywords if k and k.strip()))
+        if not unique_keywords:
+            return {}
+        
+        if deadline is None:
+            deadline = _latency_budget.get()
+        budget = deadline if deadline is not None else self.config["request_deadline"]
+        loop = asyncio.get_running_loop()
+        expires_at = loop.time() + budget
+        semaphore = asyncio.Semaphore(max_concurrency or self.config["batch_concurrency"])
+        
+        async def search_one(keyword: str) -> Dict[str, Any]:
+            async with semaphore:
+                remaining = expires_at - loop.time()
+                return await self.search_products(
+                    keyword=keyword, page=page, page_size=page_size, sort=sort,
+                    price_min=price_min, price_max=price_max, deadline=max(remaining, 0.01)
+                )
+        
+        tasks = {keyword: asyncio.create_task(search_one(keyword)) for keyword in unique_keywords}
+        done, pending = await asyncio.wait(tasks.values(), timeout=budget)
+        for task in pending:
+            task.cancel()
+        if pending:
+            # 等待被取消的搜索真正结束，避免任务在返回后仍悬挂或报 "exception never retrieved"
+            await asyncio.gather(*pending, return_exceptions=True)
+        
+        results: Dict[str, Dict[str, Any]] = {}
+        for keyword, task in tasks.items():
+            if task in done and not task.cancelled() and task.exception() is None:
+                results[keyword] = task.result()
                 continue
+            if task in done and not task.cancelled():
+                logger.warning(f"批量搜索关键词 '{keyword}' 失败: {task.exception()}")
+            result = self._empty_result(keyword)
+            result['timed_out'] = task in pending
+            results[keyword] = result
+        
+        if pending:
+            logger.info(f"批量搜索超过总时限 {budget}s，{len(pending)}/{len(tasks)} 个关键词未完成")
+        return results
+    
+    async def _fetch(self, keyword: str, page: int, page_size: int, sort: str,
+                     price_min: Optional[float], price_max: Optional[float],
+                     budget: float, mode: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """
+        请求上游执行搜索
+        
+        Returns:
+            (结果或None, 是否为确定性结果)；超时或出错时不视为确定性结果，不做负缓存
+        """
+        errors: List[str] = []
+        try:
+            if mode == "sequential":
+                search = self._search_with_strategies(keyword, page, page_size, sort, price_min, price_max, errors)
+            else:
+                stagger = self.config["hedge_delay"] if mode == "hedge" else 0.0
+                search = self._race_strategies(keyword, page, page_size, sort, price_min, price_max, stagger, errors)
+            result = await asyncio.wait_for(search, timeout=budget)
+            if result is None:
+                # 所有策略都失败，返回友好的无结果响应
+                logger.info(f"所有搜索策略都无结果，原始关键词: {keyword}")
+            return result, not errors
+        except asyncio.TimeoutError:
+            logger.warning(f"搜索关键词 '{keyword}' 超过总时限 {budget}s，放弃剩余策略")
+            return None, False
+    
+    async def _fetch_and_store(self, cache_key: str, keyword: str, page: int, page_size: int, sort: str,
+                               price_min: Optional[float], price_max: Optional[float],
+                               budget: float, mode: str) -> Dict[str, Any]:
+        """请求上游并写入缓存"""
+        result, conclusive = await self._fetch(keyword, page, page_size, sort, price_min, price_max, budget, mode)
+        if result is not None and result['count'] > 0:
+            await self._cache_store(cache_key, result, self.config["cache_ttl"])
+            return result
+        
+        result = result or self._empty_result(keyword)
+        if conclusive:
+            # 负缓存：上游明确无结果（301）时短期缓存，避免重复请求
+            await self._cache_store(cache_key, result, self.config["cache_negative_ttl"])
+        return result
+    
+    def _make_cache_key(self, keyword: str, page: int, page_size: int, sort: str,
+                        price_min: Optional[float], price_max: Optional[float]) -> str:
+        """基于归一化参数生成缓存键"""
+        normalized = " ".join((keyword or "").lower().split())
+        return CacheKeyGenerator.product_search(
+            normalized, page, page_size, sort,
+            float(price_min) if price_min is not None else None,
+            float(price_max) if price_max is not None else None,
+            self._detect_gender_from_keyword(normalized)
+        )
+    
+    async def _cache_lookup(self, cache_key: str) -> Optional[Tuple[Dict[str, Any], bool]]:
+        """查询缓存，返回 (结果, 是否新鲜)"""
+        try:
+            entry = await self._result_cache.get(cache_key)
+        except Exception as e:
+            logger.warning(f"读取商品搜索缓存失败: {e}")
+            return None
+        if not isinstance(entry, dict) or 'result' not in entry:
+            return None
         
-        # 所有策略都失败，返回友好的无结果响应
-        logger.info(f"所有搜索策略都无结果，原始关键词: {keyword}")
+        result = entry['result']
+        fresh = time.time() < entry.get('fresh_until', 0)
+        if not fresh:
+            self.cache_stats["stale_hits"] += 1
+        elif result.get('count', 0) == 0:
+            self.cache_stats["negative_hits"] += 1
+        else:
+            self.cache_stats["hits"] += 1
+        return result, fresh
+    
+    async def _cache_store(self, cache_key: str, result: Dict[str, Any], fresh_ttl: int) -> None:
+        """写入缓存；条目在新鲜期之后仍保留 cache_stale_ttl 秒用于后台刷新期间返回旧值"""
+        entry = {'result': result, 'fresh_until': time.time() + fresh_ttl}
+        try:
+            await self._result_cache.set(cache_key, entry, fresh_ttl + self.config["cache_stale_ttl"])
+        except Exception as e:
+            logger.warning(f"写入商品搜索缓存失败: {e}")
+    
+    def _schedule_refresh(self, cache_key: str, keyword: str, page: int, page_size: int, sort: str,
+                          price_min: Optional[float], price_max: Optional[float], mode: str) -> None:
+        """后台刷新过期缓存（同一键只刷新一次）"""
+        if cache_key in self._refresh_tasks:
+            return
+        self.cache_stats["refreshes"] += 1
+        task = asyncio.create_task(self._fetch_and_store(
+            cache_key, keyword, page, page_size, sort, price_min, price_max,
+            self.config["request_deadline"], mode
+        ))
+        self._refresh_tasks[cache_key] = task
+        task.add_done_callback(lambda _: self._refresh_tasks.pop(cache_key, None))
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """获取搜索结果缓存统计"""
+        lookups = sum(self.cache_stats.values()) - self.cache_stats["refreshes"]
+        served = lookups - self.cache_stats["misses"]
+        return {
+            "enabled": self._result_cache is not None,
+            "backend": type(self._result_cache).__name__ if self._result_cache is not None else None,
+            **self.cache_stats,
+            "hit_rate": served / lookups if lookups else 0.0,
+            "refreshing": len(self._refresh_tasks)
+        }
+    
+    def _empty_result(self, keyword: str) -> Dict[str, Any]:
+        """构建无结果响应"""
         return {
             'success': True,  # 仍然标记为成功，避免报错
             'count': 0,
@@ -156,83 +408,185 @@ class ProductSearchService:
             'search_keyword': keyword
         }
     
-    def _expand_keyword(self, keyword: str) -> str:
+    def _build_params(self, strategy_keyword: str, page: int, page_size: int, sort: str,
+                      price_min: Optional[float], price_max: Optional[float]) -> Dict[str, Any]:
+        """构建上游搜索请求参数"""
+        params = {
+            'appkey': self.appkey,
+            'sid': self.sid,
+            'pid': self.pid,
+            'q': strategy_keyword,
+            'page': page,
+            'page_size': page_size,
+            'sort': sort
+        }
+        
+        # 添加API原生价格过滤支持
+        if price_min is not None:
+            params['price_min'] = price_min
+        if price_max is not None:
+            params['price_max'] = price_max
+        return params
+    
+    def _get_search_strategies(self, keyword: str) -> List[str]:
+        """生成去重后的搜索策略关键词：原始、扩展、简化"""
+        strategies = []
+        for strategy_keyword in (
+            keyword,  # 原始关键词
+            self._expand_keyword(keyword),  # 扩展关键词
+            self._simplify_keyword(keyword),  # 简化关键词
+        ):
+            if strategy_keyword and strategy_keyword not in strategies:
+                strategies.append(strategy_keyword)
+        return strategies
+    
+    async def _try_strategy(self, strategy_keyword: str, page: int, page_size: int, sort: str,
+                            price_min: Optional[float], price_max: Optional[float],
+                            errors: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """执行单个关键词策略，上游无商品或出错时返回 None（出错信息记入 errors）"""
+        params = self._build_params(strategy_keyword, page, page_size, sort, price_min, price_max)
+        try:
+            logger.info(f"尝试搜索关键词: {strategy_keyword}")
+            logger.debug(f"请求参数: {params}")
+            result = await self._request_search(params, strategy_keyword)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"搜索关键词 '{strategy_keyword}' 时出现异常: {str(e)}")
+            if errors is not None:
+                errors.append(str(e))
+            return None
+        
+        if result.get('status') == 200:
+            items = result.get('content', [])
+            # 如果找到商品，处理并返回
+            if items:
+                return self._build_search_result(items, strategy_keyword, price_min, price_max)
+        
+        # 如果是301状态（无结果），继续尝试下一个策略
+        elif result.get('status') == 301:
+            logger.info(f"关键词 '{strategy_keyword}' 无搜索结果，尝试下一个策略")
+        return None
+    
+    async def _search_with_strategies(self, keyword: str, page: int, page_size: int, sort: str,
+                                      price_min: Optional[float], price_max: Optional[float],
+                                      errors: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """按原始、扩展、简化关键词依次尝试搜索，返回首个有商品的结果"""
+        for strategy_keyword in self._get_search_strategies(keyword):
+            result = await self._try_strategy(strategy_keyword, page, page_size, sort, price_min, price_max, errors)
+            if result is not None:
+                return result
+        return None
+    
+    async def _race_strategies(self, keyword: str, page: int, page_size: int, sort: str,
+                               price_min: Optional[float], price_max: Optional[float],
+                               stagger: float = 0.0,
+                               errors: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
         """
-        扩展关键词 - 添加相关词汇提高搜索成功率
+        并发执行各关键词策略，返回首个过滤后仍有商品的结果并取消其余请求
+        
+        stagger 为 0 时同时发起（竞速），大于 0 时按间隔错峰发起（对冲）。
+        若没有策略返回有效商品，则退回首个有响应的结果（可能为空列表）。
         """
-        if not keyword:
-            return ""
-            
-        # 常见的关键词扩展映射
-        expansion_map = {
-            '衬衫': '衬衫 衬衣 shirt',
-            '裤子': '裤子 长裤 pants',
-            '裙子': '裙子 连衣裙 dress skirt',
-            '外套': '外套 夹克 jacket coat',
-            '鞋子': '鞋子 鞋 shoes',
-            '包': '包 包包 bag',
-            '帽子': '帽子 hat cap',
-            '手表': '手表 腕表 watch',
-            '眼镜': '眼镜 glasses',
-            '项链': '项链 necklace',
-            '耳环': '耳环 earrings',
-            '戒指': '戒指 ring',
-            '手链': '手链 bracelet',
-            '围巾': '围巾 scarf',
-            '手套': '手套 gloves',
-            '袜子': '袜子 socks',
-            '内衣': '内衣 underwear',
-            '睡衣': '睡衣 pajamas',
-            '运动服': '运动服 sportswear',
-            '牛仔裤': '牛仔裤 jeans',
-            'T恤': 'T恤 t-shirt tshirt',
-            '毛衣': '毛衣 sweater',
-            '西装': '西装 suit',
-            '连衣裙': '连衣裙 dress',
-            '短裤': '短裤 shorts',
-            '背心': '背心 vest',
-            '风衣': '风衣 trench coat',
-            '羽绒服': '羽绒服 down jacket',
-            '卫衣': '卫衣 hoodie',
-            'polo衫': 'polo衫 polo shirt',
-            '马甲': '马甲 vest waistcoat',
-        }
+        async def delayed(index: int, strategy_keyword: str):
+            if index and stagger:
+                await asyncio.sleep(index * stagger)
+            return await self._try_strategy(strategy_keyword, page, page_size, sort, price_min, price_max, errors)
         
-        # 颜色扩展
-        color_expansion = {
-            '红': '红色 red',
-            '蓝': '蓝色 blue',
-            '绿': '绿色 green',
-            '黄': '黄色 yellow',
-            '黑': '黑色 black',
-            '白': '白色 white',
-            '灰': '灰色 gray grey',
-            '粉': '粉色 pink',
-            '紫': '紫色 purple',
-            '橙': '橙色 orange',
-            '棕': '棕色 brown',
-            '米': '米色 beige',
-            '卡其': '卡其色 khaki',
-            '藏青': '藏青色 navy',
+        pending = {
+            asyncio.create_task(delayed(i, strategy_keyword))
+            for i, strategy_keyword in enumerate(self._get_search_strategies(keyword))
         }
+        fallback = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.cancelled() or task.exception() is not None:
+                        continue
+                    result = task.result()
+                    if result is None:
+                        continue
+                    if result['count'] > 0:
+                        return result
+                    fallback = fallback or result
+            return fallback
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    async def _request_search(self, params: Dict[str, Any], strategy_keyword: str) -> Dict[str, Any]:
+        """请求上游搜索API（共享连接池 + 单主机并发限制 + 重试）"""
+        client = self._get_client()
+        semaphore = self._get_host_semaphore(self.base_url)
+        max_retries = self.config["max_retries"]
         
-        # 尺码扩展
-        size_expansion = {
-            'xs': 'XS 加小号',
-            's': 'S 小号',
-            'm': 'M 中号',
-            'l': 'L 大号',
-            'xl': 'XL 加大号',
-            'xxl': 'XXL 特大号',
-            'xxxl': 'XXXL 超大号',
-        }
+        for attempt in range(max_retries + 1):
+            try:
+                async with semaphore:
+                    response = await client.get(self.base_url, params=params)
+                logger.info(f"API响应状态码: {response.status_code}")
+                
+                # 检查HTTP状态码
+                if response.status_code != 200:
+                    logger.warning(f"API返回非200状态码: {response.status_code}, 尝试: {attempt + 1}/{max_retries + 1}")
+                    if attempt < max_retries:
+                        continue
+                    raise Exception(f"API返回状态码: {response.status_code}")
+                
+                result = response.json()
+                logger.debug(f"API响应内容: {result}")
+                return result
+                
+            except httpx.TimeoutException:
+                logger.warning(f"搜索关键词 '{strategy_keyword}' 超时, 尝试: {attempt + 1}/{max_retries + 1}")
+                if attempt >= max_retries:
+                    raise Exception("API请求超时")
+            except httpx.ConnectError:
+                logger.warning(f"搜索关键词 '{strategy_keyword}' 连接错误, 尝试: {attempt + 1}/{max_retries + 1}")
+                if attempt >= max_retries:
+                    raise Exception("API连接错误")
+            except httpx.HTTPError as e:
+                logger.warning(f"搜索关键词 '{strategy_keyword}' 请求异常: {str(e)}, 尝试: {attempt + 1}/{max_retries + 1}")
+                if attempt >= max_retries:
+                    raise
+        
+        raise Exception("API请求失败")
+    
+    def _build_search_result(self, items: List[Dict], strategy_keyword: str,
+                             price_min: Optional[float], price_max: Optional[float]) -> Dict[str, Any]:
+        """对上游商品做价格、性别过滤并格式化"""
+        # 价格过滤
+        if price_min is not None or price_max is not None:
+            items = self._filter_by_price(items, price_min, price_max)
         
-        expanded = keyword.lower()
+        # 性别过滤（根据关键词中的性别意图）
+        target_gender = self._detect_gender_from_keyword(strategy_keyword)
+        if target_gender:
+            before_count = len(items)
+            items = self._filter_by_gender(items, target_gender)
+            logger.info(f"性别过滤({target_gender})：{before_count} -> {len(items)}")
         
-        # 应用扩展映射
-        for original, expanded_terms in {**expansion_map, **color_expansion, **size_expansion}.items():
-            if original in expanded:
-                expanded = expanded.replace(original, expanded_terms)
+        # 格式化商品信息
+        formatted_items = [self._format_product_info(item) for item in items]
+        
+        return {
+            'success': True,
+            'count': len(formatted_items),
+            'items': formatted_items,
+            'message': f'找到 {len(formatted_items)} 个相关商品',
+            'search_keyword': strategy_keyword
+        }
+    
+    def _expand_keyword(self, keyword: str) -> str:
+        """
+        扩展关键词 - 添加相关词汇提高搜索成功率
+        """
+        if not keyword:
+            return ""
+            
+        # 单次扫描替换（最左最长匹配），避免逐个 replace 时扩展词被再次替换
+        expanded = KEYWORD_EXPANSION_MATCHER.replace(keyword.lower(), KEYWORD_EXPANSIONS)
         
         return expanded.strip()
     
@@ -287,11 +641,9 @@ class ProductSearchService:
         """从关键词中检测性别意图：返回 'male'、'female' 或 None。"""
         if not keyword:
             return None
-        k = (keyword or '').lower()
-        male_markers = ['男士', '男生', '男性', '男装', '男款', '男']
-        female_markers = ['女士', '女生', '女性', '女装', '女款', '女']
-        has_m = any(m in k for m in male_markers)
-        has_f = any(f in k for f in female_markers)
+        hits = GENDER_MATCHER.match(keyword)
+        has_m = 'male' in hits
+        has_f = 'female' in hits
         if has_m and not has_f:
             return 'male'
         if has_f and not has_m:
@@ -302,10 +654,6 @@ class ProductSearchService:
         """根据目标性别过滤商品。保留中性/男女同款。"""
         if not target_gender:
             return items
-        unisex_markers = ['中性', '男女同款', '情侣', '通用', 'unisex', '男女']
-        female_markers = ['女士', '女生', '女性', '女装', '女款', '女']
-        male_markers = ['男士', '男生', '男性', '男装', '男款', '男']
-
         filtered = []
         for item in items:
             text_parts = [
@@ -316,17 +664,16 @@ class ProductSearchService:
                 str(item.get('nick', '')),
                 str(item.get('jianjie', '')),
             ]
-            t = ' '.join(text_parts).lower()
-            is_unisex = any(u.lower() in t for u in unisex_markers)
-            if is_unisex:
+            hits = GENDER_MATCHER.match(' '.join(text_parts))
+            if 'unisex' in hits:
                 filtered.append(item)
                 continue
             if target_gender == 'male':
-                if any(f.lower() in t for f in female_markers):
+                if 'female' in hits:
                     continue
                 filtered.append(item)
             elif target_gender == 'female':
-                if any(m.lower() in t for m in male_markers):
+                if 'male' in hits:
                     continue
                 filtered.append(item)
         return filtered
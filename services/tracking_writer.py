@@ -0,0 +1,173 @@
+"""
+物流轨迹缓冲写入
+轨迹事件先进入内存缓冲，达到条数上限或缓冲时间到期时在一个事务中批量写入 logistics_tracking 表
+"""
+
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from utils.sqlite_pool import SQLitePool
+
+logger = logging.getLogger(__name__)
+
+INSERT_TRACKING_SQL = """
+    INSERT INTO logistics_tracking
+    (order_id, tracking_number, company, status, location, description, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def tracking_row(order_id: str, tracking_number: str, company: str, record: Dict[str, Any]) -> tuple:
+    """把一条轨迹记录转换为 logistics_tracking 表的行"""
+    return (
+        order_id,
+        tracking_number,
+        company,
+        record["status"],
+        record["location"],
+        record["description"],
+        record["timestamp"]
+    )
+
+
+class TrackingEventWriter:
+    """
+    物流轨迹缓冲写入器
+
+    add() 线程安全且不访问数据库，可在事件循环或连接池线程中调用；
+    后台任务在缓冲达到 flush_size 或距上次写入超过 flush_interval 秒时批量写库。
+    尚未落库的轨迹可通过 pending() 读取，查询订单时合并进轨迹，保证写后可读。
+    """
+
+    def __init__(self, pool: SQLitePool, flush_size: int = 500, flush_interval: float = 1.0):
+        self.pool = pool
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._buffer: List[tuple] = []
+        self._inflight: List[tuple] = []
+        self._lock = threading.Lock()
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        self.stats = {"events": 0, "flushes": 0, "errors": 0}
+
+    def start(self) -> None:
+        """在当前事件循环中启动后台刷写任务（重复调用无副作用）"""
+        if self._task is not None and not self._task.done():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task = self._loop.create_task(self._run())
+
+    def add(self, order_id: str, tracking_number: str, company: str, record: Dict[str, Any]) -> None:
+        """追加一条轨迹；缓冲达到 flush_size 时唤醒后台任务"""
+        if self._closed:
+            raise RuntimeError("轨迹写入器已关闭")
+        with self._lock:
+            self._buffer.append(tracking_row(order_id, tracking_number, company, record))
+            self.stats["events"] += 1
+            full = len(self._buffer) >= self.flush_size
+        if full and self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def pending(self, order_ids: Iterable[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """尚未落库（含正在写入）的轨迹，按订单号分组"""
+        wanted = set(order_ids)
+        result: Dict[str, List[Dict[str, Any]]] = {}
+        with self._lock:
+            rows = self._inflight + self._buffer
+        for row in rows:
+            if row[0] in wanted:
+                result.setdefault(row[0], []).append({
+                    "status": row[3],
+                    "location": row[4],
+                    "description": row[5],
+                    "timestamp": row[6]
+                })
+        return result
+
+    def _write(self, rows: List[tuple]) -> None:
+        with self.pool.connection() as conn:
+            conn.executemany(INSERT_TRACKING_SQL, rows)
+
+    async def _run(self) -> None:
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"物流轨迹批量写入失败: {e}")
+
+    async def flush(self) -> int:
+        """立即写入缓冲中的全部轨迹，返回写入条数；写入失败时轨迹放回缓冲"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+                self._inflight = batch
+            if not batch:
+                return 0
+            try:
+                await self.pool.run(self._write, batch)
+            except Exception:
+                with self._lock:
+                    self._buffer = batch + self._buffer
+                    self._inflight = []
+                self.stats["errors"] += 1
+                raise
+            with self._lock:
+                self._inflight = []
+            self.stats["flushes"] += 1
+            return len(batch)
+
+    def flush_sync(self) -> int:
+        """在当前线程同步写入缓冲（用于关闭时或没有事件循环的调用方）；写入失败时轨迹放回缓冲"""
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+            self._inflight = batch
+        if not batch:
+            return 0
+        try:
+            self._write(batch)
+        except Exception:
+            with self._lock:
+                self._buffer = batch + self._buffer
+                self._inflight = []
+            self.stats["errors"] += 1
+            raise
+        with self._lock:
+            self._inflight = []
+        self.stats["flushes"] += 1
+        return len(batch)
+
+    def close_sync(self) -> int:
+        """同步关闭：通知后台任务退出并写入剩余轨迹"""
+        self._closed = True
+        if self._wakeup is not None and self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return self.flush_sync()
+
+    async def close(self) -> None:
+        """停止后台任务并写入剩余轨迹（add() 此后抛出 RuntimeError）"""
+        self._closed = True
+        if self._task is not None:
+            # 唤醒后台任务完成当前一轮写入后退出，不在写入中途取消
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            buffered = len(self._buffer) + len(self._inflight)
+        return {**self.stats, "buffered": buffered}
@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+import sys
+from pathlib import Path
+
+# 直接运行 pytest 时也能导入项目包
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
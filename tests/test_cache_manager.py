@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+CacheManager 单飞合并的回归测试
+
+    python -m pytest -q tests/test_cache_manager.py
+"""
+
+import asyncio
+
+from utils.cache import CacheManager, MemoryCache
+
+
+def test_cache_manager_coalesces_concurrent_misses():
+    async def scenario():
+        manager = CacheManager(MemoryCache())
+        calls = 0
+        release = asyncio.Event()
+
+        async def factory():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return {"value": 42}
+
+        waiters = [asyncio.create_task(manager.get_or_set("hot", factory, ttl=60)) for _ in range(20)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*waiters)
+        return manager, calls, results
+
+    manager, calls, results = asyncio.run(scenario())
+    assert calls == 1
+    assert all(result == {"value": 42} for result in results)
+    assert manager.stats["coalesced"] == 19
+
+
+def test_cache_manager_single_flight_propagates_errors_and_retries():
+    async def scenario():
+        manager = CacheManager(MemoryCache())
+        calls = 0
+
+        async def failing():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            raise RuntimeError("上游失败")
+
+        results = await asyncio.gather(
+            *[manager.get_or_set("key", failing, ttl=60) for _ in range(5)], return_exceptions=True
+        )
+        # 失败不写入缓存，也不残留进行中的计算，下一次调用重新计算
+        assert await manager.get_or_set("key", lambda: "ok", ttl=60) == "ok"
+        return calls, results
+
+    calls, results = asyncio.run(scenario())
+    assert calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
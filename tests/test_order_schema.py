@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+订单库 schema 迁移的回归测试
+
+    python -m pytest -q tests/test_order_schema.py
+"""
+
+import asyncio
+import json
+import shutil
+import sqlite3
+from collections import Counter
+from pathlib import Path
+
+import pytest
+
+from services.order_schema import SCHEMA_VERSION, migrate, normalize_phone
+from services.order_service import OrderService
+
+FIXTURE = Path(__file__).resolve().parent.parent / "data" / "mock_orders.db"
+
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    """未迁移（v0，JSON 列布局）订单库的副本"""
+    path = tmp_path / "orders_v0.db"
+    shutil.copy(FIXTURE, path)
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+    conn.close()
+    return path
+
+
+def test_migrate_v0_fixture(legacy_db):
+    conn = sqlite3.connect(legacy_db)
+    legacy = conn.execute(
+        "SELECT order_id, items, shipping_address, created_at, status, final_amount FROM orders"
+    ).fetchall()
+    assert legacy
+
+    assert migrate(conn) == SCHEMA_VERSION
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+
+    # 订单与商品行数
+    assert conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0] == len(legacy)
+    assert conn.execute("SELECT COUNT(*) FROM order_items").fetchone()[0] == sum(
+        len(json.loads(row[1])) for row in legacy
+    )
+    assert conn.execute("SELECT COUNT(*) FROM shipping_addresses").fetchone()[0] == len(legacy)
+
+    # 规范化手机号
+    phones = dict(conn.execute("SELECT order_id, shipping_phone FROM orders"))
+    for order_id, _, address, *_ in legacy:
+        assert phones[order_id] == normalize_phone(json.loads(address)["phone"])
+
+    # 计数表与订单按 (日期, 状态) 聚合一致
+    expected = Counter()
+    amounts = Counter()
+    for _, _, _, created_at, status, final_amount in legacy:
+        expected[(created_at[:10], status)] += 1
+        amounts[(created_at[:10], status)] += final_amount
+    stats = {
+        (day, status): (count, amount)
+        for day, status, count, amount in conn.execute(
+            "SELECT day, status, order_count, total_amount FROM order_daily_stats"
+        )
+    }
+    assert {key: count for key, (count, _) in stats.items()} == dict(expected)
+    for key, (_, amount) in stats.items():
+        assert amount == pytest.approx(amounts[key])
+
+    # 重复迁移不做任何改动
+    assert migrate(conn) == SCHEMA_VERSION
+    conn.close()
+
+
+def test_migrated_fixture_served_by_order_service(legacy_db):
+    conn = sqlite3.connect(legacy_db)
+    order_id, items, address = conn.execute(
+        "SELECT order_id, items, shipping_address FROM orders LIMIT 1"
+    ).fetchone()
+    total = conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+    conn.close()
+
+    service = OrderService(db_path=str(legacy_db))
+    try:
+        order = service.get_order(order_id)
+        assert order is not None
+        assert len(order.items) == len(json.loads(items))
+        assert order.shipping_address.phone == json.loads(address)["phone"]
+        assert service.get_order_statistics()["total_orders"] == total
+
+        # 用原始格式的手机号查询，由服务负责规范化
+        result = asyncio.run(service.get_orders_by_phone(json.loads(address)["phone"], limit=50))
+        assert result["success"]
+        assert order_id in [o["order_number"] for o in result["orders"]]
+    finally:
+        service.close()
+
+
+def test_order_service_defers_migration_until_init_database(tmp_path):
+    service = OrderService(db_path=str(tmp_path / "orders.db"), auto_migrate=False)
+    assert not (tmp_path / "orders.db").exists()
+    assert service.init_database() == SCHEMA_VERSION
+    service.close()
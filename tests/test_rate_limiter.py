@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+LLM 自适应并发限制器准入队列的回归测试
+
+    python -m pytest -q tests/test_rate_limiter.py
+"""
+
+import asyncio
+
+import pytest
+
+from utils.exceptions import OverloadException
+from utils.rate_limiter import AdaptiveConcurrencyLimiter
+
+
+def test_limiter_admits_queued_requests_by_priority():
+    async def scenario():
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, min_limit=1, max_limit=1, queue_timeout=5.0)
+        order = []
+
+        async def request(name, priority):
+            async with limiter.slot(priority=priority):
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        await limiter.acquire()
+        tasks = [
+            asyncio.create_task(request("low", 3)),
+            asyncio.create_task(request("normal", 2)),
+            asyncio.create_task(request("urgent", 0)),
+        ]
+        await asyncio.sleep(0.01)
+        assert limiter.get_stats()["queue_depth"] == 3
+        limiter.release(0.01)
+        await asyncio.gather(*tasks)
+        return order, limiter
+
+    order, limiter = asyncio.run(scenario())
+    assert order == ["urgent", "normal", "low"]
+    assert limiter.stats["queued"] == 3
+    assert limiter.in_flight == 0
+
+
+def test_limiter_sheds_requests_past_queue_deadline():
+    async def scenario():
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, min_limit=1, max_limit=1, queue_timeout=5.0)
+        await limiter.acquire()
+        with pytest.raises(OverloadException):
+            await limiter.acquire(priority=3, timeout=0.05)
+        # 被丢弃的请求不占用并发，也不会在许可归还后被放行
+        limiter.release(0.01)
+        await asyncio.sleep(0.01)
+        return limiter
+
+    limiter = asyncio.run(scenario())
+    assert limiter.stats["shed"] == 1
+    assert limiter.in_flight == 0
+    assert limiter.get_stats()["queue_depth"] == 0
+
+
+def test_limiter_backs_off_on_throttling():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=8, min_limit=1, max_limit=16, backoff=0.5,
+                                         decrease_cooldown=0.0)
+    limiter.in_flight = 1
+    limiter.release(0.1, throttled=True)
+    assert limiter.limit == 4
+    assert limiter.stats["throttled"] == 1
@@ -48,12 +48,24 @@ from .cache import (
     CacheManager,
     MemoryCache,
     RedisCache,
+    TieredCache,
+    create_cache_backend,
+    stable_hash,
     cached,
     init_cache,
     get_default_cache_manager,
     CacheKeyGenerator
 )
 
+# 关键词匹配
+from .keyword_matcher import KeywordMatcher
+
+# Token 计数
+from .tokenizer import count_tokens, truncate_to_tokens
+
+# 流式输出
+from .streaming import JsonFieldStreamExtractor, StreamSink, get_stream_sink, set_stream_sink, reset_stream_sink
+
 # 配置管理工具已移除
 
 # 异常处理
@@ -67,6 +79,7 @@ from .exceptions import (
     ExternalServiceException,
     RateLimitException,
     TimeoutException,
+    OverloadException,
     ErrorHandler,
     handle_exceptions,
     safe_execute,
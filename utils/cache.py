@@ -3,13 +3,24 @@
 提供内存缓存和Redis缓存功能
 """
 import asyncio
+import hashlib
+import heapq
+import inspect
 import json
+import math
+import random
 import time
+import uuid
 from abc import ABC, abstractmethod
-from typing import Any, Optional, Dict, List, Union, Callable
+from collections import OrderedDict
+from dataclasses import asdict, is_dataclass
+from enum import Enum
+from fnmatch import fnmatchcase
+from typing import Any, Awaitable, Optional, Dict, List, Tuple, Union, Callable
 from datetime import datetime, timedelta
 import logging
 from functools import wraps
+from urllib.parse import urlsplit
 
 try:
     import redis.asyncio as redis
@@ -22,6 +33,76 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# ------------------------ 缓存键派生 ------------------------
+# 键必须在不同进程、不同重启之间保持一致（Python 内置 hash() 对字符串按进程随机化），
+# 因此参数先规范化序列化，再用 blake2b 计算摘要。
+
+def _canonicalize(obj: Any) -> Any:
+    """将参数转换为确定性的可 JSON 序列化结构"""
+    if obj is None or isinstance(obj, (str, int, float, bool)):
+        return obj
+    if isinstance(obj, dict):
+        return {"__dict__": sorted(([_canonical_json(k), _canonicalize(v)] for k, v in obj.items()), key=lambda kv: kv[0])}
+    if isinstance(obj, (list, tuple)):
+        return [_canonicalize(v) for v in obj]
+    if isinstance(obj, (set, frozenset)):
+        return {"__set__": sorted(_canonical_json(v) for v in obj)}
+    if isinstance(obj, bytes):
+        return {"__bytes__": obj.hex()}
+    if isinstance(obj, datetime):
+        return {"__datetime__": obj.isoformat()}
+    if isinstance(obj, Enum):
+        return {"__enum__": f"{type(obj).__qualname__}.{obj.name}"}
+    cache_key = getattr(obj, "__cache_key__", None)
+    if callable(cache_key):
+        return {"__obj__": type(obj).__qualname__, "key": _canonicalize(cache_key())}
+    if is_dataclass(obj) and not isinstance(obj, type):
+        return {"__obj__": type(obj).__qualname__, "fields": _canonicalize(asdict(obj))}
+    model_dump = getattr(obj, "model_dump", None) or getattr(obj, "dict", None)
+    if callable(model_dump):
+        try:
+            return {"__obj__": type(obj).__qualname__, "fields": _canonicalize(model_dump())}
+        except Exception:
+            pass
+    # 默认 repr 只含内存地址：只取类型名会让同类的不同实例得到相同的键，因此要求调用方显式给出键
+    if type(obj).__repr__ is object.__repr__:
+        raise TypeError(
+            f"无法为 {type(obj).__module__}.{type(obj).__qualname__} 类型的参数生成缓存键："
+            f"请为该类定义 __cache_key__()，或为 @cached 提供 key_func"
+        )
+    return {"__obj__": f"{type(obj).__module__}.{type(obj).__qualname__}", "repr": repr(obj)}
+
+
+def _canonical_json(obj: Any) -> str:
+    return json.dumps(_canonicalize(obj), ensure_ascii=False, separators=(",", ":"), allow_nan=True)
+
+
+def stable_hash(*parts: Any, digest_size: int = 16) -> str:
+    """
+    计算参数的稳定摘要（跨进程一致）
+    
+    Args:
+        parts: 任意可规范化的参数
+        digest_size: 摘要字节数，默认16字节（128位，32个十六进制字符）
+    """
+    return hashlib.blake2b(_canonical_json(parts).encode("utf-8"), digest_size=digest_size).hexdigest()
+
+
+def _is_bound_style(func: Callable) -> bool:
+    """函数的第一个参数是否为 self / cls（装饰方法时参数中含实例或类）"""
+    try:
+        first = next(iter(inspect.signature(func).parameters), None)
+    except (TypeError, ValueError):
+        return False
+    return first in ("self", "cls")
+
+
+def default_key_func(func: Callable, args: tuple, kwargs: Dict[str, Any]) -> str:
+    """@cached 的默认键函数：函数全名 + 参数摘要（方法的 self / cls 不参与摘要，类名已包含在函数全名中）"""
+    if args and _is_bound_style(func):
+        args = args[1:]
+    return f"{func.__module__}.{func.__qualname__}:{stable_hash(args, kwargs)}"
+
 class CacheBackend(ABC):
     """缓存后端抽象基类"""
     
@@ -54,112 +135,205 @@ class CacheBackend(ABC):
     async def get_ttl(self, key: str) -> Optional[int]:
         """获取缓存TTL"""
         pass
+    
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """批量获取缓存，仅返回命中的键"""
+        result = {}
+        for key in keys:
+            value = await self.get(key)
+            if value is not None:
+                result[key] = value
+        return result
+    
+    async def get_many_with_ttl(self, keys: List[str]) -> Dict[str, Tuple[Any, Optional[int]]]:
+        """批量获取缓存及其剩余TTL（秒，未知或永不过期为 None），仅返回命中的键"""
+        result = {}
+        for key, value in (await self.get_many(keys)).items():
+            ttl = await self.get_ttl(key)
+            result[key] = (value, ttl if ttl is not None and ttl >= 0 else None)
+        return result
+    
+    async def set_many(self, mapping: Dict[str, Any], ttl: Optional[int] = None) -> bool:
+        """批量设置缓存"""
+        success = True
+        for key, value in mapping.items():
+            if not await self.set(key, value, ttl):
+                success = False
+        return success
+    
+    async def delete_many(self, keys: List[str]) -> int:
+        """批量删除缓存，返回删除的数量"""
+        count = 0
+        for key in keys:
+            if await self.delete(key):
+                count += 1
+        return count
+    
+    @abstractmethod
+    async def delete_pattern(self, pattern: str) -> int:
+        """按通配符模式（如 history:123:*）删除缓存，返回删除的数量"""
+        pass
 
 class MemoryCache(CacheBackend):
-    """内存缓存实现"""
+    """
+    内存缓存实现（LRU）
+    
+    条目按访问顺序保存在 OrderedDict 中，读取、写入与淘汰均为 O(1)；
+    过期时间记录在最小堆中，写入时顺带清理已到期条目（惰性过期）。
+    所有操作在事件循环内同步完成、中间没有 await，读写无需加锁。
+    """
     
     def __init__(self, max_size: int = 1000, default_ttl: int = 3600):
         self.max_size = max_size
         self.default_ttl = default_ttl
-        self._cache: Dict[str, Dict[str, Any]] = {}
-        self._access_times: Dict[str, float] = {}
-        self._lock = asyncio.Lock()
+        # key -> (value, expires_at)；expires_at 为 None 表示永不过期
+        self._cache: "OrderedDict[str, Tuple[Any, Optional[float]]]" = OrderedDict()
+        # (expires_at, key) 最小堆；条目被覆盖或删除后堆中旧记录在清理时跳过
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+    
+    def _lookup(self, key: str, now: float) -> Optional[Tuple[Any, Optional[float]]]:
+        """查找未过期条目，已过期则顺带删除"""
+        item = self._cache.get(key)
+        if item is None:
+            return None
+        if item[1] is not None and now > item[1]:
+            del self._cache[key]
+            self._expirations += 1
+            return None
+        return item
     
     async def get(self, key: str) -> Optional[Any]:
         """获取缓存值"""
-        async with self._lock:
-            if key not in self._cache:
-                return None
-            
-            cache_item = self._cache[key]
-            
-            # 检查是否过期
-            if cache_item['expires_at'] and time.time() > cache_item['expires_at']:
-                await self._remove_key(key)
-                return None
-            
-            # 更新访问时间
-            self._access_times[key] = time.time()
-            return cache_item['value']
+        item = self._lookup(key, time.time())
+        if item is None:
+            self._misses += 1
+            return None
+        
+        # 标记为最近使用
+        self._cache.move_to_end(key)
+        self._hits += 1
+        return item[0]
     
     async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
         """设置缓存值"""
-        async with self._lock:
+        now = time.time()
+        ttl = ttl or self.default_ttl
+        expires_at = now + ttl if ttl > 0 else None
+        
+        if key in self._cache:
+            self._cache.move_to_end(key)
+        else:
+            self._purge_expired(now)
             # 检查缓存大小限制
-            if len(self._cache) >= self.max_size and key not in self._cache:
-                await self._evict_lru()
-            
-            ttl = ttl or self.default_ttl
-            expires_at = time.time() + ttl if ttl > 0 else None
-            
-            self._cache[key] = {
-                'value': value,
-                'created_at': time.time(),
-                'expires_at': expires_at
-            }
-            self._access_times[key] = time.time()
-            
-            return True
+            while len(self._cache) >= self.max_size:
+                self._cache.popitem(last=False)
+                self._evictions += 1
+        
+        self._cache[key] = (value, expires_at)
+        if expires_at is not None:
+            heapq.heappush(self._expiry_heap, (expires_at, key))
+            if len(self._expiry_heap) > 2 * self.max_size + 64:
+                self._rebuild_expiry_heap()
+        return True
     
     async def delete(self, key: str) -> bool:
         """删除缓存"""
-        async with self._lock:
-            return await self._remove_key(key)
+        self._cache.pop(key, None)
+        return True
     
     async def exists(self, key: str) -> bool:
         """检查缓存是否存在"""
-        return await self.get(key) is not None
+        return self._lookup(key, time.time()) is not None
     
     async def clear(self) -> bool:
         """清空所有缓存"""
-        async with self._lock:
-            self._cache.clear()
-            self._access_times.clear()
-            return True
+        self._cache.clear()
+        self._expiry_heap.clear()
+        return True
     
     async def get_ttl(self, key: str) -> Optional[int]:
         """获取缓存TTL"""
-        async with self._lock:
-            if key not in self._cache:
-                return None
-            
-            cache_item = self._cache[key]
-            if not cache_item['expires_at']:
-                return -1  # 永不过期
-            
-            remaining = cache_item['expires_at'] - time.time()
-            return max(0, int(remaining))
+        now = time.time()
+        item = self._lookup(key, now)
+        if item is None:
+            return None
+        if item[1] is None:
+            return -1  # 永不过期
+        return max(0, int(item[1] - now))
     
-    async def _remove_key(self, key: str) -> bool:
-        """移除缓存键"""
-        if key in self._cache:
-            del self._cache[key]
-        if key in self._access_times:
-            del self._access_times[key]
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """批量获取缓存"""
+        result = {}
+        now = time.time()
+        for key in keys:
+            item = self._lookup(key, now)
+            if item is None:
+                self._misses += 1
+                continue
+            self._cache.move_to_end(key)
+            self._hits += 1
+            result[key] = item[0]
+        return result
+    
+    async def set_many(self, mapping: Dict[str, Any], ttl: Optional[int] = None) -> bool:
+        """批量设置缓存"""
+        for key, value in mapping.items():
+            await self.set(key, value, ttl)
         return True
     
-    async def _evict_lru(self):
-        """移除最近最少使用的缓存项"""
-        if not self._access_times:
-            return
-        
-        # 找到最久未访问的键
-        lru_key = min(self._access_times.keys(), key=lambda k: self._access_times[k])
-        await self._remove_key(lru_key)
+    async def delete_many(self, keys: List[str]) -> int:
+        """批量删除缓存"""
+        count = 0
+        for key in keys:
+            if self._cache.pop(key, None) is not None:
+                count += 1
+        return count
+    
+    async def delete_pattern(self, pattern: str) -> int:
+        """按通配符模式删除缓存"""
+        keys = [key for key in self._cache if fnmatchcase(key, pattern)]
+        return await self.delete_many(keys)
+    
+    def _purge_expired(self, now: float):
+        """从堆顶开始清理已到期的条目"""
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            expires_at, key = heapq.heappop(heap)
+            item = self._cache.get(key)
+            # 仅当条目仍是入堆时的那一次写入才删除
+            if item is not None and item[1] == expires_at:
+                del self._cache[key]
+                self._expirations += 1
+    
+    def _rebuild_expiry_heap(self):
+        """丢弃堆中已失效的旧记录（条目被覆盖或删除）"""
+        self._expiry_heap = [(item[1], key) for key, item in self._cache.items() if item[1] is not None]
+        heapq.heapify(self._expiry_heap)
     
     async def get_stats(self) -> Dict[str, Any]:
         """获取缓存统计信息"""
-        async with self._lock:
-            return {
-                'size': len(self._cache),
-                'max_size': self.max_size,
-                'hit_rate': 0,  # 简化实现，不统计命中率
-                'memory_usage': sum(len(str(item)) for item in self._cache.values())
-            }
+        lookups = self._hits + self._misses
+        return {
+            'size': len(self._cache),
+            'max_size': self.max_size,
+            'hits': self._hits,
+            'misses': self._misses,
+            'evictions': self._evictions,
+            'expirations': self._expirations,
+            'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+            'memory_usage': sum(len(str(item[0])) for item in self._cache.values())
+        }
 
 class RedisCache(CacheBackend):
     """Redis缓存实现"""
     
+    # SCAN 每批返回及删除的键数
+    SCAN_BATCH_SIZE = 500
+    
     def __init__(
         self, 
         host: str = "localhost", 
@@ -167,9 +341,14 @@ class RedisCache(CacheBackend):
         db: int = 0,
         password: Optional[str] = None,
         default_ttl: int = 3600,
-        key_prefix: str = "cs:"
+        key_prefix: str = "cs:",
+        client: Optional[Any] = None
     ):
-        if not REDIS_AVAILABLE:
+        """
+        Args:
+            client: 预先创建的 Redis 客户端（需 decode_responses=True），如测试用的 fakeredis
+        """
+        if not REDIS_AVAILABLE and client is None:
             raise ImportError("redis package is required for RedisCache")
         
         self.host = host
@@ -178,7 +357,20 @@ class RedisCache(CacheBackend):
         self.password = password
         self.default_ttl = default_ttl
         self.key_prefix = key_prefix
-        self._redis: Optional[Redis] = None
+        self._redis: Optional[Redis] = client
+    
+    @classmethod
+    def from_url(cls, url: str, password: Optional[str] = None, **kwargs) -> "RedisCache":
+        """根据 redis://host:port/db 形式的URL创建缓存"""
+        parsed = urlsplit(url)
+        db = parsed.path.lstrip("/")
+        return cls(
+            host=parsed.hostname or "localhost",
+            port=parsed.port or 6379,
+            db=int(db) if db.isdigit() else 0,
+            password=password or parsed.password,
+            **kwargs
+        )
     
     async def _get_redis(self) -> Redis:
         """获取Redis连接"""
@@ -196,6 +388,21 @@ class RedisCache(CacheBackend):
         """生成带前缀的键"""
         return f"{self.key_prefix}{key}"
     
+    @staticmethod
+    def _serialize(value: Any) -> Any:
+        """JSON序列化容器类型"""
+        if isinstance(value, (dict, list, tuple)):
+            return json.dumps(value, ensure_ascii=False, default=str)
+        return value
+    
+    @staticmethod
+    def _deserialize(value: str) -> Any:
+        """尝试JSON反序列化"""
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            return value
+    
     async def get(self, key: str) -> Optional[Any]:
         """获取缓存值"""
         try:
@@ -204,12 +411,7 @@ class RedisCache(CacheBackend):
             
             if value is None:
                 return None
-            
-            # 尝试JSON反序列化
-            try:
-                return json.loads(value)
-            except json.JSONDecodeError:
-                return value
+            return self._deserialize(value)
         except Exception as e:
             logger.error(f"Redis get error: {e}")
             return None
@@ -220,10 +422,7 @@ class RedisCache(CacheBackend):
             redis_client = await self._get_redis()
             ttl = ttl or self.default_ttl
             
-            # JSON序列化
-            if isinstance(value, (dict, list, tuple)):
-                value = json.dumps(value, ensure_ascii=False, default=str)
-            
+            value = self._serialize(value)
             if ttl > 0:
                 return await redis_client.setex(self._make_key(key), ttl, value)
             else:
@@ -252,17 +451,101 @@ class RedisCache(CacheBackend):
             return False
     
     async def clear(self) -> bool:
-        """清空所有缓存"""
+        """清空所有缓存（SCAN 逐批删除，避免 KEYS 阻塞 Redis）"""
         try:
-            redis_client = await self._get_redis()
-            keys = await redis_client.keys(f"{self.key_prefix}*")
-            if keys:
-                await redis_client.delete(*keys)
+            await self._scan_delete(f"{self.key_prefix}*")
             return True
         except Exception as e:
             logger.error(f"Redis clear error: {e}")
             return False
     
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """批量获取缓存（单次 MGET）"""
+        if not keys:
+            return {}
+        try:
+            redis_client = await self._get_redis()
+            values = await redis_client.mget([self._make_key(key) for key in keys])
+            return {key: self._deserialize(value) for key, value in zip(keys, values) if value is not None}
+        except Exception as e:
+            logger.error(f"Redis mget error: {e}")
+            return {}
+    
+    async def get_many_with_ttl(self, keys: List[str]) -> Dict[str, Tuple[Any, Optional[int]]]:
+        """批量获取缓存及剩余TTL（管道内 MGET + 逐键 PTTL，一次往返）"""
+        if not keys:
+            return {}
+        try:
+            redis_client = await self._get_redis()
+            redis_keys = [self._make_key(key) for key in keys]
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.mget(redis_keys)
+                for redis_key in redis_keys:
+                    pipe.pttl(redis_key)
+                values, *pttls = await pipe.execute()
+            result = {}
+            for key, value, pttl in zip(keys, values, pttls):
+                if value is None:
+                    continue
+                # 不足一秒的剩余时间向上取整，避免被当作“无TTL”
+                result[key] = (self._deserialize(value), -(-pttl // 1000) if pttl > 0 else None)
+            return result
+        except Exception as e:
+            logger.error(f"Redis mget with ttl error: {e}")
+            return {}
+    
+    async def set_many(self, mapping: Dict[str, Any], ttl: Optional[int] = None) -> bool:
+        """批量设置缓存（管道内 SETEX，一次往返）"""
+        if not mapping:
+            return True
+        try:
+            redis_client = await self._get_redis()
+            ttl = ttl or self.default_ttl
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for key, value in mapping.items():
+                    if ttl > 0:
+                        pipe.setex(self._make_key(key), ttl, self._serialize(value))
+                    else:
+                        pipe.set(self._make_key(key), self._serialize(value))
+                results = await pipe.execute()
+            return all(results)
+        except Exception as e:
+            logger.error(f"Redis set_many error: {e}")
+            return False
+    
+    async def delete_many(self, keys: List[str]) -> int:
+        """批量删除缓存（单条 DEL）"""
+        if not keys:
+            return 0
+        try:
+            redis_client = await self._get_redis()
+            return await redis_client.delete(*[self._make_key(key) for key in keys])
+        except Exception as e:
+            logger.error(f"Redis delete_many error: {e}")
+            return 0
+    
+    async def delete_pattern(self, pattern: str) -> int:
+        """按通配符模式删除缓存"""
+        try:
+            return await self._scan_delete(self._make_key(pattern))
+        except Exception as e:
+            logger.error(f"Redis delete_pattern error: {e}")
+            return 0
+    
+    async def _scan_delete(self, match: str) -> int:
+        """SCAN 遍历匹配的键并按批删除"""
+        redis_client = await self._get_redis()
+        deleted = 0
+        batch: List[str] = []
+        async for key in redis_client.scan_iter(match=match, count=self.SCAN_BATCH_SIZE):
+            batch.append(key)
+            if len(batch) >= self.SCAN_BATCH_SIZE:
+                deleted += await redis_client.delete(*batch)
+                batch = []
+        if batch:
+            deleted += await redis_client.delete(*batch)
+        return deleted
+    
     async def get_ttl(self, key: str) -> Optional[int]:
         """获取缓存TTL"""
         try:
@@ -273,20 +556,245 @@ class RedisCache(CacheBackend):
             logger.error(f"Redis TTL error: {e}")
             return None
     
+    async def publish(self, channel: str, message: Any) -> int:
+        """发布消息到频道，返回接收者数量"""
+        try:
+            redis_client = await self._get_redis()
+            return await redis_client.publish(self._make_key(channel), self._serialize(message))
+        except Exception as e:
+            logger.error(f"Redis publish error: {e}")
+            return 0
+    
+    async def subscribe(self, channel: str):
+        """订阅频道，返回已订阅的 PubSub 对象"""
+        redis_client = await self._get_redis()
+        pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(self._make_key(channel))
+        return pubsub
+    
     async def close(self):
         """关闭Redis连接"""
         if self._redis:
             await self._redis.close()
 
+class TieredCache(CacheBackend):
+    """
+    两级缓存：进程内 MemoryCache（L1）+ RedisCache（L2）
+    
+    读取先查 L1，未命中再查 L2 并回填 L1；写入与删除同时作用于两级，
+    并通过 Redis 发布/订阅广播失效消息，其他进程收到后清除各自 L1 中的对应键。
+    """
+    
+    def __init__(
+        self,
+        l2: RedisCache,
+        l1: Optional[MemoryCache] = None,
+        l1_ttl: int = 60,
+        channel: str = "cache:invalidate"
+    ):
+        self.l1 = l1 or MemoryCache(max_size=1000, default_ttl=l1_ttl)
+        self.l2 = l2
+        self.l1_ttl = l1_ttl
+        self.channel = channel
+        self.instance_id = uuid.uuid4().hex
+        self._listener: Optional[asyncio.Task] = None
+        self.stats = {
+            "l1_hits": 0,
+            "l2_hits": 0,
+            "misses": 0,
+            "invalidations_sent": 0,
+            "invalidations_received": 0
+        }
+    
+    def _ensure_listener(self):
+        """首次使用时在当前事件循环中启动失效消息监听"""
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+    
+    async def _listen(self):
+        """监听失效广播，清除本进程 L1 中被其他进程修改的键"""
+        try:
+            pubsub = await self.l2.subscribe(self.channel)
+        except Exception as e:
+            logger.error(f"缓存失效订阅失败，L1 仅依赖TTL过期: {e}")
+            return
+        try:
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                try:
+                    payload = json.loads(message["data"])
+                except (TypeError, json.JSONDecodeError):
+                    continue
+                if payload.get("origin") == self.instance_id:
+                    continue
+                self.stats["invalidations_received"] += 1
+                if payload.get("clear"):
+                    await self.l1.clear()
+                elif payload.get("pattern"):
+                    await self.l1.delete_pattern(payload["pattern"])
+                else:
+                    await self.l1.delete_many(payload.get("keys", []))
+        finally:
+            try:
+                await pubsub.unsubscribe()
+                await pubsub.close()
+            except Exception:
+                pass
+    
+    async def _broadcast(self, **payload):
+        """广播失效消息"""
+        self.stats["invalidations_sent"] += 1
+        await self.l2.publish(self.channel, {"origin": self.instance_id, **payload})
+    
+    def _l1_ttl(self, ttl: Optional[int]) -> int:
+        """L1 的TTL不超过 l1_ttl，失效广播丢失时也能较快收敛"""
+        return min(ttl, self.l1_ttl) if ttl and ttl > 0 else self.l1_ttl
+    
+    async def get(self, key: str) -> Optional[Any]:
+        """获取缓存值"""
+        self._ensure_listener()
+        value = await self.l1.get(key)
+        if value is not None:
+            self.stats["l1_hits"] += 1
+            return value
+        value = await self.l2.get(key)
+        if value is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["l2_hits"] += 1
+        await self.l1.set(key, value, self._l1_ttl(await self.l2.get_ttl(key)))
+        return value
+    
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+        """设置缓存值"""
+        self._ensure_listener()
+        success = await self.l2.set(key, value, ttl)
+        await self.l1.set(key, value, self._l1_ttl(ttl))
+        await self._broadcast(keys=[key])
+        return bool(success)
+    
+    async def delete(self, key: str) -> bool:
+        """删除缓存"""
+        self._ensure_listener()
+        await self.l1.delete(key)
+        result = await self.l2.delete(key)
+        await self._broadcast(keys=[key])
+        return result
+    
+    async def exists(self, key: str) -> bool:
+        """检查缓存是否存在"""
+        return await self.l1.exists(key) or await self.l2.exists(key)
+    
+    async def clear(self) -> bool:
+        """清空所有缓存"""
+        self._ensure_listener()
+        await self.l1.clear()
+        result = await self.l2.clear()
+        await self._broadcast(clear=True)
+        return result
+    
+    async def get_ttl(self, key: str) -> Optional[int]:
+        """获取缓存TTL（以 L2 为准）"""
+        return await self.l2.get_ttl(key)
+    
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """批量获取缓存：L1 未命中的键一次从 L2 批量读取"""
+        self._ensure_listener()
+        result = await self.l1.get_many(keys)
+        self.stats["l1_hits"] += len(result)
+        missing = [key for key in keys if key not in result]
+        if missing:
+            fetched = await self.l2.get_many_with_ttl(missing)
+            self.stats["l2_hits"] += len(fetched)
+            self.stats["misses"] += len(missing) - len(fetched)
+            # 与 get() 一致：回填 L1 的TTL取 min(L2 剩余TTL, l1_ttl)，按TTL分组批量写入
+            backfill: Dict[int, Dict[str, Any]] = {}
+            for key, (value, ttl) in fetched.items():
+                backfill.setdefault(self._l1_ttl(ttl), {})[key] = value
+                result[key] = value
+            for ttl, mapping in backfill.items():
+                await self.l1.set_many(mapping, ttl)
+        return result
+    
+    async def set_many(self, mapping: Dict[str, Any], ttl: Optional[int] = None) -> bool:
+        """批量设置缓存"""
+        self._ensure_listener()
+        success = await self.l2.set_many(mapping, ttl)
+        await self.l1.set_many(mapping, self._l1_ttl(ttl))
+        await self._broadcast(keys=list(mapping))
+        return success
+    
+    async def delete_many(self, keys: List[str]) -> int:
+        """批量删除缓存"""
+        self._ensure_listener()
+        await self.l1.delete_many(keys)
+        count = await self.l2.delete_many(keys)
+        await self._broadcast(keys=list(keys))
+        return count
+    
+    async def delete_pattern(self, pattern: str) -> int:
+        """按通配符模式删除缓存"""
+        self._ensure_listener()
+        await self.l1.delete_pattern(pattern)
+        count = await self.l2.delete_pattern(pattern)
+        await self._broadcast(pattern=pattern)
+        return count
+    
+    async def get_stats(self) -> Dict[str, Any]:
+        """获取各级命中统计"""
+        lookups = self.stats["l1_hits"] + self.stats["l2_hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "l1_hit_rate": round(self.stats["l1_hits"] / lookups, 4) if lookups else 0.0,
+            "hit_rate": round((self.stats["l1_hits"] + self.stats["l2_hits"]) / lookups, 4) if lookups else 0.0,
+            "l1": await self.l1.get_stats()
+        }
+    
+    async def close(self):
+        """停止监听并关闭 L2 连接"""
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._listener = None
+        await self.l2.close()
+
+# get_or_set 在开启提前刷新或过期兜底时写入的包装结构标记
+_ENVELOPE_MARKER = "__cache_envelope__"
+
+
+def _is_envelope(value: Any) -> bool:
+    return isinstance(value, dict) and value.get(_ENVELOPE_MARKER) == 1
+
+
+async def _call_factory(factory: Callable[[], Any]) -> Any:
+    """调用工厂函数，兼容同步函数、协程函数及返回可等待对象的函数"""
+    value = factory()
+    if inspect.isawaitable(value):
+        value = await value
+    return value
+
+
 class CacheManager:
     """缓存管理器"""
     
     def __init__(self, backend: CacheBackend):
         self.backend = backend
+        # 进行中的计算：同一个键的并发未命中共享一次工厂调用
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.stats = {
+            "coalesced": 0,  # 等待他人计算结果而未重复调用工厂的次数
+            "early_refreshes": 0,
+            "stale_served": 0
+        }
     
     async def get(self, key: str) -> Optional[Any]:
         """获取缓存"""
-        return await self.backend.get(key)
+        value = await self.backend.get(key)
+        return value["value"] if _is_envelope(value) else value
     
     async def set(self, key: str, value: Any, ttl: Optional[int] = None, expire: Optional[int] = None) -> bool:
         """设置缓存"""
@@ -302,46 +810,106 @@ class CacheManager:
         self, 
         key: str, 
         factory: Callable[[], Any], 
-        ttl: Optional[int] = None
+        ttl: Optional[int] = None,
+        beta: float = 0.0,
+        stale_ttl: int = 0
     ) -> Any:
-        """获取缓存，如果不存在则通过工厂函数创建"""
-        value = await self.get(key)
-        if value is not None:
-            return value
+        """
+        获取缓存，如果不存在则通过工厂函数创建
         
-        # 调用工厂函数
-        if asyncio.iscoroutinefunction(factory):
-            value = await factory()
-        else:
-            value = factory()
+        同一键的并发未命中只调用一次工厂函数，其余调用方等待同一结果。
+        
+        Args:
+            beta: 大于0时启用概率提前刷新（XFetch），越大越早刷新，通常取 1.0
+            stale_ttl: 过期后仍可返回旧值的时间（秒），期间后台刷新
+        """
+        if beta <= 0 and stale_ttl <= 0:
+            value = await self.get(key)
+            if value is not None:
+                return value
+            return await self._single_flight(key, lambda: self._compute_and_store(key, factory, ttl))
+        
+        ttl = ttl or getattr(self.backend, "default_ttl", 3600)
+        compute = lambda: self._compute_and_store(key, factory, ttl, stale_ttl=stale_ttl, envelope=True)
+        entry = await self.backend.get(key)
+        if not _is_envelope(entry):
+            return await self._single_flight(key, compute)
+        
+        now = time.time()
+        if now >= entry["expires_at"]:
+            if now < entry["expires_at"] + stale_ttl:
+                # 返回旧值，后台刷新
+                self.stats["stale_served"] += 1
+                self._start_flight(key, compute)
+                return entry["value"]
+            return await self._single_flight(key, compute)
         
-        await self.set(key, value, ttl)
+        # XFetch：以计算耗时为尺度，随机地在到期前提前刷新，避免同时过期
+        if beta > 0 and now - entry["delta"] * beta * math.log(random.random() or 1e-12) >= entry["expires_at"]:
+            if key not in self._inflight:
+                self.stats["early_refreshes"] += 1
+                self._start_flight(key, compute)
+        return entry["value"]
+    
+    async def _compute_and_store(self, key: str, factory: Callable[[], Any], ttl: Optional[int],
+                                 stale_ttl: int = 0, envelope: bool = False) -> Any:
+        """调用工厂函数并写入缓存"""
+        started = time.time()
+        value = await _call_factory(factory)
+        if value is None:
+            return None
+        if envelope:
+            finished = time.time()
+            await self.backend.set(key, {
+                _ENVELOPE_MARKER: 1,
+                "value": value,
+                "delta": finished - started,
+                "expires_at": finished + ttl
+            }, ttl + stale_ttl)
+        else:
+            await self.set(key, value, ttl)
         return value
     
+    def _start_flight(self, key: str, compute: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """启动（或复用）某个键的计算任务"""
+        task = self._inflight.get(key)
+        if task is not None:
+            return task
+        task = asyncio.ensure_future(compute())
+        self._inflight[key] = task
+        
+        def _done(t: asyncio.Task):
+            if self._inflight.get(key) is t:
+                del self._inflight[key]
+            if not t.cancelled() and t.exception() is not None:
+                logger.warning(f"缓存计算失败 {key}: {t.exception()}")
+        
+        task.add_done_callback(_done)
+        return task
+    
+    async def _single_flight(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """等待某个键的计算结果；调用方被取消不会中断共享的计算"""
+        if key in self._inflight:
+            self.stats["coalesced"] += 1
+        return await asyncio.shield(self._start_flight(key, compute))
+    
     async def get_many(self, keys: List[str]) -> Dict[str, Any]:
         """批量获取缓存"""
-        result = {}
-        for key in keys:
-            value = await self.get(key)
-            if value is not None:
-                result[key] = value
-        return result
+        result = await self.backend.get_many(keys)
+        return {key: value["value"] if _is_envelope(value) else value for key, value in result.items()}
     
-    async def set_many(self, mapping: Dict[str, Any], ttl: Optional[int] = None) -> bool:
+    async def set_many(self, mapping: Dict[str, Any], ttl: Optional[int] = None, expire: Optional[int] = None) -> bool:
         """批量设置缓存"""
-        success = True
-        for key, value in mapping.items():
-            if not await self.set(key, value, ttl):
-                success = False
-        return success
+        cache_ttl = ttl if ttl is not None else expire
+        return await self.backend.set_many(mapping, cache_ttl)
     
     async def delete_many(self, keys: List[str]) -> int:
         """批量删除缓存"""
-        count = 0
-        for key in keys:
-            if await self.delete(key):
-                count += 1
-        return count
+        return await self.backend.delete_many(keys)
+    
+    async def delete_pattern(self, pattern: str) -> int:
+        """按通配符模式删除缓存"""
+        return await self.backend.delete_pattern(pattern)
     
     async def clear(self) -> bool:
         """清空所有缓存"""
@@ -350,15 +918,21 @@ class CacheManager:
 def cached(
     ttl: int = 3600, 
     key_func: Optional[Callable] = None,
-    cache_manager: Optional[CacheManager] = None
+    cache_manager: Optional[CacheManager] = None,
+    beta: float = 0.0,
+    stale_ttl: int = 0
 ):
     """
     缓存装饰器
     
+    并发调用在缓存未命中时只执行一次被装饰函数。
+    
     Args:
         ttl: 缓存时间（秒）
-        key_func: 键生成函数
+        key_func: 键生成函数，接收被装饰函数的参数；默认使用 default_key_func（函数全名 + 参数的 blake2b 摘要）
         cache_manager: 缓存管理器
+        beta: 概率提前刷新系数（XFetch），0 表示不启用
+        stale_ttl: 过期后仍返回旧值并后台刷新的时间（秒）
     
     Returns:
         装饰器函数
@@ -376,28 +950,42 @@ def cached(
             if key_func:
                 cache_key = key_func(*args, **kwargs)
             else:
-                # 默认键生成策略
-                func_name = f"{func.__module__}.{func.__name__}"
-                args_str = str(args) + str(sorted(kwargs.items()))
-                cache_key = f"{func_name}:{hash(args_str)}"
-            
-            # 尝试从缓存获取
-            cached_result = await cm.get(cache_key)
-            if cached_result is not None:
-                return cached_result
-            
-            # 执行函数并缓存结果
-            if asyncio.iscoroutinefunction(func):
-                result = await func(*args, **kwargs)
-            else:
-                result = func(*args, **kwargs)
+                cache_key = default_key_func(func, args, kwargs)
             
-            await cm.set(cache_key, result, ttl)
-            return result
+            return await cm.get_or_set(
+                cache_key,
+                lambda: func(*args, **kwargs),
+                ttl,
+                beta=beta,
+                stale_ttl=stale_ttl
+            )
         
         return wrapper
     return decorator
 
+def create_cache_backend(
+    backend: str = "memory",
+    redis_url: Optional[str] = None,
+    redis_password: Optional[str] = None,
+    max_size: int = 1000,
+    default_ttl: int = 3600,
+    l1_ttl: int = 60
+) -> CacheBackend:
+    """
+    按名称创建缓存后端：memory / redis / tiered
+    
+    未安装redis时退回内存缓存。
+    """
+    if backend in ("redis", "tiered"):
+        if REDIS_AVAILABLE:
+            l2 = RedisCache.from_url(redis_url or "redis://localhost:6379/0", password=redis_password,
+                                     default_ttl=default_ttl)
+            if backend == "redis":
+                return l2
+            return TieredCache(l2, l1=MemoryCache(max_size=max_size, default_ttl=l1_ttl), l1_ttl=l1_ttl)
+        logger.warning(f"未安装redis，{backend} 缓存后端退回内存缓存")
+    return MemoryCache(max_size=max_size, default_ttl=default_ttl)
+
 # 全局缓存管理器
 _default_cache_manager: Optional[CacheManager] = None
 
@@ -422,6 +1010,11 @@ class CacheKeyGenerator:
         """用户会话缓存键"""
         return f"user_session:{user_id}:{session_id}"
     
+    @staticmethod
+    def hashed(prefix: str, *parts: Any) -> str:
+        """通用缓存键：前缀 + 参数的稳定摘要"""
+        return f"{prefix}:{stable_hash(*parts)}"
+    
     @staticmethod
     def agent_response(agent_id: str, query_hash: str) -> str:
         """智能体响应缓存键"""
@@ -430,11 +1023,18 @@ class CacheKeyGenerator:
     @staticmethod
     def knowledge_search(query: str, category: Optional[str] = None) -> str:
         """知识搜索缓存键"""
-        query_hash = hash(query)
+        query_hash = stable_hash(query)
         if category:
             return f"knowledge_search:{query_hash}:{category}"
         return f"knowledge_search:{query_hash}"
     
+    @staticmethod
+    def product_search(keyword: str, page: int, page_size: int, sort: str,
+                       price_min: Optional[float] = None, price_max: Optional[float] = None,
+                       gender: Optional[str] = None) -> str:
+        """商品搜索结果缓存键（关键词需已归一化）"""
+        return f"product_search:{keyword}:{page}:{page_size}:{sort}:{price_min}:{price_max}:{gender or ''}"
+    
     @staticmethod
     def user_profile(user_id: str) -> str:
         """用户档案缓存键"""
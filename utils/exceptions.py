@@ -209,6 +209,29 @@ class TimeoutException(BaseCustomException):
         
         super().__init__(ErrorCode.TIMEOUT_ERROR, message, details)
 
+class OverloadException(BaseCustomException):
+    """过载异常：请求在排队截止时间内未获准执行，已被丢弃"""
+    
+    def __init__(
+        self,
+        resource: str,
+        queue_timeout: float,
+        queue_depth: Optional[int] = None,
+        message: Optional[str] = None
+    ):
+        details = {
+            "resource": resource,
+            "queue_timeout": queue_timeout
+        }
+        
+        if queue_depth is not None:
+            details["queue_depth"] = queue_depth
+        
+        if message is None:
+            message = f"{resource}繁忙，排队超过{queue_timeout}秒，请求已被丢弃"
+        
+        super().__init__(ErrorCode.SERVICE_UNAVAILABLE, message, details)
+
 class ErrorHandler:
     """错误处理器"""
     
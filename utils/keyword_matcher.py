@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+多模式关键词匹配器
+基于 Aho-Corasick 自动机，一次扫描文本即可得到全部命中的关键词及其类别
+"""
+from collections import deque
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+class KeywordMatcher:
+    """多模式关键词匹配器（Aho-Corasick 自动机）"""
+
+    def __init__(self, keyword_classes: Dict[str, Iterable[str]], ignore_case: bool = True):
+        """
+        构建匹配自动机
+
+        Args:
+            keyword_classes: {类别名: 关键词列表}，同一关键词可属于多个类别
+            ignore_case: 是否忽略大小写
+        """
+        self.ignore_case = ignore_case
+        self._keyword_classes: Dict[str, Set[str]] = {}
+        for class_name, keywords in keyword_classes.items():
+            for keyword in keywords:
+                if not keyword:
+                    continue
+                keyword = self._normalize(keyword)
+                self._keyword_classes.setdefault(keyword, set()).add(class_name)
+        self.class_names = frozenset(keyword_classes.keys())
+
+        # 状态0为根；_goto[状态][字符] -> 状态，_output[状态] -> 以该状态结尾的关键词
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Tuple[str, ...]] = [()]
+        self._build()
+
+    def _normalize(self, text: str) -> str:
+        return text.lower() if self.ignore_case else text
+
+    def _build(self):
+        """构建字典树与失败指针"""
+        outputs: List[List[str]] = [[]]
+        for keyword in self._keyword_classes:
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    outputs.append([])
+                state = next_state
+            outputs[state].append(keyword)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                outputs[next_state].extend(outputs[self._fail[next_state]])
+
+        self._output = [tuple(words) for words in outputs]
+
+    def find_all(self, text: str) -> List[Tuple[int, int, str]]:
+        """返回全部命中（含重叠）：[(起始位置, 结束位置, 关键词)]"""
+        if not text:
+            return []
+        goto, fail, output = self._goto, self._fail, self._output
+        matches = []
+        state = 0
+        for index, char in enumerate(self._normalize(text)):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for keyword in output[state]:
+                matches.append((index + 1 - len(keyword), index + 1, keyword))
+        return matches
+
+    def scan(self, text: str) -> Dict[str, Set[str]]:
+        """返回 {类别名: 命中的关键词集合}"""
+        result: Dict[str, Set[str]] = {}
+        for _, _, keyword in self.find_all(text):
+            for class_name in self._keyword_classes[keyword]:
+                result.setdefault(class_name, set()).add(keyword)
+        return result
+
+    def match(self, text: str) -> Set[str]:
+        """返回命中的类别名集合"""
+        if not text:
+            return set()
+        goto, fail, output = self._goto, self._fail, self._output
+        keyword_classes = self._keyword_classes
+        classes: Set[str] = set()
+        state = 0
+        for char in self._normalize(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for keyword in output[state]:
+                classes.update(keyword_classes[keyword])
+        return classes
+
+    def replace(self, text: str, replacements: Dict[str, str]) -> str:
+        """
+        单次扫描替换：按最左最长原则选取不重叠的命中并替换
+
+        replacements 的键需与构建时的关键词一致（忽略大小写时按小写匹配）。
+        """
+        lookup = {self._normalize(k): v for k, v in replacements.items()}
+        matches = [m for m in self.find_all(text) if m[2] in lookup]
+        if not matches:
+            return text
+        matches.sort(key=lambda m: (m[0], -m[1]))
+
+        parts = []
+        cursor = 0
+        for start, end, keyword in matches:
+            if start < cursor:
+                continue
+            parts.append(text[cursor:start])
+            parts.append(lookup[keyword])
+            cursor = end
+        parts.append(text[cursor:])
+        return "".join(parts)
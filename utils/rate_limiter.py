@@ -1,35 +1,121 @@
 # -*- coding: utf-8 -*-
 """
 速率限制器
-提供基于时间窗口的速率限制功能
+提供基于滑动窗口计数与令牌桶的速率限制功能，以及自适应并发限制
 """
 import time
 import asyncio
-from typing import Dict, Optional, Tuple
-from collections import defaultdict, deque
-from datetime import datetime, timedelta
+import heapq
+import itertools
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from collections import defaultdict
 import logging
 
+from .exceptions import OverloadException
+
+try:
+    import redis.asyncio as redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    redis = None
+    REDIS_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 
+class _WindowState:
+    """单个键的滑动窗口计数状态（固定大小）"""
+    
+    __slots__ = ("window_index", "previous", "current", "last_seen")
+    
+    def __init__(self, window_index: int, now: float):
+        self.window_index = window_index
+        self.previous = 0
+        self.current = 0
+        self.last_seen = now
+
+
 class RateLimiter:
-    """速率限制器"""
+    """
+    速率限制器（滑动窗口计数）
     
-    def __init__(self, max_requests: int = 100, time_window: int = 60):
+    每个键只保存上一窗口与当前窗口的计数，按当前窗口已过比例加权估算最近 time_window 秒内的请求数，
+    内存与请求量无关。键按哈希分片存放，定期逐片清理空闲键。
+    所有操作在事件循环内同步完成（不含 await），无需加锁。
+    """
+    
+    def __init__(self, max_requests: int = 100, time_window: int = 60, num_shards: int = 16,
+                 gc_interval: Optional[float] = None):
         """
         初始化速率限制器
         
         Args:
             max_requests: 时间窗口内最大请求数
             time_window: 时间窗口大小（秒）
+            num_shards: 分片数，空闲键清理每次只扫描一个分片
+            gc_interval: 清理间隔（秒），默认与时间窗口相同
         """
         self.max_requests = max_requests
         self.time_window = time_window
-        self.requests: Dict[str, deque] = defaultdict(deque)
-        self._lock = asyncio.Lock()
+        self.num_shards = max(1, num_shards)
+        self.gc_interval = gc_interval if gc_interval is not None else time_window
+        self._shards: List[Dict[str, _WindowState]] = [{} for _ in range(self.num_shards)]
+        self._next_gc = time.time() + self.gc_interval
+        self._gc_cursor = 0
+        self.evicted_keys = 0
+    
+    def _shard(self, key: str) -> Dict[str, _WindowState]:
+        return self._shards[hash(key) % self.num_shards]
+    
+    def _state(self, key: str, now: float, create: bool = True) -> Optional[_WindowState]:
+        """获取键的状态并滚动到当前窗口"""
+        shard = self._shard(key)
+        window_index = int(now // self.time_window)
+        state = shard.get(key)
+        if state is None:
+            if not create:
+                return None
+            state = shard[key] = _WindowState(window_index, now)
+        elif state.window_index != window_index:
+            # 只有紧邻的上一窗口计数参与加权，更早的窗口直接清零
+            state.previous = state.current if window_index - state.window_index == 1 else 0
+            state.current = 0
+            state.window_index = window_index
+        return state
+    
+    def _estimate(self, state: _WindowState, now: float) -> float:
+        """估算最近一个时间窗口内的请求数"""
+        elapsed = now - state.window_index * self.time_window
+        return state.previous * (1 - elapsed / self.time_window) + state.current
     
-    async def is_allowed(self, key: str) -> Tuple[bool, Dict[str, any]]:
+    def _retry_after(self, state: _WindowState, now: float) -> float:
+        """估算再次允许请求需等待的秒数"""
+        window_start = state.window_index * self.time_window
+        budget = self.max_requests - 1
+        if state.current > budget:
+            # 本窗口计数已超限：需等到下一窗口且本窗口计数衰减到限额以下
+            return window_start + self.time_window - now + self.time_window * (1 - budget / state.current)
+        if state.previous <= 0:
+            return 0.0
+        needed = self.time_window * (1 - (budget - state.current) / state.previous)
+        return max(0.0, window_start + needed - now)
+    
+    def _maybe_collect(self, now: float):
+        """按间隔逐片清理空闲键（两个窗口内无请求的键计数已为0）"""
+        if now < self._next_gc:
+            return
+        self._next_gc = now + self.gc_interval / self.num_shards
+        shard = self._shards[self._gc_cursor]
+        self._gc_cursor = (self._gc_cursor + 1) % self.num_shards
+        idle_before = now - 2 * self.time_window
+        idle_keys = [key for key, state in shard.items() if state.last_seen < idle_before]
+        for key in idle_keys:
+            del shard[key]
+        self.evicted_keys += len(idle_keys)
+    
+    async def is_allowed(self, key: str) -> Tuple[bool, Dict[str, Any]]:
         """
         检查是否允许请求
         
@@ -39,71 +125,197 @@ class RateLimiter:
         Returns:
             (是否允许, 限制信息)
         """
-        async with self._lock:
-            current_time = time.time()
-            
-            # 清理过期的请求记录
-            self._cleanup_expired_requests(key, current_time)
-            
-            # 检查当前请求数
-            current_requests = len(self.requests[key])
-            
-            if current_requests >= self.max_requests:
-                # 超出限制
-                oldest_request = self.requests[key][0] if self.requests[key] else current_time
-                reset_time = oldest_request + self.time_window
-                
-                return False, {
-                    "allowed": False,
-                    "current_requests": current_requests,
-                    "max_requests": self.max_requests,
-                    "time_window": self.time_window,
-                    "reset_time": reset_time,
-                    "retry_after": max(0, reset_time - current_time)
-                }
-            
-            # 允许请求，记录时间戳
-            self.requests[key].append(current_time)
-            
-            return True, {
-                "allowed": True,
-                "current_requests": current_requests + 1,
+        current_time = time.time()
+        self._maybe_collect(current_time)
+        state = self._state(key, current_time)
+        state.last_seen = current_time
+        current_requests = self._estimate(state, current_time)
+        
+        if current_requests + 1 > self.max_requests:
+            # 超出限制
+            retry_after = self._retry_after(state, current_time)
+            return False, {
+                "allowed": False,
+                "current_requests": int(current_requests),
                 "max_requests": self.max_requests,
                 "time_window": self.time_window,
-                "remaining_requests": self.max_requests - current_requests - 1
+                "reset_time": current_time + retry_after,
+                "retry_after": retry_after
             }
-    
-    def _cleanup_expired_requests(self, key: str, current_time: float):
-        """清理过期的请求记录"""
-        cutoff_time = current_time - self.time_window
         
-        while self.requests[key] and self.requests[key][0] <= cutoff_time:
-            self.requests[key].popleft()
+        # 允许请求，计入当前窗口
+        state.current += 1
+        return True, {
+            "allowed": True,
+            "current_requests": int(current_requests) + 1,
+            "max_requests": self.max_requests,
+            "time_window": self.time_window,
+            "remaining_requests": max(0, int(self.max_requests - current_requests - 1))
+        }
     
     async def reset(self, key: str):
         """重置指定键的限制"""
-        async with self._lock:
-            if key in self.requests:
-                del self.requests[key]
+        self._shard(key).pop(key, None)
     
-    async def get_status(self, key: str) -> Dict[str, any]:
+    async def get_status(self, key: str) -> Dict[str, Any]:
         """获取限制状态"""
-        async with self._lock:
-            current_time = time.time()
-            self._cleanup_expired_requests(key, current_time)
-            
-            current_requests = len(self.requests[key])
-            oldest_request = self.requests[key][0] if self.requests[key] else current_time
-            reset_time = oldest_request + self.time_window
-            
-            return {
-                "current_requests": current_requests,
+        current_time = time.time()
+        state = self._state(key, current_time, create=False)
+        current_requests = int(self._estimate(state, current_time)) if state else 0
+        window_start = state.window_index * self.time_window if state else None
+        
+        return {
+            "current_requests": current_requests,
+            "max_requests": self.max_requests,
+            "time_window": self.time_window,
+            "remaining_requests": max(0, self.max_requests - current_requests),
+            "reset_time": current_time + (self._retry_after(state, current_time) if state else 0.0),
+            "window_start": window_start
+        }
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取限制器统计信息"""
+        return {
+            "tracked_keys": sum(len(shard) for shard in self._shards),
+            "evicted_keys": self.evicted_keys,
+            "num_shards": self.num_shards
+        }
+
+
+# 滑动窗口计数的 Redis 脚本：以 Redis 服务器时间为准，保证多进程计数一致
+# KEYS[1]: 限制键前缀；ARGV[1]: 窗口毫秒数；ARGV[2]: 最大请求数
+_SLIDING_WINDOW_LUA = """
+local window = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local index = math.floor(now / window)
+local current_key = KEYS[1] .. ':' .. index
+local previous_key = KEYS[1] .. ':' .. (index - 1)
+local current = tonumber(redis.call('GET', current_key) or '0')
+local previous = tonumber(redis.call('GET', previous_key) or '0')
+local elapsed = now - index * window
+local estimated = previous * (1 - elapsed / window) + current
+if estimated + 1 > limit then
+    return {0, math.floor(estimated), current, previous, elapsed}
+end
+current = redis.call('INCR', current_key)
+redis.call('PEXPIRE', current_key, window * 2)
+return {1, math.floor(estimated) + 1, current, previous, elapsed}
+"""
+
+
+class RedisRateLimiter(RateLimiter):
+    """
+    基于 Redis 的滑动窗口计数限制器，限额在多个工作进程间共享
+    
+    判断与计数在同一个 Lua 脚本中原子完成；计数键带过期时间，空闲键由 Redis 自动回收。
+    Redis 不可用时放行请求并记录日志（fail-open）。
+    """
+    
+    def __init__(self, max_requests: int = 100, time_window: int = 60,
+                 redis_url: str = "redis://localhost:6379/0", password: Optional[str] = None,
+                 key_prefix: str = "cs:ratelimit:", client: Optional[Any] = None):
+        """
+        Args:
+            client: 预先创建的 Redis 客户端（需 decode_responses=True），提供时忽略 redis_url
+        """
+        if not REDIS_AVAILABLE and client is None:
+            raise ImportError("redis package is required for RedisRateLimiter")
+        super().__init__(max_requests=max_requests, time_window=time_window, num_shards=1)
+        self.redis_url = redis_url
+        self.password = password
+        self.key_prefix = key_prefix
+        self._redis = client
+        self._script = None
+    
+    async def _get_script(self):
+        if self._script is None:
+            if self._redis is None:
+                self._redis = redis.from_url(self.redis_url, password=self.password, decode_responses=True)
+            self._script = self._redis.register_script(_SLIDING_WINDOW_LUA)
+        return self._script
+    
+    async def is_allowed(self, key: str) -> Tuple[bool, Dict[str, Any]]:
+        """检查是否允许请求"""
+        window_ms = int(self.time_window * 1000)
+        try:
+            script = await self._get_script()
+            allowed, estimated, current, previous, elapsed = await script(
+                keys=[f"{self.key_prefix}{key}"], args=[window_ms, self.max_requests]
+            )
+        except Exception as e:
+            logger.error(f"Redis速率限制检查失败，放行请求: {e}")
+            return True, {"allowed": True, "max_requests": self.max_requests,
+                          "time_window": self.time_window, "degraded": True}
+        
+        if allowed:
+            return True, {
+                "allowed": True,
+                "current_requests": int(estimated),
                 "max_requests": self.max_requests,
                 "time_window": self.time_window,
-                "remaining_requests": max(0, self.max_requests - current_requests),
-                "reset_time": reset_time,
-                "window_start": oldest_request if self.requests[key] else None
+                "remaining_requests": max(0, self.max_requests - int(estimated))
             }
+        
+        now = time.time()
+        state = _WindowState(0, now)
+        state.current, state.previous = int(current), int(previous)
+        retry_after = self._retry_after(state, float(elapsed) / 1000)
+        return False, {
+            "allowed": False,
+            "current_requests": int(estimated),
+            "max_requests": self.max_requests,
+            "time_window": self.time_window,
+            "reset_time": now + retry_after,
+            "retry_after": retry_after
+        }
+    
+    async def reset(self, key: str):
+        """重置指定键的限制"""
+        try:
+            await self._get_script()
+            keys = [k async for k in self._redis.scan_iter(match=f"{self.key_prefix}{key}:*")]
+            if keys:
+                await self._redis.delete(*keys)
+        except Exception as e:
+            logger.error(f"Redis速率限制重置失败: {e}")
+    
+    async def get_status(self, key: str) -> Dict[str, Any]:
+        """获取限制状态（不计数）"""
+        try:
+            await self._get_script()
+            now = time.time()
+            window_index = int(now // self.time_window)
+            current, previous = await self._redis.mget(
+                f"{self.key_prefix}{key}:{window_index}", f"{self.key_prefix}{key}:{window_index - 1}"
+            )
+            state = _WindowState(window_index, now)
+            state.current, state.previous = int(current or 0), int(previous or 0)
+            current_requests = int(self._estimate(state, now))
+        except Exception as e:
+            logger.error(f"Redis速率限制状态查询失败: {e}")
+            current_requests = 0
+        return {
+            "current_requests": current_requests,
+            "max_requests": self.max_requests,
+            "time_window": self.time_window,
+            "remaining_requests": max(0, self.max_requests - current_requests)
+        }
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {"backend": "redis", "key_prefix": self.key_prefix}
+
+
+def create_rate_limiter(backend: str = "memory", max_requests: int = 100, time_window: int = 60,
+                        redis_url: Optional[str] = None, redis_password: Optional[str] = None) -> RateLimiter:
+    """按名称创建速率限制器：memory / redis，未安装redis时退回内存实现"""
+    if backend == "redis":
+        if REDIS_AVAILABLE:
+            return RedisRateLimiter(max_requests=max_requests, time_window=time_window,
+                                    redis_url=redis_url or "redis://localhost:6379/0", password=redis_password)
+        logger.warning("未安装redis，速率限制退回内存实现")
+    return RateLimiter(max_requests=max_requests, time_window=time_window)
 
 
 class TokenBucketRateLimiter:
@@ -179,5 +391,182 @@ class TokenBucketRateLimiter:
                 }
 
 
+@dataclass(order=True)
+class _Waiter:
+    """排队中的请求：按 (优先级, 入队序号) 出队"""
+    priority: int
+    seq: int
+    tokens: int = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class AdmissionPermit:
+    """已获准执行的请求；调用方在遇到上游限流（429）时标记 throttled"""
+    
+    __slots__ = ("throttled",)
+    
+    def __init__(self):
+        self.throttled = False
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    自适应并发限制器
+    
+    - 并发上限按 AIMD 调整：请求成功且延迟正常时每轮加 1，遇到限流或延迟超标时乘以 backoff
+    - 可选令牌预算：基于 TokenBucketRateLimiter，按每次调用的预估 token 数扣减
+    - 超出并发或预算的请求按优先级排队（数值越小越优先），超过排队截止时间抛出 OverloadException
+    """
+    
+    def __init__(
+        self,
+        name: str = "llm",
+        initial_limit: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        latency_target: float = 10.0,
+        backoff: float = 0.5,
+        decrease_cooldown: float = 2.0,
+        tokens_per_minute: int = 0,
+        queue_timeout: float = 10.0
+    ):
+        """
+        Args:
+            name: 资源名称（用于令牌桶键与错误信息）
+            latency_target: 单次调用延迟超过该值视为上游过载（秒）
+            decrease_cooldown: 两次下调并发上限的最小间隔（秒），避免同一批失败把上限压到最低
+            tokens_per_minute: 每分钟令牌预算，0 表示不限制
+            queue_timeout: 默认排队截止时间（秒）
+        """
+        self.name = name
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.decrease_cooldown = decrease_cooldown
+        self.queue_timeout = queue_timeout
+        self.token_bucket = (
+            TokenBucketRateLimiter(capacity=tokens_per_minute, refill_rate=tokens_per_minute / 60)
+            if tokens_per_minute > 0 else None
+        )
+        self.in_flight = 0
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._pump_task: Optional[asyncio.Task] = None
+        self._last_decrease = 0.0
+        self.stats = {
+            "admitted": 0,
+            "queued": 0,
+            "shed": 0,
+            "throttled": 0,
+            "slow": 0,
+            "max_queue_depth": 0
+        }
+    
+    def _capacity(self) -> int:
+        return max(self.min_limit, int(self.limit))
+    
+    async def _take_tokens(self, tokens: int) -> Tuple[bool, float]:
+        """扣减令牌，返回 (是否成功, 需等待秒数)"""
+        if self.token_bucket is None or tokens <= 0:
+            return True, 0.0
+        tokens = min(tokens, self.token_bucket.capacity)
+        allowed, info = await self.token_bucket.is_allowed(self.name, tokens)
+        return allowed, info.get("retry_after", 0.0)
+    
+    async def acquire(self, priority: int = 2, tokens: int = 0, timeout: Optional[float] = None) -> None:
+        """获取执行许可，排队超时抛出 OverloadException"""
+        timeout = self.queue_timeout if timeout is None else timeout
+        if not self._queue and self.in_flight < self._capacity():
+            allowed, _ = await self._take_tokens(tokens)
+            if allowed:
+                self.in_flight += 1
+                self.stats["admitted"] += 1
+                return
+        
+        waiter = _Waiter(priority, next(self._seq), tokens, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._queue, waiter)
+        self.stats["queued"] += 1
+        self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], len(self._queue))
+        self._wake()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except asyncio.TimeoutError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                return  # 恰好在截止时刻获准
+            waiter.future.cancel()
+            self.stats["shed"] += 1
+            raise OverloadException(self.name, timeout, queue_depth=len(self._queue))
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.in_flight -= 1
+                self._wake()
+            else:
+                waiter.future.cancel()
+            raise
+    
+    def release(self, latency: float, throttled: bool = False) -> None:
+        """归还执行许可，并按本次结果调整并发上限"""
+        self.in_flight -= 1
+        now = time.monotonic()
+        if throttled or latency > self.latency_target:
+            self.stats["throttled" if throttled else "slow"] += 1
+            if now - self._last_decrease >= self.decrease_cooldown:
+                self.limit = max(float(self.min_limit), self.limit * self.backoff)
+                self._last_decrease = now
+        else:
+            # 加性增：每完成约 limit 次成功调用上限加 1
+            self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+        self._wake()
+    
+    @asynccontextmanager
+    async def slot(self, priority: int = 2, tokens: int = 0, timeout: Optional[float] = None):
+        """获取许可并在退出时归还：async with limiter.slot(...) as permit"""
+        await self.acquire(priority, tokens, timeout)
+        permit = AdmissionPermit()
+        started = time.monotonic()
+        try:
+            yield permit
+        finally:
+            self.release(time.monotonic() - started, permit.throttled)
+    
+    def _wake(self):
+        if self._queue and (self._pump_task is None or self._pump_task.done()):
+            self._pump_task = asyncio.get_running_loop().create_task(self._pump())
+    
+    async def _pump(self):
+        """按优先级放行排队请求，直到并发已满或队列为空"""
+        while self._queue and self.in_flight < self._capacity():
+            waiter = self._queue[0]
+            if waiter.future.done():
+                heapq.heappop(self._queue)
+                continue
+            allowed, retry_after = await self._take_tokens(waiter.tokens)
+            if not allowed:
+                await asyncio.sleep(min(max(retry_after, 0.01), 1.0))
+                continue
+            if self._queue and self._queue[0] is waiter:
+                heapq.heappop(self._queue)
+            else:
+                self._queue.remove(waiter)
+                heapq.heapify(self._queue)
+            if waiter.future.done():
+                continue
+            self.in_flight += 1
+            self.stats["admitted"] += 1
+            waiter.future.set_result(None)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取并发与排队统计"""
+        return {
+            **self.stats,
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queue_depth": sum(1 for w in self._queue if not w.future.done()),
+            "tokens_available": round(self.token_bucket.buckets[self.name]["tokens"]) if self.token_bucket else None
+        }
+
+
 # 默认实例
 default_rate_limiter = RateLimiter()
\ No newline at end of file
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+SQLite 连接池
+少量长连接（WAL 模式、调优的 PRAGMA、语句缓存）配合专用线程池，
+让异步代码在不阻塞事件循环的情况下访问 SQLite。
+"""
+import asyncio
+import functools
+import logging
+import queue
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# 默认 PRAGMA：WAL 允许读写并发，synchronous=NORMAL 在 WAL 下仍保证崩溃一致性
+DEFAULT_PRAGMAS: Dict[str, Any] = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "cache_size": -16000,  # 负数单位为 KiB
+    "temp_store": "MEMORY",
+    "mmap_size": 268435456,
+}
+
+
+class SQLitePool:
+    """
+    SQLite 连接池
+
+    同一线程内嵌套获取连接时复用已持有的连接（同一事务），最外层退出时提交或回滚；
+    线程池大小与连接数一致，线程池中的调用不会因等待连接而阻塞。
+    """
+
+    def __init__(self, path: Union[str, Path], size: int = 4, pragmas: Optional[Dict[str, Any]] = None,
+                 cached_statements: int = 256, name: str = "sqlite"):
+        """
+        Args:
+            path: 数据库文件路径
+            size: 连接数（同时也是线程池的线程数）
+            pragmas: 覆盖默认 PRAGMA
+            cached_statements: 每个连接缓存的预编译语句数
+        """
+        self.path = str(path)
+        self.size = size
+        self.pragmas = {**DEFAULT_PRAGMAS, **(pragmas or {})}
+        self.cached_statements = cached_statements
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix=f"{name}-db")
+        self._closed = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=self.cached_statements)
+        for key, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {key}={value}")
+        return conn
+
+    def _checkout(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._created -= 1
+                    raise
+        return self._idle.get()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """获取连接；最外层正常退出时提交，异常时回滚"""
+        if self._closed:
+            raise RuntimeError("连接池已关闭")
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            yield held
+            return
+
+        conn = self._checkout()
+        self._local.conn = conn
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._local.conn = None
+            self._idle.put(conn)
+
+    def _call(self, fn: Callable[..., Any], args: tuple, kwargs: Dict[str, Any]) -> Any:
+        with self.connection():
+            return fn(*args, **kwargs)
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        在线程池中执行 fn，执行期间当前线程持有一个池连接
+
+        fn 内部通过 connection() 获取的即是该连接，整个调用处于同一事务中。
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(self._call, fn, args, kwargs))
+
+    def close(self) -> None:
+        """关闭全部空闲连接与线程池"""
+        self._closed = True
+        self._executor.shutdown(wait=True)
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "size": self.size,
+            "open_connections": self._created,
+            "idle_connections": self._idle.qsize()
+        }
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+流式输出工具
+提供增量 JSON 字段提取器与流式输出接收器（通过上下文变量在调用链中传递）
+"""
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+class JsonFieldStreamExtractor:
+    """
+    增量提取流式 JSON 文本中某个字符串字段的值
+
+    每次 feed 一段模型输出，返回该字段新解码出的文本。
+    输出不是 JSON（如自然语言回复）时按原文透传；兼容 ```json 代码块包裹。
+    """
+
+    def __init__(self, field: str = "content"):
+        self.field = field
+        self._mode = "detect"  # detect / scan / value / done / text
+        self._pending = ""  # detect 阶段缓冲或跨片段的未完成转义
+        self._high_surrogate = None
+        # scan 阶段的词法状态
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._token = []
+        self._last_string = None
+        self._expect = None  # None / "colon" / "value"
+
+    def feed(self, chunk: str) -> str:
+        """输入一段输出文本，返回目标字段新增的解码文本"""
+        if not chunk or self._mode == "done":
+            return ""
+        if self._mode == "text":
+            return chunk
+        if self._mode == "detect":
+            buffered = self._pending + chunk
+            stripped = buffered.lstrip()
+            if not stripped:
+                self._pending = buffered
+                return ""
+            if stripped.startswith("```") or "```".startswith(stripped):
+                # 代码块：等待出现 JSON 起始符
+                brace = stripped.find("{")
+                if brace < 0:
+                    self._pending = buffered
+                    return ""
+                stripped = stripped[brace:]
+            elif not stripped.startswith("{"):
+                self._mode = "text"
+                self._pending = ""
+                return buffered
+            self._mode = "scan"
+            self._pending = ""
+            chunk = stripped
+        return self._consume(chunk)
+
+    def _consume(self, chunk: str) -> str:
+        out = []
+        index = 0
+        length = len(chunk)
+        while index < length and self._mode != "done":
+            char = chunk[index]
+            index += 1
+            if self._mode == "value":
+                if self._pending:
+                    self._pending += char
+                    decoded = self._decode_escape()
+                    if decoded is not None:
+                        out.append(decoded)
+                elif char == "\\":
+                    self._pending = "\\"
+                elif char == '"':
+                    self._mode = "done"
+                else:
+                    out.append(char)
+                continue
+
+            # scan：跟踪字符串与层级，寻找顶层的目标键
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    self._token.append(char)
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._last_string = "".join(self._token)
+                    if self._depth == 1 and self._expect is None and self._last_string == self.field:
+                        self._expect = "colon"
+                else:
+                    self._token.append(char)
+                continue
+            if char.isspace():
+                continue
+            if self._expect == "colon":
+                self._expect = "value" if char == ":" else None
+                if char == ":":
+                    continue
+            elif self._expect == "value":
+                self._expect = None
+                if char == '"':
+                    self._mode = "value"
+                    continue
+            if char == '"':
+                self._in_string = True
+                self._token = []
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+        return "".join(out)
+
+    def _decode_escape(self) -> Optional[str]:
+        """解码缓冲中的转义序列；序列不完整时返回 None"""
+        seq = self._pending
+        if len(seq) < 2:
+            return None
+        if seq[1] != "u":
+            self._pending = ""
+            return _ESCAPES.get(seq[1], seq[1])
+        if len(seq) < 6:
+            return None
+        self._pending = ""
+        try:
+            code = int(seq[2:6], 16)
+        except ValueError:
+            return ""
+        # 代理对（如 emoji）由两个 \u 转义组成，需合并后再输出
+        if 0xD800 <= code <= 0xDBFF:
+            self._high_surrogate = code
+            return ""
+        if 0xDC00 <= code <= 0xDFFF and self._high_surrogate is not None:
+            code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+        self._high_surrogate = None
+        return chr(code)
+
+
+class StreamSink:
+    """流式输出接收器：把主智能体生成中的回复片段转发给客户端"""
+
+    def __init__(self, send: Callable[[Dict[str, Any]], Awaitable[None]]):
+        self._send = send
+        self.segment = 0
+
+    def begin_segment(self) -> None:
+        """开始新一段生成（同一轮中智能体可能多次调用模型，客户端据此重置预览）"""
+        self.segment += 1
+
+    async def push(self, delta: str) -> None:
+        if delta:
+            await self._send({"delta": delta, "segment": self.segment})
+
+
+class BufferedStreamSink(StreamSink):
+    """
+    暂存片段的接收器：推测执行期间生成的片段先缓冲
+
+    确认采用后 attach 到调用方的接收器，按段回放已缓冲的片段，之后的片段直接转发；
+    放弃时 discard 丢弃全部片段。
+    """
+
+    def __init__(self):
+        super().__init__(self._record)
+        self._buffer: List[Tuple[int, str]] = []
+        self._target: Optional[StreamSink] = None
+        self._discarded = False
+
+    def begin_segment(self) -> None:
+        super().begin_segment()
+        if self._target is not None:
+            self._target.begin_segment()
+
+    async def _record(self, frame: Dict[str, Any]) -> None:
+        if self._target is not None:
+            await self._target.push(frame["delta"])
+        elif not self._discarded:
+            self._buffer.append((frame["segment"], frame["delta"]))
+
+    async def attach(self, target: StreamSink) -> None:
+        """把已缓冲的片段按段回放到 target，此后的片段直接转发"""
+        replayed = 0
+        while self._buffer:
+            # 回放期间生成任务可能继续推送片段，循环直到缓冲清空
+            buffered, self._buffer = self._buffer, []
+            for segment, delta in buffered:
+                while replayed < segment:
+                    target.begin_segment()
+                    replayed += 1
+                await target.push(delta)
+        while replayed < self.segment:
+            target.begin_segment()
+            replayed += 1
+        self._target = target
+
+    def discard(self) -> None:
+        """丢弃已缓冲与之后的全部片段"""
+        self._discarded = True
+        self._buffer = []
+
+
+_stream_sink: ContextVar[Optional[StreamSink]] = ContextVar("stream_sink", default=None)
+
+
+def get_stream_sink() -> Optional[StreamSink]:
+    """获取当前调用链的流式输出接收器"""
+    return _stream_sink.get()
+
+
+def set_stream_sink(sink: Optional[StreamSink]):
+    """设置当前调用链的流式输出接收器，返回用于恢复的 token"""
+    return _stream_sink.set(sink)
+
+
+def reset_stream_sink(token) -> None:
+    """恢复之前的流式输出接收器"""
+    _stream_sink.reset(token)
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Token 计数工具
+安装了 tiktoken 时使用 o200k_base/cl100k_base 编码精确计数，否则按字符类别估算
+"""
+import logging
+from functools import lru_cache
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    tiktoken = None
+    TIKTOKEN_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# 截断时追加的标记
+TRUNCATION_MARK = "…"
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    """加载本地编码表（仅加载一次，失败时退回估算）"""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        if TIKTOKEN_AVAILABLE:
+            for name in ("o200k_base", "cl100k_base"):
+                try:
+                    _encoding = tiktoken.get_encoding(name)
+                    break
+                except Exception as e:
+                    logger.debug(f"加载 tiktoken 编码 {name} 失败: {e}")
+    return _encoding
+
+
+def _is_cjk(ch: str) -> bool:
+    return "\u3000" <= ch <= "\u9fff" or "\uac00" <= ch <= "\ud7af" or "\uff00" <= ch <= "\uffef"
+
+
+def _estimate(text: str) -> int:
+    """中日韩字符约 1 字 1 token，其余字符约 4 字符 1 token"""
+    cjk = sum(1 for ch in text if _is_cjk(ch))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+@lru_cache(maxsize=4096)
+def _count_cached(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return _estimate(text)
+
+
+def count_tokens(text: str) -> int:
+    """计算文本的 token 数"""
+    if not text:
+        return 0
+    # 长文本（如整段搜索结果）很少重复出现，不进缓存
+    if len(text) > 2000:
+        encoding = _get_encoding()
+        return len(encoding.encode(text, disallowed_special=())) if encoding is not None else _estimate(text)
+    return _count_cached(text)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """截断文本使其不超过 max_tokens 个 token，被截断时以省略号结尾"""
+    if not text or max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return encoding.decode(tokens[:max(max_tokens - 1, 0)]) + TRUNCATION_MARK
+    # 估算模式下逐字累计
+    budget = max_tokens - 1
+    used = 0.0
+    for index, ch in enumerate(text):
+        used += 1.0 if _is_cjk(ch) else 0.25
+        if used > budget:
+            return text[:index] + TRUNCATION_MARK
+    return text